@@ -0,0 +1,85 @@
+"""Files per second of the signature detector compared to libmagic
+
+    python -m benchmarks.bench_detection [--files N] [directory]
+
+Without a directory a mixed tree of archives and regular files is generated.
+"""
+import argparse
+import io
+import os
+import random
+import tarfile
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+import magic
+
+from py_extract.detection import MIME_TYPES, detect_archive_type
+
+
+def make_mixed_tree(root: Path, count: int, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    zip_buffer = io.BytesIO()
+    with zipfile.ZipFile(zip_buffer, "w") as zip_file:
+        zip_file.writestr("file.txt", "content")
+    tar_buffer = io.BytesIO()
+    with tarfile.open(fileobj=tar_buffer, mode="w") as tar_file:
+        info = tarfile.TarInfo("file.txt")
+        info.size = 7
+        tar_file.addfile(info, io.BytesIO(b"content"))
+    samples = [
+        ("zip", zip_buffer.getvalue()),
+        ("tar", tar_buffer.getvalue()),
+        ("7z", b"7z\xbc\xaf\x27\x1c\x00\x04" + bytes(4096)),
+        ("rar", b"Rar!\x1a\x07\x01\x00" + bytes(4096)),
+        ("txt", b"plain text\n" * 200),
+        ("jpg", b"\xff\xd8\xff\xe0" + bytes(4096)),
+        ("bin", bytes(rng.getrandbits(8) for _ in range(4099))),
+    ]
+    for index in range(count):
+        suffix, content = samples[index % len(samples)]
+        directory = root / f"dir{index % 50}"
+        directory.mkdir(exist_ok=True)
+        (directory / f"file{index}.{suffix}").write_bytes(content)
+
+
+def detect_by_libmagic(file: Path):
+    with open(file, "rb") as fp:
+        return MIME_TYPES.get(magic.from_buffer(fp.read(2048), mime=True))
+
+
+def bench(files: list[Path], detect) -> float:
+    start = time.perf_counter()
+    for file in files:
+        detect(file)
+    return len(files) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("directory", nargs="?", help="tree to scan")
+    parser.add_argument("--files", type=int, default=20000)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        root = Path(args.directory or tmp_dir)
+        if not args.directory:
+            make_mixed_tree(root, args.files)
+        files = [
+            Path(dirpath, name)
+            for dirpath, _dirnames, filenames in os.walk(root)
+            for name in filenames
+        ]
+        # warm the page cache
+        bench(files, detect_archive_type)
+        signature_rate = bench(files, detect_archive_type)
+        libmagic_rate = bench(files, detect_by_libmagic)
+    print(f"files: {len(files)}")
+    print(f"signature: {signature_rate:,.0f} files/s")
+    print(f"libmagic:  {libmagic_rate:,.0f} files/s")
+    print(f"speedup:   {signature_rate / libmagic_rate:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""Throughput of every extraction engine on a synthetic corpus, compared to a
+stored baseline
+
+    python -m benchmarks.bench_suite [--corpus dir] [--baseline path]
+                                     [--tolerance 0.15] [--save-baseline]
+
+The corpus is generated by benchmarks.corpus and reused if it's found with
+the same parameters. Every metric is the best of --repeat runs, higher is
+better. The exit status is 1 if a metric is below its baseline by more than
+the tolerance, so the suite can gate a nightly build, and 2 if there is no
+baseline. A baseline is only written with --save-baseline, the numbers are
+specific to the machine and aren't committed.
+
+- zipfile: MB/s extracting ZipCrypto, passwords/s finding a deep password
+- pyzipper: MB/s extracting WinZip AES, passwords/s checking its verifier
+- 7z: MB/s extracting 7z, passwords/s probing with 7z processes
+- extractor: archives/s and MB/s of a whole run over each kind of archive
+"""
+import argparse
+import builtins
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from py_extract import init_translation
+from py_extract.config import PyExtractConfig
+from py_extract.extractor import ExtractStatusCode, PyExtractor
+from py_extract.password_store import load_password_store
+from py_extract.zip_session import ZipSession
+
+from .corpus import KINDS, generate
+
+DEFAULT_BASELINE = Path(__file__).with_name("baseline.json")
+# AES verifiers are checked with PBKDF2, the head of the list is enough
+AES_PASSWORDS = 2000
+
+
+def make_extractor(target: Path, password_path: Path) -> PyExtractor:
+    config = PyExtractConfig(
+        zip_metadata_encoding=["cp936"],
+        exclude_suffix=[],
+        exclude_filename=[],
+        exclude_substrings=[],
+        rename_substrings=[],
+        target_directory=str(target),
+        passwords=load_password_store(password_path, ["cp936", "utf-8"]),
+        password_path=str(password_path),
+        language="en",
+        auto_rename=False,
+        logging_level="warning",
+        config_path="",
+        dedup="off",
+        resume=False,
+    )
+    return PyExtractor(config)
+
+
+def best_of(repeat: int, run) -> float:
+    """Return the shortest time of the runs, run returns its own time"""
+    return min(run() for _ in range(repeat))
+
+
+def timed(func, *args, **kwargs) -> float:
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+class Suite:
+    def __init__(self, corpus: Path, manifest: dict, work: Path, repeat: int):
+        self.corpus = corpus
+        self.work = work
+        self.repeat = repeat
+        self.archives: dict[str, list[dict]] = {}
+        for archive in manifest["archives"]:
+            self.archives.setdefault(archive["kind"], []).append(archive)
+        self.small_passwords = corpus / "passwords_small.txt"
+        self.passwords = corpus / "passwords.txt"
+        self.metrics: dict[str, float] = {}
+
+    def extract_rate(self, archive: dict, extract) -> float:
+        """MB/s of the archive extracted by extract(path, out_path)"""
+        out_path = self.work / "out"
+
+        def run() -> float:
+            shutil.rmtree(out_path, ignore_errors=True)
+            elapsed = timed(extract, self.corpus / archive["path"], out_path)
+            shutil.rmtree(out_path, ignore_errors=True)
+            return elapsed
+
+        return archive["bytes"] / 1e6 / best_of(self.repeat, run)
+
+    def bench_zipfile(self, extractor: PyExtractor) -> None:
+        archive = self.archives["zipcrypto"][0]
+
+        def extract(path: Path, out_path: Path) -> None:
+            status = extractor.extract_zip(path, out_path, archive["password"])
+            assert status == ExtractStatusCode.SUCCESS, status
+
+        self.metrics["zipfile.mb_per_s"] = self.extract_rate(archive, extract)
+        deepest = max(
+            self.archives["password_depth"], key=lambda a: a["position"]
+        )
+        large = make_extractor(self.work, self.passwords)
+        passwords = large.config.passwords.ordered([0])
+
+        def search() -> float:
+            start = time.perf_counter()
+            with ZipSession(self.corpus / deepest["path"]) as session:
+                found, _aes = large.screen_zip_passwords(session, passwords)
+            elapsed = time.perf_counter() - start
+            assert list(found) == [deepest["password"]], found
+            return elapsed
+
+        # the empty password goes first
+        self.metrics["zipfile.passwords_per_s"] = (
+            deepest["position"] + 2
+        ) / best_of(self.repeat, search)
+
+    def bench_pyzipper(self, extractor: PyExtractor) -> None:
+        archive = self.archives["aes"][0]
+
+        def extract(path: Path, out_path: Path) -> None:
+            status = extractor.extract_zip(
+                path, out_path, archive["password"], aes=True
+            )
+            assert status == ExtractStatusCode.SUCCESS, status
+
+        self.metrics["pyzipper.mb_per_s"] = self.extract_rate(archive, extract)
+        large = make_extractor(self.work, self.passwords)
+        passwords = large.config.passwords.ordered([0])[:AES_PASSWORDS]
+
+        def screen() -> float:
+            start = time.perf_counter()
+            with ZipSession(self.corpus / archive["path"]) as session:
+                found, aes = large.screen_zip_passwords(session, passwords)
+            elapsed = time.perf_counter() - start
+            assert aes and archive["password"] in found
+            return elapsed
+
+        self.metrics["pyzipper.passwords_per_s"] = len(passwords) / best_of(
+            self.repeat, screen
+        )
+
+    def bench_7z(self, extractor: PyExtractor) -> None:
+        archive = self.archives["7z"][0]
+
+        def extract(path: Path, out_path: Path) -> None:
+            status = extractor.extract_7z(path, out_path, archive["password"])
+            assert status == ExtractStatusCode.SUCCESS, status
+
+        self.metrics["7z.mb_per_s"] = self.extract_rate(archive, extract)
+        passwords = extractor.config.passwords.ordered([0])
+
+        def probe() -> float:
+            start = time.perf_counter()
+            found = extractor.probe_7z_passwords(
+                self.corpus / archive["path"], passwords
+            )
+            elapsed = time.perf_counter() - start
+            assert list(found) == [archive["password"]], found
+            return elapsed
+
+        # the empty password goes first
+        self.metrics["7z.passwords_per_s"] = (
+            archive["position"] + 2
+        ) / best_of(self.repeat, probe)
+
+    def bench_extractor(self, kind: str) -> None:
+        """Run the extractor on a copy of the archives of a kind"""
+        archives = self.archives[kind]
+        source = self.corpus / kind
+        target = self.work / kind
+        password_path = (
+            self.passwords if kind == "password_depth" else self.small_passwords
+        )
+
+        def run() -> float:
+            shutil.rmtree(target, ignore_errors=True)
+            shutil.copytree(source, target)
+            extractor = make_extractor(target, password_path)
+            elapsed = timed(extractor.run)
+            extracted = {
+                archive["path"]
+                for archive in archives
+                if Path(self.work, f"{archive['path']}_out").is_dir()
+            }
+            assert len(extracted) == len(archives), extracted
+            shutil.rmtree(target, ignore_errors=True)
+            return elapsed
+
+        elapsed = best_of(self.repeat, run)
+        self.metrics[f"extractor.{kind}.archives_per_s"] = (
+            len(archives) / elapsed
+        )
+        self.metrics[f"extractor.{kind}.mb_per_s"] = (
+            sum(archive["bytes"] for archive in archives) / 1e6 / elapsed
+        )
+
+    def run(self) -> dict[str, float]:
+        extractor = make_extractor(self.work, self.small_passwords)
+        # the extractor prints its progress
+        with contextlib.redirect_stdout(io.StringIO()):
+            if (
+                "zipcrypto" in self.archives
+                and "password_depth" in self.archives
+            ):
+                self.bench_zipfile(extractor)
+            if "aes" in self.archives:
+                self.bench_pyzipper(extractor)
+            if "7z" in self.archives:
+                self.bench_7z(extractor)
+            for kind in self.archives:
+                self.bench_extractor(kind)
+        return self.metrics
+
+
+def compare(
+    metrics: dict[str, float], baseline: dict[str, float], tolerance: float
+) -> list[str]:
+    """Print the metrics next to the baseline, return the regressed ones"""
+    regressions = []
+    width = max(map(len, [*metrics, *baseline]))
+    for name in sorted({*metrics, *baseline}):
+        value, expected = metrics.get(name), baseline.get(name)
+        if value is None:
+            print(f"{name:<{width}} {'':>12} {expected:>12,.1f}  missing")
+            continue
+        if expected is None:
+            print(f"{name:<{width}} {value:>12,.1f} {'':>12}  new")
+            continue
+        change = value / expected - 1
+        regressed = change < -tolerance
+        if regressed:
+            regressions.append(name)
+        print(
+            f"{name:<{width}} {value:>12,.1f} {expected:>12,.1f}"
+            f"  {change:+.1%}{'  REGRESSION' if regressed else ''}"
+        )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("--corpus", help="corpus directory, kept between runs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--size", type=int, default=32, help="MB per archive")
+    parser.add_argument("--passwords", type=int, default=100_000)
+    parser.add_argument("--kinds", nargs="+", choices=KINDS, default=KINDS)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="store the results as the baseline instead of comparing",
+    )
+    parser.add_argument("--tmp-dir", help="where to extract")
+    args = parser.parse_args()
+    if "_" not in builtins.__dict__:
+        init_translation("en")
+    with tempfile.TemporaryDirectory(dir=args.tmp_dir) as tmp_dir:
+        corpus = Path(args.corpus or Path(tmp_dir, "corpus"))
+        manifest = generate(
+            corpus, args.seed, args.size, args.passwords, tuple(args.kinds)
+        )
+        work = Path(tmp_dir, "work")
+        work.mkdir()
+        metrics = Suite(corpus, manifest, work, args.repeat).run()
+    results = {
+        "params": manifest["params"],
+        "machine": {
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+            "python": platform.python_version(),
+        },
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "metrics": metrics,
+    }
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        with open(baseline_path, "w", encoding="utf-8") as fp:
+            json.dump(results, fp, indent=2)
+            fp.write("\n")
+        compare(metrics, {}, args.tolerance)
+        print(f"baseline saved to {baseline_path}")
+        return 0
+    if not baseline_path.is_file():
+        compare(metrics, {}, args.tolerance)
+        print(
+            f"no baseline at {baseline_path}, measure one on this machine"
+            " with --save-baseline"
+        )
+        return 2
+    with open(baseline_path, encoding="utf-8") as fp:
+        baseline = json.load(fp)
+    if baseline["params"] != manifest["params"]:
+        print("the baseline was measured on a corpus with other parameters")
+    regressions = compare(metrics, baseline["metrics"], args.tolerance)
+    if regressions:
+        print(
+            f"{len(regressions)} metrics are more than {args.tolerance:.0%}"
+            " below the baseline"
+        )
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,84 @@
+"""MB/s of zip extraction through the memory map compared to buffered reads
+
+    python -m benchmarks.bench_zip_mmap [--size MB] [--threads N] [archive]
+
+Without an archive one of --size MB is generated, try sizes from 100 MB to
+50 GB on the target volume with --tmp-dir. The page cache is warmed by a
+first run, so the numbers compare the read paths rather than the disk.
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+from py_extract.zip_session import ZipSession
+
+MEMBER_SIZE = 64 * 1024 * 1024
+WRITE_CHUNK = 1024 * 1024
+
+
+def make_archive(path: Path, size: int, compress_type: int) -> None:
+    """Write members of up to MEMBER_SIZE, half random, half compressible"""
+    random_chunk = os.urandom(WRITE_CHUNK // 2)
+    chunk = random_chunk + bytes(WRITE_CHUNK // 2)
+    with zipfile.ZipFile(
+        path, "w", compress_type, compresslevel=1, allowZip64=True
+    ) as zip_file:
+        index = 0
+        while size > 0:
+            member_size = min(size, MEMBER_SIZE)
+            with zip_file.open(
+                f"member{index}.bin", "w", force_zip64=True
+            ) as fp:
+                written = 0
+                while written < member_size:
+                    fp.write(chunk[: member_size - written])
+                    written += len(chunk)
+            size -= member_size
+            index += 1
+
+
+def bench(archive: Path, out_dir: Path, use_mmap: bool, threads: int) -> float:
+    shutil.rmtree(out_dir, ignore_errors=True)
+    with ZipSession(archive, use_mmap=use_mmap) as session:
+        start = time.perf_counter()
+        session.extractall(out_dir, threads=threads)
+        elapsed = time.perf_counter() - start
+    shutil.rmtree(out_dir, ignore_errors=True)
+    return archive.stat().st_size / 1e6 / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("archive", nargs="?", help="zip archive to extract")
+    parser.add_argument("--size", type=int, default=100, help="MB to generate")
+    parser.add_argument("--threads", type=int, default=os.cpu_count())
+    parser.add_argument("--stored", action="store_true")
+    parser.add_argument("--tmp-dir", help="where to generate and extract")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory(dir=args.tmp_dir) as tmp_dir:
+        archive = Path(args.archive or Path(tmp_dir, "bench.zip"))
+        if not args.archive:
+            make_archive(
+                archive,
+                args.size * 1_000_000,
+                zipfile.ZIP_STORED if args.stored else zipfile.ZIP_DEFLATED,
+            )
+        archive_size = archive.stat().st_size
+        out_dir = Path(tmp_dir, "out")
+        # warm the page cache
+        bench(archive, out_dir, True, args.threads)
+        mmap_rate = bench(archive, out_dir, True, args.threads)
+        buffered_rate = bench(archive, out_dir, False, args.threads)
+    print(f"archive:  {archive_size / 1e6:,.0f} MB")
+    print(f"threads:  {args.threads}")
+    print(f"mmap:     {mmap_rate:,.1f} MB/s")
+    print(f"buffered: {buffered_rate:,.1f} MB/s")
+    print(f"speedup:  {mmap_rate / buffered_rate:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""Generate a reproducible corpus of archives for the benchmark suite
+
+    python -m benchmarks.corpus [--seed N] [--size MB] [--passwords N] dir
+
+Every kind of archive is written to a subdirectory of its own. The contents,
+names and passwords only depend on the seed and the parameters; the
+encryption headers of ZipCrypto and the salts of AES are random, so the
+archive bytes differ between generations. 7z and split volumes are only
+generated if the 7z program is found.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import shutil
+import subprocess
+import zipfile
+from pathlib import Path
+
+import pyzipper
+
+from tests.zipcrypto import write_zipcrypto
+
+KINDS = (
+    "zipcrypto",
+    "aes",
+    "7z",
+    "split",
+    "nested",
+    "cp936",
+    "many_entries",
+    "password_depth",
+)
+SEVEN_ZIP_KINDS = ("7z", "split")
+# the archives except password_depth are encrypted with a password of the
+# small list, which is the head of the large one
+SMALL_PASSWORDS = 100
+SMALL_POSITION = 50
+# fractions of the large password list the password_depth archives have
+# their password at
+DEPTHS = (0.01, 0.1, 0.5, 1.0)
+MEMBERS = 4
+NESTING = 8
+ENTRIES = 10_000
+CP936_NAMES = 200
+# zip timestamps and file times are fixed, so the listings don't change
+DATE_TIME = (2020, 1, 1, 0, 0, 0)
+MTIME = 1577836800
+WORDS = [
+    "archive",
+    "volume",
+    "header",
+    "password",
+    "member",
+    "deflate",
+    "block",
+    "entry",
+]
+CP936_WORDS = ["压缩", "文件", "测试", "密码", "目录", "资料", "图片", "文档"]
+
+
+def make_passwords(rng: random.Random, count: int) -> list[str]:
+    passwords: dict[str, None] = {}
+    while len(passwords) < count:
+        word = rng.choice(WORDS)
+        passwords[f"{word}{rng.randrange(10**8):08d}"] = None
+    return list(passwords)
+
+
+def make_content(rng: random.Random, size: int) -> bytes:
+    """Half random bytes, half text, compressed about 2:1 by deflate"""
+    random_size = size // 2
+    text = " ".join(rng.choice(WORDS) for _ in range(1024)).encode()
+    repeated = text * (-(-(size - random_size) // len(text)))
+    return rng.randbytes(random_size) + repeated[: size - random_size]
+
+
+def fixed_info(name: str, compress_type: int) -> zipfile.ZipInfo:
+    info = zipfile.ZipInfo(name, date_time=DATE_TIME)
+    info.compress_type = compress_type
+    return info
+
+
+def write_members(directory: Path, members: dict[str, bytes]) -> None:
+    for name, data in members.items():
+        path = directory / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        os.utime(path, (MTIME, MTIME))
+
+
+def write_aes(path: Path, members: dict[str, bytes], pwd: bytes) -> None:
+    with pyzipper.AESZipFile(
+        path,
+        "w",
+        compression=pyzipper.ZIP_DEFLATED,
+        encryption=pyzipper.WZ_AES,
+    ) as zip_file:
+        zip_file.setpassword(pwd)
+        for name, data in members.items():
+            zip_file.writestr(name, data)
+
+
+def write_7z(path: Path, members: dict[str, bytes], pwd: str, *args) -> None:
+    """Archive the members with the 7z program, volumes if args has -v"""
+    source = path.with_name(f"{path.name}.src")
+    write_members(source, members)
+    subprocess.run(
+        ["7z", "a", "-t7z", "-mx=1", f"-p{pwd}", *args, str(path), "."],
+        cwd=source,
+        check=True,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+    )
+    shutil.rmtree(source)
+
+
+def write_nested(path: Path, depth: int, data: bytes) -> None:
+    """A stored zip in a stored zip, depth levels deep"""
+    content, name = data, "innermost.txt"
+    for level in range(depth):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as zip_file:
+            zip_file.writestr(fixed_info(name, zipfile.ZIP_STORED), content)
+        content, name = buffer.getvalue(), f"level{depth - level}.zip"
+    path.write_bytes(content)
+
+
+def write_raw_names(path: Path, members: dict[bytes, bytes]) -> None:
+    """Write the names as raw bytes without the utf-8 flag, like archives
+    made on a Chinese Windows. ASCII placeholders of the same length are
+    replaced after writing."""
+    placeholders = {
+        f"{i:0{len(name)}d}".encode(): name for i, name in enumerate(members)
+    }
+    with zipfile.ZipFile(path, "w") as zip_file:
+        for placeholder, data in zip(placeholders, members.values()):
+            zip_file.writestr(
+                fixed_info(placeholder.decode(), zipfile.ZIP_DEFLATED), data
+            )
+    raw = path.read_bytes()
+    for placeholder, name in placeholders.items():
+        raw = raw.replace(placeholder, name)
+    path.write_bytes(raw)
+
+
+def generate(
+    root: Path,
+    seed: int = 0,
+    size: int = 32,
+    password_count: int = 100_000,
+    kinds: tuple[str, ...] = KINDS,
+) -> dict:
+    """Write the corpus into root and return its manifest, which is saved as
+    corpus.json. A corpus with the same parameters is reused."""
+    params = {
+        "seed": seed,
+        "size": size,
+        "passwords": password_count,
+        "kinds": list(kinds),
+    }
+    manifest_path = root / "corpus.json"
+    if manifest_path.is_file():
+        with open(manifest_path, encoding="utf-8") as fp:
+            manifest = json.load(fp)
+        if manifest["params"] == params:
+            return manifest
+    shutil.rmtree(root, ignore_errors=True)
+    root.mkdir(parents=True)
+    rng = random.Random(seed)
+    passwords = make_passwords(rng, password_count)
+    (root / "passwords.txt").write_text(
+        "\n".join(passwords) + "\n", encoding="utf-8"
+    )
+    (root / "passwords_small.txt").write_text(
+        "\n".join(passwords[:SMALL_PASSWORDS]) + "\n", encoding="utf-8"
+    )
+    pwd = passwords[SMALL_POSITION]
+    member_size = size * 1_000_000 // MEMBERS
+    archives = []
+
+    def add(kind: str, path: Path, password: str, position: int | None):
+        # the volumes of a set are counted with the first one
+        volumes = [path]
+        if path.suffix == ".001":
+            volumes = sorted(path.parent.glob(f"{path.stem}.[0-9][0-9][0-9]"))
+        archives.append(
+            {
+                "kind": kind,
+                "path": str(path.relative_to(root)),
+                "password": password,
+                "position": position,
+                "bytes": sum(volume.stat().st_size for volume in volumes),
+            }
+        )
+
+    def large_members() -> dict[str, bytes]:
+        return {
+            f"dir{i % 2}/member{i}.bin": make_content(rng, member_size)
+            for i in range(MEMBERS)
+        }
+
+    has_7z = bool(shutil.which("7z"))
+    for kind in kinds:
+        if kind in SEVEN_ZIP_KINDS and not has_7z:
+            print(f"7z is not found, {kind} is not generated")
+            continue
+        directory = root / kind
+        directory.mkdir()
+        match kind:
+            case "zipcrypto":
+                path = directory / "zipcrypto.zip"
+                write_zipcrypto(
+                    path, large_members(), pwd.encode(), zipfile.ZIP_DEFLATED
+                )
+                add(kind, path, pwd, SMALL_POSITION)
+            case "aes":
+                path = directory / "aes.zip"
+                write_aes(path, large_members(), pwd.encode())
+                add(kind, path, pwd, SMALL_POSITION)
+            case "7z":
+                path = directory / "archive.7z"
+                write_7z(path, large_members(), pwd)
+                add(kind, path, pwd, SMALL_POSITION)
+            case "split":
+                path = directory / "volumes.7z"
+                write_7z(path, large_members(), pwd, f"-v{max(size // 4, 1)}m")
+                add(kind, directory / "volumes.7z.001", pwd, SMALL_POSITION)
+            case "nested":
+                path = directory / "nested.zip"
+                write_nested(path, NESTING, make_content(rng, 64 * 1024))
+                add(kind, path, "", None)
+            case "cp936":
+                path = directory / "cp936.zip"
+                names = {
+                    f"{rng.choice(CP936_WORDS)}{i}.txt".encode(
+                        "cp936"
+                    ): make_content(rng, 4096)
+                    for i in range(CP936_NAMES)
+                }
+                write_raw_names(path, names)
+                add(kind, path, "", None)
+            case "many_entries":
+                path = directory / "many_entries.zip"
+                with zipfile.ZipFile(path, "w") as zip_file:
+                    for i in range(ENTRIES):
+                        zip_file.writestr(
+                            fixed_info(
+                                f"dir{i % 100}/entry{i}.txt",
+                                zipfile.ZIP_DEFLATED,
+                            ),
+                            make_content(rng, 256),
+                        )
+                add(kind, path, "", None)
+            case "password_depth":
+                data = {"member.bin": make_content(rng, 64 * 1024)}
+                for depth in DEPTHS:
+                    position = int(depth * (password_count - 1))
+                    path = directory / f"depth{position}.zip"
+                    write_zipcrypto(
+                        path,
+                        data,
+                        passwords[position].encode(),
+                        zipfile.ZIP_DEFLATED,
+                    )
+                    add(kind, path, passwords[position], position)
+    manifest = {"params": params, "archives": archives}
+    with open(manifest_path, "w", encoding="utf-8") as fp:
+        json.dump(manifest, fp, ensure_ascii=False, indent=2)
+    return manifest
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("directory", help="where to write the corpus")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--size", type=int, default=32, help="MB per archive")
+    parser.add_argument("--passwords", type=int, default=100_000)
+    args = parser.parse_args()
+    manifest = generate(
+        Path(args.directory), args.seed, args.size, args.passwords
+    )
+    for archive in manifest["archives"]:
+        print(
+            f"{archive['kind']:<15} {archive['bytes'] / 1e6:>8.1f} MB"
+            f"  {archive['path']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
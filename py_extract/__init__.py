@@ -46,6 +46,22 @@ def create_py_extractor():
         const="debug",
         help="debug mode",
     )
+    parser.add_argument(
+        "-p",
+        "--plan",
+        nargs="?",
+        const="-",
+        metavar="REPORT",
+        help=(
+            "report what would be extracted without extracting, as CSV if"
+            " REPORT ends with .csv, else as JSON, to stdout by default"
+        ),
+    )
+    parser.add_argument(
+        "--plan-speed",
+        type=float,
+        help="extraction speed in MB/s to estimate the runtime of a plan",
+    )
 
     args = parser.parse_args()
 
@@ -70,4 +86,9 @@ def create_py_extractor():
     language = py_extract_config.language
     init_translation(language)
     py_extractor = PyExtractor(config=py_extract_config)
+    if (arg_plan := args.plan) is not None:
+        py_extractor.dry_run = True
+        py_extractor.plan_path = arg_plan
+    if arg_plan_speed := args.plan_speed:
+        py_extractor.plan_speed = arg_plan_speed
     return py_extractor
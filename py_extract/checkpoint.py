@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import threading
+import zlib
+from logging import getLogger
+from pathlib import Path
+from typing import TextIO
+
+logger = getLogger(__name__)
+
+# kept in the staging directory and removed before it's renamed
+CHECKPOINT_NAME = ".py_extract_checkpoint"
+CRC_CHUNK_SIZE = 1024 * 1024
+
+
+def password_digest(pwd: str) -> str:
+    return hashlib.sha256(pwd.encode("utf-8")).hexdigest()
+
+
+def file_crc32(path: str | Path) -> int:
+    crc = 0
+    with open(path, "rb") as fp:
+        while chunk := fp.read(CRC_CHUNK_SIZE):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+def is_member_complete(
+    target: str | Path, size: int, crc: int | None, checked_crc: int | None
+) -> bool:
+    """Compare an extracted file with the archive index by size, then by
+    CRC-32. checked_crc is the CRC-32 a checkpoint recorded for the file."""
+    try:
+        if os.path.getsize(target) != size:
+            return False
+    except OSError:
+        return False
+    if crc is None or checked_crc == crc:
+        return True
+    try:
+        return file_crc32(target) == crc
+    except OSError:
+        return False
+
+
+class Checkpoint:
+    """Progress of the extraction into a staging directory, a JSON lines file
+    whose first line identifies the archive and the password, every other
+    line is a member written completely with its CRC-32."""
+
+    def __init__(self, staging: Path) -> None:
+        self.path = staging / CHECKPOINT_NAME
+        self.header: dict = {}
+        # members written completely and their CRC-32
+        self.done: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._fp: TextIO | None = None
+
+    @classmethod
+    def load(cls, staging: Path) -> "Checkpoint | None":
+        """Load the checkpoint of an interrupted extraction, further members
+        are appended to it"""
+        checkpoint = cls(staging)
+        try:
+            with open(checkpoint.path, "r", encoding="utf-8") as fp:
+                checkpoint.header = json.loads(fp.readline())
+                for line in fp:
+                    try:
+                        member = json.loads(line)
+                    except json.JSONDecodeError:
+                        # the last line may be cut by the interruption
+                        break
+                    checkpoint.done[member["name"]] = member["crc"]
+        except (OSError, ValueError, KeyError):
+            return None
+        # rewrite it without the cut line
+        checkpoint._rewrite()
+        return checkpoint
+
+    def matches(self, archive: Path) -> bool:
+        """Whether the checkpoint was written for the archive as it is now"""
+        try:
+            stat_result = archive.stat()
+        except OSError:
+            return False
+        return self.header.get("archive") == archive.name and (
+            self.header.get("size"),
+            self.header.get("mtime_ns"),
+        ) == (stat_result.st_size, stat_result.st_mtime_ns)
+
+    def start(self, archive: Path, pwd: str) -> None:
+        stat_result = archive.stat()
+        self.header = {
+            "archive": archive.name,
+            "size": stat_result.st_size,
+            "mtime_ns": stat_result.st_mtime_ns,
+            "password": password_digest(pwd),
+        }
+        self.done = {}
+        self._rewrite()
+
+    def set_encoding(self, encoding: str) -> None:
+        """Record the zip metadata encoding, a resumed extraction must decode
+        the names in the same way"""
+        if self.header.get("encoding") == encoding:
+            return
+        self.header["encoding"] = encoding
+        self.done = {}
+        self._rewrite()
+
+    def _rewrite(self) -> None:
+        with self._lock:
+            if self._fp is not None:
+                self._fp.close()
+            self._fp = open(self.path, "w", encoding="utf-8")
+            self._fp.write(json.dumps(self.header) + "\n")
+            for name, crc in self.done.items():
+                self._fp.write(json.dumps({"name": name, "crc": crc}) + "\n")
+            self._fp.flush()
+
+    def member_done(self, name: str, crc: int) -> None:
+        line = json.dumps({"name": name, "crc": crc}) + "\n"
+        with self._lock:
+            self.done[name] = crc
+            if self._fp is not None:
+                self._fp.write(line)
+                self._fp.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fp is not None:
+                self._fp.close()
+                self._fp = None
+
+    def remove(self) -> None:
+        self.close()
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
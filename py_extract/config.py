@@ -1,14 +1,16 @@
 import dataclasses
-from pathlib import Path
-
 import tomllib
+from pathlib import Path
 
+from .dedup import DEDUP_MODES
 from .exceptions import (
     ConfigNotFound,
     InvalidConfig,
     InvalidPath,
 )
-from .utils import load_passwords
+from .password_ranking import HINT_KINDS
+from .password_store import PasswordStore, load_password_store
+from .planning import SCHEDULES
 
 
 def is_list_of_str(list_to_test: list[str]):
@@ -29,12 +31,30 @@ class PyExtractConfig:
     exclude_substrings: list[str]
     rename_substrings: list[str]
     target_directory: str
-    passwords: list[str]
+    passwords: PasswordStore
     password_path: str
     language: str
     auto_rename: bool
     logging_level: str
     config_path: str
+    threads: int = 0
+    seven_zip_processes: int = 0
+    workers: int = 1
+    extract_threads: int = 0
+    manifest_path: str = ""
+    resume: bool = True
+    dedup: str = "reflink"
+    password_stats_path: str = ""
+    trace_path: str = ""
+    schedule: str = "small_first"
+    password_hints: list[str] = dataclasses.field(
+        default_factory=lambda: ["directory"]
+    )
+    max_ratio: float = 1000
+    max_bytes: int = 0
+    max_entries: int = 1_000_000
+    max_depth: int = 10
+    time_limit: float = 0
 
     def __post_init__(self) -> None:
         assert is_list_of_str(self.zip_metadata_encoding)
@@ -50,7 +70,27 @@ class PyExtractConfig:
             raise InvalidPath(
                 f"target directory {self.target_directory} doesn't exist"
             )
-        assert is_list_of_str(self.passwords)
+        assert isinstance(self.passwords, PasswordStore)
+        assert isinstance(self.threads, int) and self.threads >= 0
+        assert isinstance(self.seven_zip_processes, int)
+        assert self.seven_zip_processes >= 0
+        assert isinstance(self.workers, int) and self.workers >= 1
+        assert isinstance(self.extract_threads, int)
+        assert self.extract_threads >= 0
+        assert isinstance(self.manifest_path, str)
+        assert isinstance(self.resume, bool)
+        assert self.dedup in DEDUP_MODES
+        assert isinstance(self.password_stats_path, str)
+        assert isinstance(self.trace_path, str)
+        assert is_list_of_str(self.password_hints)
+        assert set(self.password_hints) <= set(HINT_KINDS)
+        assert self.schedule in SCHEDULES
+        assert isinstance(self.max_ratio, (int, float)) and self.max_ratio >= 0
+        assert isinstance(self.max_bytes, int) and self.max_bytes >= 0
+        assert isinstance(self.max_entries, int) and self.max_entries >= 0
+        assert isinstance(self.max_depth, int) and self.max_depth >= 0
+        assert isinstance(self.time_limit, (int, float))
+        assert self.time_limit >= 0
 
         self.rename_substrings = sorted(self.rename_substrings, reverse=True)
 
@@ -99,8 +139,11 @@ def load_config(config_path: str | None = None) -> PyExtractConfig:
                     raise InvalidPath(
                         f"password file  {password_path} doesn't exist"
                     )
-                with open(password_path, "r", encoding="utf-8") as pwd_file:
-                    passwords = load_passwords(pwd_file)
+                passwords = load_password_store(
+                    password_path, [*zip_metadata_encoding, "utf-8"]
+                )
+                performance = toml_config.get("performance", {})
+                limits = toml_config.get("limits", {})
                 extract_config = PyExtractConfig(
                     zip_metadata_encoding=zip_metadata_encoding,
                     exclude_suffix=suffixes,
@@ -114,6 +157,28 @@ def load_config(config_path: str | None = None) -> PyExtractConfig:
                     auto_rename=auto_rename,
                     logging_level=logging_level,
                     config_path=config_path,
+                    threads=performance.get("threads", 0),
+                    seven_zip_processes=performance.get(
+                        "seven_zip_processes", 0
+                    ),
+                    workers=performance.get("workers", 1),
+                    extract_threads=performance.get("extract_threads", 0),
+                    dedup=performance.get("dedup", "reflink"),
+                    password_stats_path=toml_config["path"].get(
+                        "password_stats_path", ""
+                    ),
+                    password_hints=performance.get(
+                        "password_hints", ["directory"]
+                    ),
+                    schedule=performance.get("schedule", "small_first"),
+                    manifest_path=toml_config["path"].get("manifest_path", ""),
+                    trace_path=toml_config["path"].get("trace_path", ""),
+                    resume=toml_config.get("resume", True),
+                    max_ratio=limits.get("max_ratio", 1000),
+                    max_bytes=limits.get("max_bytes", 0),
+                    max_entries=limits.get("max_entries", 1_000_000),
+                    max_depth=limits.get("max_depth", 10),
+                    time_limit=limits.get("time_limit", 0),
                 )
             case _:
                 raise InvalidConfig(
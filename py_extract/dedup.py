@@ -0,0 +1,192 @@
+import dataclasses
+import hashlib
+import os
+import shutil
+import threading
+from logging import getLogger
+from pathlib import Path
+from types import ModuleType
+
+from .staging import is_staging_dir
+
+fcntl: ModuleType | None
+try:
+    import fcntl
+except ImportError:
+    # not available on Windows, duplicates are copied
+    fcntl = None
+
+logger = getLogger(__name__)
+
+# how duplicated archives are handled
+DEDUP_MODES = ("off", "skip", "hardlink", "reflink")
+SAMPLE_SIZE = 64 * 1024
+HASH_CHUNK_SIZE = 1024 * 1024
+# ioctl of Linux which shares the extents of a file, btrfs and xfs support it
+FICLONE = 0x40049409
+
+
+def quick_fingerprint(files: list[Path]) -> str:
+    """Hash the size and the first, middle and last blocks of the files, a
+    cheap fingerprint which is confirmed by full_hash when two match"""
+    digest = hashlib.sha256()
+    for file in files:
+        with open(file, "rb") as fp:
+            size = os.fstat(fp.fileno()).st_size
+            digest.update(size.to_bytes(8, "little"))
+            for offset in (0, (size - SAMPLE_SIZE) // 2, size - SAMPLE_SIZE):
+                fp.seek(max(offset, 0))
+                digest.update(fp.read(SAMPLE_SIZE))
+    return digest.hexdigest()
+
+
+def full_hash(files: list[Path]) -> str:
+    digest = hashlib.sha256()
+    for file in files:
+        with open(file, "rb") as fp:
+            while chunk := fp.read(HASH_CHUNK_SIZE):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+@dataclasses.dataclass
+class ExtractedArchive:
+    """An archive extracted in this run, its password and encoding are reused
+    for archives with the same content. The password is None if the archive
+    was extracted by a previous run."""
+
+    file: Path
+    out_path: Path
+    password: str | None
+    encoding: str | None = None
+
+
+@dataclasses.dataclass
+class _Content:
+    files: list[Path]
+    full_hash: str | None = None
+    done: threading.Event = dataclasses.field(default_factory=threading.Event)
+    extracted: ExtractedArchive | None = None
+
+    def hash(self) -> str:
+        if self.full_hash is None:
+            self.full_hash = full_hash(self.files)
+        return self.full_hash
+
+
+class ArchiveIndex:
+    """Archives of this run by content, so copies of an archive under other
+    names are extracted once. Archives are told apart by quick_fingerprint,
+    the full hash is only computed when two fingerprints match. It's shared
+    by the worker threads."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._contents: dict[str, list[_Content]] = {}
+        # contents being extracted by the caller of acquire
+        self._owned: dict[tuple[Path, ...], tuple[str, _Content]] = {}
+
+    def acquire(self, files: list[Path]) -> ExtractedArchive | None:
+        """Return the extraction of an archive with the same content as the
+        files, waiting for it if it's in progress. If None is returned, the
+        caller extracts the files and must call release."""
+        try:
+            fingerprint = quick_fingerprint(files)
+        except OSError:
+            logger.exception("cannot fingerprint %s", files)
+            return None
+        content = _Content(list(files))
+        while True:
+            with self._lock:
+                candidates = list(self._contents.get(fingerprint, ()))
+            match = None
+            for candidate in candidates:
+                try:
+                    if candidate.hash() == content.hash():
+                        match = candidate
+                        break
+                except OSError:
+                    logger.exception("cannot hash %s", files)
+                    return None
+            if match is None:
+                with self._lock:
+                    same = self._contents.setdefault(fingerprint, [])
+                    if len(same) != len(candidates):
+                        # another archive was added meanwhile, compare again
+                        continue
+                    same.append(content)
+                    self._owned[tuple(files)] = (fingerprint, content)
+                return None
+            match.done.wait()
+            if match.extracted is not None:
+                logger.info("%s is a duplicate of %s", files, match.files)
+                return match.extracted
+            # the extraction failed, the next caller takes the content over
+
+    def register(self, files: list[Path], extracted: ExtractedArchive) -> None:
+        """Add an archive extracted before this run, unless an archive with
+        the same content is known already"""
+        if self.acquire(files) is None:
+            self.release(files, extracted)
+
+    def release(
+        self, files: list[Path], extracted: ExtractedArchive | None
+    ) -> None:
+        """Publish the outcome of the extraction of the files to the callers
+        waiting for it, None if it failed"""
+        with self._lock:
+            owned = self._owned.pop(tuple(files), None)
+            if owned is None:
+                return
+            fingerprint, content = owned
+            content.extracted = extracted
+            if extracted is None:
+                self._contents[fingerprint].remove(content)
+        content.done.set()
+
+
+def reflink(src: str, dst: str) -> None:
+    """Copy a file sharing its extents, copy it if it's not supported"""
+    if fcntl is not None:
+        try:
+            with open(src, "rb") as src_fp, open(dst, "wb") as dst_fp:
+                fcntl.ioctl(dst_fp.fileno(), FICLONE, src_fp.fileno())
+            shutil.copystat(src, dst)
+            return
+        except OSError:
+            pass
+    shutil.copy2(src, dst)
+
+
+def hardlink(src: str, dst: str) -> None:
+    """Link a file, copy it if the link fails, e.g. on another file system"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def link_tree(src: Path, dst: Path, mode: str) -> None:
+    """Materialize the output directory src in the existing directory dst
+    with hardlinks or reflinks. Staging directories of nested archives being
+    extracted in src are left out."""
+    link_file = hardlink if mode == "hardlink" else reflink
+    for root, dirs, files in os.walk(src):
+        dirs[:] = [name for name in dirs if not is_staging_dir(name)]
+        relative = os.path.relpath(root, src)
+        target_root = os.path.join(dst, relative)
+        for name in dirs:
+            source = os.path.join(root, name)
+            target = os.path.join(target_root, name)
+            if os.path.islink(source):
+                # os.walk doesn't follow it
+                os.symlink(os.readlink(source), target)
+            else:
+                os.makedirs(target, exist_ok=True)
+        for name in files:
+            source = os.path.join(root, name)
+            target = os.path.join(target_root, name)
+            if os.path.islink(source):
+                os.symlink(os.readlink(source), target)
+            else:
+                link_file(source, target)
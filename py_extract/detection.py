@@ -0,0 +1,119 @@
+import os
+from enum import Enum, unique
+from logging import getLogger
+from pathlib import Path
+
+logger = getLogger(__name__)
+
+
+@unique
+class ArchiveType(Enum):
+    TAR = "application/x-tar"
+    ZIP = "application/zip"
+    SEVENTH_ZIP = "application/x-7z-compressed"
+    RAR = "application/x-rar"
+
+    @classmethod
+    def get_suffix(cls, archive_type: "ArchiveType") -> str:
+        suffix_mapping = {
+            cls.TAR: "tar",
+            cls.ZIP: "zip",
+            cls.SEVENTH_ZIP: "7z",
+            cls.RAR: "rar",
+        }
+        return suffix_mapping[archive_type]
+
+
+# mime types reported by libmagic, newer versions report vnd.rar
+MIME_TYPES = {
+    **{archive_type.value: archive_type for archive_type in ArchiveType},
+    "application/vnd.rar": ArchiveType.RAR,
+}
+
+SIGNATURES = [
+    (b"7z\xbc\xaf\x27\x1c", ArchiveType.SEVENTH_ZIP),
+    # rar 1.5-4.x and rar 5, every volume starts with it
+    (b"Rar!\x1a\x07\x00", ArchiveType.RAR),
+    (b"Rar!\x1a\x07\x01\x00", ArchiveType.RAR),
+    # local file header, empty archive, first volume of a split archive
+    (b"PK\x03\x04", ArchiveType.ZIP),
+    (b"PK\x05\x06", ArchiveType.ZIP),
+    (b"PK\x07\x08PK\x03\x04", ArchiveType.ZIP),
+]
+
+# libmagic reports zip based documents by the name of their first member
+# (office documents, epub, jar, apk), these are left to libmagic
+ZIP_CONTAINER_NAMES = (
+    b"[Content_Types].xml",
+    b"_rels/",
+    b"docProps/",
+    b"word/",
+    b"xl/",
+    b"ppt/",
+    b"mimetype",
+    b"META-INF/",
+    b"AndroidManifest.xml",
+    b"classes.dex",
+)
+
+# the magic of ustar archives is at offset 257
+TAR_MAGIC_OFFSET = 257
+TAR_BLOCK_SIZE = 512
+HEAD_SIZE = 64
+
+
+def read_bytes(fd: int, size: int, offset: int) -> bytes:
+    if hasattr(os, "pread"):
+        return os.pread(fd, size, offset)
+    # os.pread is not available on Windows
+    os.lseek(fd, offset, os.SEEK_SET)
+    return os.read(fd, size)
+
+
+def _zip_first_member_name(head: bytes) -> bytes:
+    offset = 4 if head.startswith(b"PK\x07\x08") else 0
+    name_length = int.from_bytes(head[offset + 26 : offset + 28], "little")
+    return head[offset + 30 : offset + 30 + name_length]
+
+
+def match_signature(head: bytes) -> ArchiveType | None:
+    for signature, archive_type in SIGNATURES:
+        if head.startswith(signature):
+            return archive_type
+    return None
+
+
+def detect_by_libmagic(file: Path) -> ArchiveType | None:
+    # libmagic is only loaded if a file cannot be told by its signature
+    import magic
+
+    with open(file, "rb") as fp:
+        file_type = magic.from_buffer(fp.read(2048), mime=True)
+    return MIME_TYPES.get(file_type)
+
+
+def detect_archive_type(
+    file: Path, size: int | None = None
+) -> ArchiveType | None:
+    """Detect the archive type by the magic bytes at the start of the file.
+    libmagic is only asked for zip based documents and for files which could
+    be tar archives without the ustar magic."""
+    fd = os.open(file, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        if size is None:
+            size = os.fstat(fd).st_size
+        head = read_bytes(fd, HEAD_SIZE, 0)
+        archive_type = match_signature(head)
+        if archive_type is None and size >= TAR_BLOCK_SIZE:
+            if read_bytes(fd, 5, TAR_MAGIC_OFFSET) == b"ustar":
+                archive_type = ArchiveType.TAR
+    finally:
+        os.close(fd)
+    if archive_type == ArchiveType.ZIP:
+        if _zip_first_member_name(head).startswith(ZIP_CONTAINER_NAMES):
+            return detect_by_libmagic(file)
+        return archive_type
+    if archive_type is None and size and size % TAR_BLOCK_SIZE == 0:
+        # old tar archives without magic, checked by libmagic's heuristics
+        return detect_by_libmagic(file)
+    return archive_type
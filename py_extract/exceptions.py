@@ -24,3 +24,7 @@ class SevenZipExtractFail(Exception):
 
 class SevenZipCmdNotFound(Exception):
     ...
+
+
+class LimitExceeded(Exception):
+    ...
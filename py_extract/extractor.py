@@ -1,32 +1,92 @@
 import builtins
+import contextlib
+import itertools
 import os
 import re
 import shutil
-import stat
+import statistics
 import subprocess
 import sys
+import tempfile
 import time
 import zipfile
-from enum import Enum, unique
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from enum import Enum
 from logging import getLogger
 from pathlib import Path
+from typing import Iterator, Sequence
 
-import magic
-
+from .checkpoint import Checkpoint, is_member_complete, password_digest
 from .config import PyExtractConfig
-from .exceptions import SevenZipCmdNotFound, SevenZipExtractFail
+from .dedup import ArchiveIndex, ExtractedArchive, link_tree
+from .detection import ArchiveType, detect_archive_type
+from .exceptions import (
+    LimitExceeded,
+    SevenZipCmdNotFound,
+    SevenZipExtractFail,
+)
 from .file_renaming import (
     RenameFileHandler,
 )
+from .limits import ExtractionGuard, communicate_guarded, directory_usage
+from .manifest import ExtractionManifest, settings_fingerprint
+from .password_ranking import PasswordRanking
+from .password_store import PasswordOrder
+from .plan_report import (
+    DEFAULT_SPEED,
+    DUPLICATE,
+    EXISTS,
+    MISSING_VOLUMES,
+    READY,
+    UNKNOWN_PASSWORD,
+    WRONG_PASSWORD,
+    PlannedArchive,
+    defer_overflowing,
+    save_report,
+    summarize,
+)
+from .planning import (
+    SIZED_SCHEDULES,
+    DiskBudget,
+    disk_footprint,
+    extracted_size,
+    schedule_key,
+    zip_footprint,
+)
+from .seven_zip import (
+    ProcessGroup,
+    SevenZipEntry,
+    list_archive,
+    pick_probe_entry,
+    probe_entry,
+)
+from .staging import StagingArea
+from .trace import ArchiveTrace, TraceSink
 from .utils import (
+    GroupedOutput,
     done_color,
     failed_color,
     filename_color,
     output_same_line,
 )
+from .volumes import SPLIT_ZIP, VolumeSet, group_volumes
+from .walker import scan_files
 
 # from .config_parser import py_extract_config
 from .zip_decrypter import _ZipDecrypter  # pylint: disable=E0611
+from .zip_probe import (
+    find_zipcrypto_password,
+    read_aes_verifier,
+    read_zipcrypto_header,
+    screen_aes_passwords,
+    screen_zipcrypto_passwords,
+)
+from .zip_session import ZipSession, extract_member
 
 setattr(zipfile, "_ZipDecrypter", _ZipDecrypter)
 
@@ -38,29 +98,9 @@ class ExtractStatusCode(Enum):
     WRONG_PASSWORD = 1
     FAIL = 2
     WRONG_ENCODING = 3
-
-
-@unique
-class ArchiveType(Enum):
-    TAR = "application/x-tar"
-    ZIP = "application/zip"
-    SEVENTH_ZIP = "application/x-7z-compressed"
-    RAR = "application/x-rar"
-
-    @classmethod
-    def get_suffix(cls, archive_type: "ArchiveType") -> str:
-        suffix_mapping = {
-            cls.TAR: "tar",
-            cls.ZIP: "zip",
-            cls.SEVENTH_ZIP: "7z",
-            cls.RAR: "rar",
-        }
-        return suffix_mapping[archive_type]
-
-
-def remove_readonly(func, path, _) -> None:
-    os.chmod(path, stat.S_IWRITE)
-    func(path)
+    MISSING_VOLUMES = 4
+    DEFERRED = 5
+    LIMIT_EXCEEDED = 6
 
 
 class PyExtractor:
@@ -71,8 +111,49 @@ class PyExtractor:
             auto_rename=config.auto_rename,
         )
         self.handled_archives: set[Path] = set()
+        self.staging = StagingArea(resume=config.resume)
+        self.archive_index: ArchiveIndex | None = None
+        if config.dedup != "off":
+            self.archive_index = ArchiveIndex()
+        # metadata encodings which decoded zip archives
+        self.zip_encodings: dict[Path, str] = {}
+        self.manifest: ExtractionManifest | None = None
+        if config.manifest_path:
+            self.manifest = ExtractionManifest(
+                config.manifest_path,
+                settings_fingerprint(config.password_path, config.config_path),
+            )
+        # without a stats file the hits are only counted during the run
+        self.password_ranking = PasswordRanking(
+            config.password_stats_path or ":memory:",
+            config.passwords,
+            config.password_hints,
+        )
+        # position of the matching password in the order it's tried, for
+        # every archive extracted with a password
+        self.password_attempts: list[int] = []
+        # space the extracted files of the scheduled archives take, None if
+        # it's not known
+        self.planned_sizes: dict[Path, int | None] = {}
+        self.disk_budget = DiskBudget()
+        self.incomplete_volume_sets: list[VolumeSet] = []
+        # traces of the archives being handled, and the detection times of
+        # the archives found, only collected with a trace sink
+        self.trace_sink: TraceSink | None = None
+        if config.trace_path:
+            self.trace_sink = TraceSink(config.trace_path)
+        self.traces: dict[Path, ArchiveTrace] = {}
+        self.detection_times: dict[Path, float] = {}
+        # plan mode reports what a run would do, without writing anything
+        # under the target directory
+        self.dry_run = False
+        self.plan_path = "-"
+        self.plan_speed = DEFAULT_SPEED
 
     def run(self):
+        if self.dry_run:
+            self.plan()
+            return
         target_dir = self.config.target_directory
         print(
             f'{_("target directory")}: {filename_color(target_dir)} ,'
@@ -81,7 +162,195 @@ class PyExtractor:
             f" {filename_color(self.config.password_path)}\n"
         )
         logger.info(self.config)
-        self.extract_archives_recursively(target_dir)
+        try:
+            self.extract_archives_recursively(target_dir)
+            self.staging.discard_unclaimed()
+            if self.password_attempts:
+                print(
+                    f"{_('median password attempts per archive')}:"
+                    f" {statistics.median(self.password_attempts)}"
+                )
+        finally:
+            if self.manifest:
+                self.manifest.close()
+            self.password_ranking.close()
+            self.staging.close()
+            if self.trace_sink is not None:
+                self.trace_sink.close()
+
+    def plan(self) -> None:
+        """Walk the target directory like a run and write the report of the
+        archives found, the output of the walk goes to stderr so the report
+        can be written to stdout"""
+        target_dir = self.config.target_directory
+        start = time.perf_counter()
+        try:
+            with contextlib.redirect_stdout(sys.stderr):
+                found = list(self.find_archives(target_dir, 0))
+                self.register_extracted(found)
+                archives = [
+                    self.plan_archive(file, archive_type, volume_set)
+                    for file, archive_type, volume_set in found
+                ]
+            archives.extend(
+                PlannedArchive(
+                    path=str(volume_set.first),
+                    type="",
+                    volumes=len(volume_set.members),
+                    archive_size=volume_set.total_size,
+                    extracted_size=None,
+                    encrypted=None,
+                    password=None,
+                    candidates=0,
+                    status=MISSING_VOLUMES,
+                )
+                for volume_set in self.incomplete_volume_sets
+            )
+        finally:
+            if self.manifest:
+                self.manifest.close()
+            self.password_ranking.close()
+        defer_overflowing(archives, self.config.schedule)
+        summary = summarize(archives, self.plan_speed)
+        save_report(archives, summary, target_dir, self.plan_path)
+        print(
+            f"{_('archives')}: {summary['archives']} ,"
+            f" {_('to extract')}: {summary['archive_size'] / 1e6:,.0f} MB ->"
+            f" {summary['extracted_size'] / 1e6:,.0f} MB ,"
+            f" {_('estimated time')}: {summary['estimated_seconds']}s ,"
+            f" {_('time cost')}: {time.perf_counter() - start:.1f}s",
+            file=sys.stderr,
+        )
+
+    def plan_archive(
+        self,
+        file: Path,
+        archive_type: ArchiveType,
+        volume_set: VolumeSet | None,
+    ) -> PlannedArchive:
+        """Find what a run would do with an archive by checking the
+        passwords against the encryption headers, the AES verifiers or a
+        single small entry, nothing is extracted to the disk"""
+        split_zip = volume_set is not None and volume_set.split
+        session = None
+        if archive_type == ArchiveType.ZIP and not split_zip:
+            # the central directory is parsed once for the size and the
+            # passwords
+            session = self.open_zip_session(file)
+            size = (
+                zip_footprint(session.zip_file.infolist())
+                if session is not None
+                else None
+            )
+        else:
+            size = extracted_size(file, archive_type, split_zip)
+        planned = PlannedArchive(
+            path=str(file),
+            type=ArchiveType.get_suffix(archive_type),
+            volumes=len(volume_set.members) if volume_set else 1,
+            archive_size=(
+                volume_set.total_size if volume_set else file.stat().st_size
+            ),
+            extracted_size=size,
+            encrypted=False,
+            password="",
+            candidates=1,
+            status=READY,
+        )
+        try:
+            self.plan_passwords(
+                planned, file, archive_type, volume_set, session
+            )
+        finally:
+            if session is not None:
+                session.close()
+        return planned
+
+    def plan_passwords(
+        self,
+        planned: PlannedArchive,
+        file: Path,
+        archive_type: ArchiveType,
+        volume_set: VolumeSet | None,
+        session: ZipSession | None,
+    ) -> None:
+        files = volume_set.members if volume_set else [file]
+        split_zip = volume_set is not None and volume_set.split
+        if Path(f"{file}_out").exists():
+            # a run skips the archive without opening it
+            planned.status = EXISTS
+            planned.encrypted = planned.password = None
+            planned.candidates = 0
+            return
+        if self.archive_index is not None:
+            original = self.archive_index.acquire(files)
+            if original is not None:
+                planned.status = DUPLICATE
+                planned.duplicate_of = str(original.file)
+                planned.password = original.password
+                return
+        passwords = self.password_order(file)
+        if archive_type == ArchiveType.TAR:
+            candidates: Sequence[str] = [""]
+        elif archive_type == ArchiveType.ZIP and not split_zip:
+            if session is None:
+                planned.encrypted = None
+                candidates = passwords
+            else:
+                try:
+                    planned.encrypted = (
+                        read_aes_verifier(session.zip_file) is not None
+                        or read_zipcrypto_header(session.zip_file) is not None
+                    )
+                except Exception:
+                    logger.exception(
+                        "cannot read encryption header of %s", file
+                    )
+                    planned.encrypted = None
+                candidates = (
+                    self.screen_zip_passwords(session, passwords)[0]
+                    if planned.encrypted is not False
+                    else [""]
+                )
+        else:
+            try:
+                listing, output = list_archive(file)
+            except SevenZipCmdNotFound:
+                listing, output = None, ""
+            if listing is not None:
+                planned.encrypted = any(
+                    entry.encrypted for entry in listing.entries
+                )
+            else:
+                # the headers are encrypted, or 7z cannot list the archive
+                planned.encrypted = "Wrong password" in output or None
+            candidates = (
+                self.probe_7z_passwords(file, passwords)
+                if planned.encrypted is not False
+                else [""]
+            )
+            if planned.extracted_size is None and len(candidates) == 1:
+                with contextlib.suppress(SevenZipCmdNotFound):
+                    listing, _output = list_archive(file, candidates[0])
+                    if listing is not None:
+                        planned.extracted_size = disk_footprint(
+                            entry.size
+                            for entry in listing.entries
+                            if not entry.is_dir
+                        )
+        planned.candidates = len(candidates)
+        planned.password = candidates[0] if len(candidates) == 1 else None
+        if not candidates:
+            planned.status = WRONG_PASSWORD
+        elif len(candidates) > 1:
+            planned.status = UNKNOWN_PASSWORD
+        if self.archive_index is not None:
+            self.archive_index.release(
+                files,
+                ExtractedArchive(file, Path(f"{file}_out"), planned.password)
+                if planned.password is not None
+                else None,
+            )
 
     def is_excluded_file(self, file: Path) -> bool:
         """test if file should be excluded"""
@@ -89,13 +358,40 @@ class PyExtractor:
             file.suffix in self.config.exclude_suffix
             or file.name in self.config.exclude_filename
             or any((sub in file.name for sub in self.config.exclude_substrings))
-            or bool(
-                re.search(
-                    r"part(?:[2-9]|[1-9][0-9]|100|0[2-9])\.(rar|RAR)", str(file)
-                )
-            )
         )
 
+    def zip_encoding_order(
+        self,
+        session: ZipSession | None,
+        default_encoding: str = "utf-8",
+        preferred: str | None = None,
+    ) -> list[str]:
+        """Return the metadata encodings to try, the preferred one first, then
+        the one detected from the central directory. The detection runs once
+        per session."""
+        encodings = list(self.config.zip_metadata_encoding)
+        if default_encoding not in encodings:
+            encodings.append(default_encoding)
+        if preferred in encodings:
+            # the encoding of the extraction being resumed
+            encodings.remove(preferred)
+            return [preferred, *encodings]
+        if session is None:
+            return encodings
+        detected = session.detect_encoding(encodings)
+        logger.info("%s detected encoding: %s", session.archive_name, detected)
+        if detected is not None:
+            encodings.remove(detected)
+            encodings.insert(0, detected)
+        return encodings
+
+    def open_zip_session(self, archive_name: Path) -> ZipSession | None:
+        try:
+            return ZipSession(archive_name)
+        except Exception:
+            logger.exception("cannot open %s", archive_name)
+            return None
+
     def extract_zip(
         self,
         archive_name: Path,
@@ -103,13 +399,34 @@ class PyExtractor:
         pwd: str | None = None,
         default_encoding="utf-8",
         aes=False,
+        session: ZipSession | None = None,
+        checkpoint: Checkpoint | None = None,
+        preferred_encoding: str | None = None,
+        guard: ExtractionGuard | None = None,
     ):
         # https://docs.python.org/3/library/zipfile.html#zipfile.ZipFile
         # Monkey patch the decryption of zipfile with C for better performance, it
         # is about 10% slower than the 7z program in testing.
-        additional_encodings = self.config.zip_metadata_encoding
-        if default_encoding not in additional_encodings:
-            additional_encodings.append(default_encoding)
+        if session is None and not aes:
+            session = self.open_zip_session(archive_name)
+            if session is None:
+                return ExtractStatusCode.FAIL
+            with session:
+                return self.extract_zip(
+                    archive_name,
+                    out_path,
+                    pwd,
+                    default_encoding,
+                    session=session,
+                    checkpoint=checkpoint,
+                    preferred_encoding=preferred_encoding,
+                    guard=guard,
+                )
+        if checkpoint is not None and "encoding" in checkpoint.header:
+            preferred_encoding = checkpoint.header["encoding"]
+        additional_encodings = self.zip_encoding_order(
+            session, default_encoding, preferred_encoding
+        )
         # logger.info("encodings: %s", additional_encodings)
         for encoding in additional_encodings:
             # logger.info("extract zip with encoding: %s", encoding)
@@ -124,26 +441,63 @@ class PyExtractor:
                         compression=pyzipper.ZIP_DEFLATED,
                         encryption=pyzipper.WZ_AES,
                     ) as extracted_zip:
-                        extracted_zip.extractall(out_path, pwd=password)
+                        members = list(extracted_zip.NameToInfo.values())
+                        for info in members:
+                            extract_member(
+                                extracted_zip, info, out_path, password, guard
+                            )
+                        extracted = sum(info.file_size for info in members)
                 else:
-                    with zipfile.ZipFile(
-                        archive_name, "r", metadata_encoding=encoding
-                    ) as zip_file:
-                        zip_file.extractall(out_path, pwd=password)
+                    # opened above if it's not given
+                    assert session is not None
+                    session.set_encoding(encoding)
+                    if checkpoint is not None:
+                        checkpoint.set_encoding(encoding)
+                    threads = self.config.extract_threads or os.cpu_count()
+                    start = time.perf_counter()
+                    extracted = session.extractall(
+                        out_path,
+                        pwd=password,
+                        threads=threads or 1,
+                        checkpoint=checkpoint,
+                        guard=guard,
+                    )
+                    logger.info(
+                        "%s, %d bytes extracted at %.1f MB/s",
+                        archive_name,
+                        extracted,
+                        extracted
+                        / 1e6
+                        / max(time.perf_counter() - start, 1e-6),
+                    )
+                self.zip_encodings[archive_name] = encoding
+                if (trace := self.traces.get(archive_name)) is not None:
+                    trace.bytes_out = extracted
                 return ExtractStatusCode.SUCCESS
             except Exception as exc:
-                if out_path.exists():
-                    shutil.rmtree(out_path, onerror=remove_readonly)
+                if isinstance(exc, LimitExceeded):
+                    logger.error("%s, stopped: %s", archive_name, exc)
+                    return ExtractStatusCode.LIMIT_EXCEEDED
                 if isinstance(exc, NotImplementedError):
                     # some algorithms are not supported by zipfile
                     logger.exception(
                         "%s algorithms NotImplemented", archive_name
                     )
+                    # the next attempt starts from an empty directory
+                    self.staging.reset(out_path)
+                    if guard is not None:
+                        guard.reset()
                     if not aes:
                         return self.extract_zip(
-                            archive_name, out_path, pwd=pwd, aes=True
+                            archive_name,
+                            out_path,
+                            pwd=pwd,
+                            aes=True,
+                            guard=guard,
                         )
-                    return self.extract_7z(archive_name, out_path, pwd=pwd)
+                    return self.extract_7z(
+                        archive_name, out_path, pwd=pwd, guard=guard
+                    )
                 if isinstance(exc, UnicodeDecodeError):
                     logger.info("%s cannot decode %s", encoding, archive_name)
                     continue
@@ -162,19 +516,116 @@ class PyExtractor:
         )
         return ExtractStatusCode.WRONG_ENCODING
 
-    def extract_tar(self, archive_name: Path, out_path: Path):
-        return self.extract_7z(archive_name, out_path)
+    def screen_zip_passwords(
+        self,
+        session: ZipSession,
+        passwords: Sequence[str],
+        deadline: float | None = None,
+    ) -> tuple[Sequence[str], bool]:
+        """Return the passwords worth extracting and whether the archive is
+        encrypted with WinZip AES.
+
+        AES passwords are checked against the password verifier. ZipCrypto
+        passwords are tested on the smallest non-empty member with multiple
+        threads, every password is checked then, so none is left if no
+        password is verified. If the member cannot be tested, or only empty
+        members are encrypted, fall back to the passwords which pass the
+        encryption header check. The passwords are kept unscreened if the
+        deadline passes, the caller reports the archive out of time."""
+        archive_name = session.archive_name
+        encodings = [*self.config.zip_metadata_encoding, "utf-8"]
+        threads = self.config.threads
+        try:
+            verifier = read_aes_verifier(session.zip_file)
+            if verifier is not None:
+                candidates = screen_aes_passwords(
+                    verifier, passwords, encodings, threads, deadline
+                )
+                logger.info(
+                    "%s, %d of %d passwords match the AES verifier",
+                    archive_name,
+                    len(candidates),
+                    len(passwords),
+                )
+                return candidates, True
+            header = read_zipcrypto_header(session.zip_file)
+        except LimitExceeded:
+            # only the AES screening has a deadline here
+            logger.info("%s, the screening runs out of time", archive_name)
+            return passwords, True
+        except Exception:
+            logger.exception(
+                "cannot read encryption header of %s", archive_name
+            )
+            return passwords, False
+        if header is None:
+            return passwords, False
+        # the member is empty only if no other member is encrypted, every
+        # password passes its CRC-32 check
+        if header.member.file_size > 0:
+            try:
+                found = find_zipcrypto_password(
+                    session.zip_file,
+                    header,
+                    passwords,
+                    encodings,
+                    threads,
+                    deadline,
+                )
+            except LimitExceeded:
+                logger.info("%s, the screening runs out of time", archive_name)
+                return passwords, False
+            except Exception:
+                logger.exception(
+                    "cannot test the passwords on %s", archive_name
+                )
+            else:
+                if found is None:
+                    logger.info("%s, no password is verified", archive_name)
+                    return [], False
+                logger.info("%s, password found: %s", archive_name, found)
+                return [found], False
+        candidates = screen_zipcrypto_passwords(header, passwords, encodings)
+        logger.info(
+            "%s, %d of %d passwords pass the header check",
+            archive_name,
+            len(candidates),
+            len(passwords),
+        )
+        return candidates, False
+
+    def extract_tar(
+        self,
+        archive_name: Path,
+        out_path: Path,
+        guard: ExtractionGuard | None = None,
+    ):
+        return self.extract_7z(archive_name, out_path, guard=guard)
 
     def extract_rar(
-        self, archive_name: Path, out_path: Path, pwd: str | None = None
+        self,
+        archive_name: Path,
+        out_path: Path,
+        pwd: str | None = None,
+        guard: ExtractionGuard | None = None,
     ):
         # didn't find a usable python library for rar, switch to 7z program
         # 7z reduces absolute paths to relative paths by default
-        return self.extract_7z(archive_name, out_path, pwd)
+        return self.extract_7z(archive_name, out_path, pwd, guard=guard)
 
     def extract_7z(
-        self, archive_name: Path, out_path: Path, pwd: str | None = None
+        self,
+        archive_name: Path,
+        out_path: Path,
+        pwd: str | None = None,
+        include: list[str] | None = None,
+        guard: ExtractionGuard | None = None,
     ):
+        """Extract with the 7z program, only the entries of the include list
+        if it's given, existing files are overwritten then. With a guard the
+        output directory is measured while 7z runs, and 7z is killed once
+        it's over the limits."""
+        list_file = None
         try:
             assert shutil.which("7z")
             cmd = [
@@ -184,6 +635,14 @@ class PyExtractor:
                 archive_name.as_posix(),
                 f"-o{out_path.as_posix()}",
             ]
+            if include is not None:
+                with tempfile.NamedTemporaryFile(
+                    "w", encoding="utf-8", suffix=".txt", delete=False
+                ) as fp:
+                    fp.write("\n".join(include))
+                list_file = fp.name
+                cmd += ["-aoa", "-scsUTF-8", f"@{list_file}"]
+            start = time.perf_counter()
             proc = subprocess.Popen(
                 cmd,
                 shell=False,
@@ -192,13 +651,22 @@ class PyExtractor:
                 stderr=subprocess.PIPE,
                 universal_newlines=True,
             )
-            _stdout, errs = proc.communicate()
+            _stdout, errs = communicate_guarded(proc, out_path, guard)
             rc = proc.returncode
+            if (trace := self.traces.get(archive_name)) is not None:
+                trace.seven_zip_finished(time.perf_counter() - start, rc)
+                if rc == 0:
+                    trace.bytes_out = directory_usage(out_path)[0]
             if rc != 0:
                 raise SevenZipExtractFail(f"Extract fails, {errs}")
         except Exception as exc:
-            if out_path.exists():
-                shutil.rmtree(out_path, onerror=remove_readonly)
+            if isinstance(exc, LimitExceeded):
+                logger.error("%s, 7z is killed: %s", archive_name, exc)
+                if (trace := self.traces.get(archive_name)) is not None:
+                    trace.seven_zip_finished(
+                        time.perf_counter() - start, proc.returncode
+                    )
+                return ExtractStatusCode.LIMIT_EXCEEDED
             if isinstance(exc, AssertionError):
                 logger.exception("7z command not found")
                 raise SevenZipCmdNotFound from exc
@@ -207,77 +675,621 @@ class PyExtractor:
                 return ExtractStatusCode.WRONG_PASSWORD
             logger.exception(archive_name)
             return ExtractStatusCode.FAIL
+        finally:
+            if list_file is not None:
+                os.unlink(list_file)
         return ExtractStatusCode.SUCCESS
 
+    def resume_7z(
+        self,
+        archive_name: Path,
+        out_path: Path,
+        pwd: str | None = None,
+        guard: ExtractionGuard | None = None,
+    ):
+        """Extract the entries which an interrupted extraction didn't write
+        completely, compared with the listing by size and CRC-32"""
+        listing, output = list_archive(archive_name, pwd)
+        if listing is None:
+            logger.error("%s, cannot list: %s", archive_name, output)
+            return self.extract_7z(
+                archive_name, out_path, pwd, include=["*"], guard=guard
+            )
+        missing = [
+            entry.path
+            for entry in listing.entries
+            if not (
+                (out_path / entry.path).is_dir()
+                if entry.is_dir
+                else is_member_complete(
+                    out_path / entry.path, entry.size, entry.crc, None
+                )
+            )
+        ]
+        logger.info(
+            "%s, resume %d of %d entries",
+            archive_name,
+            len(missing),
+            len(listing.entries),
+        )
+        if not missing:
+            return ExtractStatusCode.SUCCESS
+        return self.extract_7z(
+            archive_name, out_path, pwd, include=missing, guard=guard
+        )
+
+    def probe_7z_password(
+        self,
+        archive_name: Path,
+        pwd: str,
+        entry: SevenZipEntry | None,
+        group: ProcessGroup,
+    ) -> ExtractStatusCode:
+        """Test a password without writing to the disk, by decoding a single
+        entry, or by listing the archive if its headers are encrypted"""
+        if entry is None:
+            listing, output = list_archive(archive_name, pwd, group)
+            passed = listing is not None
+        else:
+            passed, output = probe_entry(archive_name, entry, pwd, group)
+        if passed:
+            return ExtractStatusCode.SUCCESS
+        if "Wrong password" in output:
+            return ExtractStatusCode.WRONG_PASSWORD
+        if not group.terminated:
+            logger.error("%s, probe fails: %s", archive_name, output)
+        return ExtractStatusCode.FAIL
+
+    def probe_7z_passwords(
+        self,
+        archive_name: Path,
+        passwords: Sequence[str],
+        deadline: float | None = None,
+    ) -> Sequence[str]:
+        """Find the password of a 7z or rar archive by decoding only its
+        smallest encrypted entry, so that it's extracted once. Passwords are
+        probed by concurrent 7z processes, the others are terminated as soon
+        as one succeeds. Passwords which cannot be probed fall back to full
+        extraction. The probes are terminated once the deadline passes, the
+        passwords are kept unscreened then."""
+        try:
+            listing, output = list_archive(archive_name)
+        except SevenZipCmdNotFound:
+            return passwords
+        if listing is None and "Wrong password" not in output:
+            return passwords
+        entry = None
+        if listing is not None:
+            entry = pick_probe_entry(listing)
+            if entry is None:
+                # nothing is encrypted but empty entries, which don't tell
+                # the password
+                return passwords
+        group = ProcessGroup()
+        failed: set[int] = set()
+        processes = self.config.seven_zip_processes or os.cpu_count() or 1
+        pool = ThreadPoolExecutor(max_workers=processes)
+        # only a window of probes is queued, a store of millions of passwords
+        # isn't turned into as many futures
+        remaining = enumerate(passwords)
+        probes: dict[Future, int] = {}
+
+        def submit(count: int) -> None:
+            for index, pwd in itertools.islice(remaining, count):
+                future = pool.submit(
+                    self.probe_7z_password, archive_name, pwd, entry, group
+                )
+                probes[future] = index
+
+        try:
+            submit(2 * processes)
+            while probes:
+                timeout = None
+                if deadline is not None:
+                    timeout = max(deadline - time.monotonic(), 0)
+                done, _pending = wait(
+                    probes, timeout=timeout, return_when=FIRST_COMPLETED
+                )
+                for future in done:
+                    index = probes.pop(future)
+                    match future.result():
+                        case ExtractStatusCode.SUCCESS:
+                            group.terminate()
+                            pwd = passwords[index]
+                            logger.info(
+                                "%s, password found: %s", archive_name, pwd
+                            )
+                            return [pwd]
+                        case ExtractStatusCode.FAIL:
+                            failed.add(index)
+                if deadline is not None and time.monotonic() > deadline:
+                    group.terminate()
+                    logger.info("%s, the probes run out of time", archive_name)
+                    return passwords
+                submit(len(done))
+        except SevenZipCmdNotFound:
+            return passwords
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+        logger.info(
+            "%s, no password passes the probe, %d probes fail",
+            archive_name,
+            len(failed),
+        )
+        return [passwords[index] for index in sorted(failed)]
+
+    def extract_staged(
+        self,
+        file: Path,
+        archive_type: ArchiveType,
+        out_path: Path,
+        pwd: str,
+        aes: bool = False,
+        session: ZipSession | None = None,
+        split_zip: bool = False,
+        resumed: tuple[Path, Checkpoint] | None = None,
+        preferred_encoding: str | None = None,
+        guard: ExtractionGuard | None = None,
+    ) -> ExtractStatusCode:
+        """Extract into a staging directory which is renamed to out_path on
+        success, failed attempts are removed in the background. The staging
+        directory of an interrupted extraction is resumed if it was
+        extracted with the same password."""
+        if resumed is not None and resumed[1].header.get(
+            "password"
+        ) == password_digest(pwd):
+            staging, checkpoint = resumed
+        else:
+            resumed = None
+            staging = self.staging.create(out_path)
+            checkpoint = Checkpoint(staging)
+            checkpoint.start(file, pwd)
+        status_code = ExtractStatusCode.FAIL
+        try:
+            match archive_type:
+                case ArchiveType.ZIP if not split_zip:
+                    status_code = self.extract_zip(
+                        file,
+                        staging,
+                        pwd,
+                        aes=aes,
+                        session=session,
+                        checkpoint=checkpoint,
+                        preferred_encoding=preferred_encoding,
+                        guard=guard,
+                    )
+                case _ if resumed is not None:
+                    # the other types are extracted by 7z
+                    status_code = self.resume_7z(file, staging, pwd, guard)
+                case ArchiveType.ZIP:
+                    status_code = self.extract_7z(
+                        file, staging, pwd, guard=guard
+                    )
+                case ArchiveType.TAR:
+                    status_code = self.extract_tar(file, staging, guard)
+                case ArchiveType.SEVENTH_ZIP:
+                    status_code = self.extract_7z(
+                        file, staging, pwd, guard=guard
+                    )
+                case ArchiveType.RAR:
+                    status_code = self.extract_rar(file, staging, pwd, guard)
+                case _:
+                    raise AssertionError("Not going to happen")
+        except BaseException as exc:
+            checkpoint.close()
+            if isinstance(exc, Exception) and not (
+                resumed is not None and isinstance(exc, SevenZipCmdNotFound)
+            ):
+                self.staging.discard(staging)
+            else:
+                # interrupted, the next run resumes the staging directory
+                self.staging.release(staging)
+            raise
+        if status_code != ExtractStatusCode.SUCCESS:
+            checkpoint.close()
+            self.staging.discard(staging)
+        else:
+            checkpoint.remove()
+            if not self.staging.commit(staging, out_path):
+                status_code = ExtractStatusCode.FAIL
+        return status_code
+
+    def resume_staging(
+        self, file: Path, out_path: Path, passwords: Sequence[str]
+    ) -> tuple[Path, Checkpoint] | None:
+        """Take the staging directory an interrupted run left for the archive
+        if its checkpoint matches the archive and one of the passwords"""
+        staging = self.staging.take_resumable(out_path)
+        if staging is None:
+            return None
+        checkpoint = Checkpoint.load(staging)
+        if (
+            checkpoint is not None
+            and checkpoint.matches(file)
+            and any(
+                password_digest(pwd) == checkpoint.header.get("password")
+                for pwd in passwords
+            )
+        ):
+            logger.info(
+                "%s, resume with %d members done", file, len(checkpoint.done)
+            )
+            return staging, checkpoint
+        if checkpoint is not None:
+            checkpoint.close()
+        self.staging.discard(staging)
+        return None
+
+    @contextlib.contextmanager
+    def tracing(
+        self,
+        file: Path,
+        archive_type: ArchiveType,
+        volume_set: VolumeSet | None,
+    ) -> Iterator[None]:
+        """Collect the trace of an archive while it's handled and write it
+        at the end, nothing is collected without a trace sink"""
+        if self.trace_sink is None:
+            yield
+            return
+        trace = ArchiveTrace(
+            path=str(file),
+            type=ArchiveType.get_suffix(archive_type),
+            volumes=len(volume_set.members) if volume_set else 1,
+            bytes_in=(
+                volume_set.total_size if volume_set else file.stat().st_size
+            ),
+            detection_seconds=self.detection_times.pop(file, None),
+        )
+        self.traces[file] = trace
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            del self.traces[file]
+            trace.seconds = time.perf_counter() - start
+            trace.status = trace.status or ExtractStatusCode.FAIL.name
+            self.trace_sink.write(trace)
+
+    def set_trace_status(self, file: Path, status: str) -> None:
+        if (trace := self.traces.get(file)) is not None:
+            trace.status = status
+
     def extract_archive(
-        self, file: Path, archive_type: ArchiveType, dir_level: int
+        self,
+        file: Path,
+        archive_type: ArchiveType,
+        dir_level: int,
+        volume_set: VolumeSet | None = None,
     ) -> Path | None:
         """Return output path if status code == SUCCESS, else return None"""
-        target_out_dir = f"{file}_out"
-        out_path = Path(target_out_dir)
-        if out_path.exists():
+        with self.tracing(file, archive_type, volume_set):
+            target_out_dir = f"{file}_out"
+            out_path = Path(target_out_dir)
+            if out_path.exists():
+                print(
+                    f"{'  ' * dir_level}▷ {_('Skipping')}"
+                    f" {filename_color(str(file))} , {_('type')}:"
+                    f" {ArchiveType.get_suffix(archive_type)}"
+                )
+                self.set_trace_status(file, "EXISTS")
+                return out_path
+            if self.config.max_depth and dir_level > self.config.max_depth:
+                print(
+                    f"{'  ' * dir_level}▷ {_('Skipping')}"
+                    f" {filename_color(str(file))} ,"
+                    f" {failed_color(_('nested too deep'))}: {dir_level}"
+                )
+                logger.error(
+                    "%s, %s: nested %d levels deep",
+                    file,
+                    ExtractStatusCode.LIMIT_EXCEEDED.name,
+                    dir_level,
+                )
+                self.set_trace_status(file, "NESTED_TOO_DEEP")
+                return None
             print(
-                f"{'  ' * dir_level}▷ {_('Skipping')}"
+                f"{'  ' * dir_level}▶ {_('Extracting')}"
                 f" {filename_color(str(file))} , {_('type')}:"
                 f" {ArchiveType.get_suffix(archive_type)}"
             )
-            return out_path
+            if self.archive_index is None:
+                extracted = self.extract_within_budget(
+                    file, archive_type, out_path, dir_level, volume_set
+                )
+                return extracted.out_path if extracted else None
+            files = volume_set.members if volume_set else [file]
+            original = self.archive_index.acquire(files)
+            if original is not None:
+                return self.extract_duplicate(
+                    file,
+                    archive_type,
+                    out_path,
+                    dir_level,
+                    volume_set,
+                    original,
+                )
+            extracted = None
+            try:
+                extracted = self.extract_within_budget(
+                    file, archive_type, out_path, dir_level, volume_set
+                )
+            finally:
+                self.archive_index.release(files, extracted)
+            return extracted.out_path if extracted else None
+
+    def extract_duplicate(
+        self,
+        file: Path,
+        archive_type: ArchiveType,
+        out_path: Path,
+        dir_level: int,
+        volume_set: VolumeSet | None,
+        original: ExtractedArchive,
+    ) -> Path | None:
+        """Skip an archive with the same content as one extracted in this run
+        or link the output of that one. It's extracted with the password and
+        the encoding of the original if the output cannot be linked."""
         indent = "".join(["  " * dir_level, "└──"])
         print(
-            f"{'  ' * dir_level}▶ {_('Extracting')}"
-            f" {filename_color(str(file))} , {_('type')}:"
-            f" {ArchiveType.get_suffix(archive_type)}"
+            f"{indent} {_('duplicate of')}"
+            f" {filename_color(str(original.file))}"
         )
+        if original.encoding is not None:
+            self.zip_encodings[file] = original.encoding
+        if self.config.dedup == "skip" and original.out_path.is_dir():
+            self.record_outcome(
+                file,
+                archive_type,
+                ExtractStatusCode.SUCCESS,
+                original.password,
+                original.out_path,
+            )
+            self.set_trace_status(file, "DUPLICATE")
+            return original.out_path
+        start = time.time()
+        staging = self.staging.create(out_path)
+        try:
+            if not original.out_path.is_dir():
+                raise FileNotFoundError(original.out_path)
+            link_tree(original.out_path, staging, self.config.dedup)
+        except OSError:
+            logger.exception("cannot link %s", original.out_path)
+            self.staging.discard(staging)
+        else:
+            if self.staging.commit(staging, out_path):
+                print(
+                    f"{indent} {done_color(_('Done'))}"
+                    f" {filename_color(str(file))} {_('extracted to')}"
+                    f" {filename_color(str(out_path))}"
+                    f" , {_('time cost')}: {round(time.time() - start)}s"
+                )
+                logger.info(
+                    "%s is linked from %s to %s",
+                    file,
+                    original.out_path,
+                    out_path,
+                )
+                self.record_outcome(
+                    file,
+                    archive_type,
+                    ExtractStatusCode.SUCCESS,
+                    original.password,
+                    out_path,
+                )
+                self.set_trace_status(file, "DUPLICATE")
+                return out_path
+        extracted = self.extract_within_budget(
+            file, archive_type, out_path, dir_level, volume_set, original
+        )
+        return extracted.out_path if extracted else None
+
+    def extract_within_budget(
+        self,
+        file: Path,
+        archive_type: ArchiveType,
+        out_path: Path,
+        dir_level: int,
+        volume_set: VolumeSet | None = None,
+        known: ExtractedArchive | None = None,
+    ) -> ExtractedArchive | None:
+        """Reserve the planned size on the file system of out_path during the
+        extraction, the archive is deferred if it doesn't fit"""
+        size = self.planned_sizes.get(file)
+        if size is None:
+            return self.extract_with_passwords(
+                file, archive_type, out_path, dir_level, volume_set, known
+            )
+        if not self.disk_budget.reserve(out_path.parent, size):
+            self.report_deferred(file, out_path, size, dir_level)
+            return None
+        try:
+            return self.extract_with_passwords(
+                file, archive_type, out_path, dir_level, volume_set, known
+            )
+        finally:
+            self.disk_budget.release(out_path.parent, size)
+
+    def report_deferred(
+        self, file: Path, out_path: Path, size: int, dir_level: int
+    ) -> None:
+        available = self.disk_budget.available(out_path.parent)
+        indent = "".join(["  " * dir_level, "└──"])
+        output_same_line(
+            f"{indent} {failed_color(_('Deferred'))}"
+            f" {filename_color(str(file))}"
+            f" {failed_color(_('not enough disk space'))}:"
+            f" {size / 1e6:,.0f} MB > {max(available, 0) / 1e6:,.0f} MB\n"
+        )
+        logger.error(
+            "%s, %s: %d bytes to extract, %d bytes available",
+            file,
+            ExtractStatusCode.DEFERRED.name,
+            size,
+            available,
+        )
+        self.set_trace_status(file, ExtractStatusCode.DEFERRED.name)
+
+    def password_order(
+        self, file: Path, known: ExtractedArchive | None = None
+    ) -> PasswordOrder:
+        """The empty password is the first one of the store, it goes first,
+        then the password of a known copy of the archive, then the others in
+        the order learned from the previous hits"""
+        store = self.config.passwords
+        front = [0]
+        if known is not None and known.password in store:
+            front.append(store.index(known.password))
+        front.extend(self.password_ranking.rank(file))
+        return store.ordered(front)
+
+    def extract_with_passwords(
+        self,
+        file: Path,
+        archive_type: ArchiveType,
+        out_path: Path,
+        dir_level: int,
+        volume_set: VolumeSet | None = None,
+        known: ExtractedArchive | None = None,
+    ) -> ExtractedArchive | None:
+        """Try the passwords until one extracts the archive, the password and
+        the encoding of a known archive with the same content go first"""
+        indent = "".join(["  " * dir_level, "└──"])
         pwd = ""
         start = time.time()
-        passwords_list = self.config.passwords
-        # prepend empty password into passwords list
-        passwords_list.insert(0, "")
+        deadline = None
+        if self.config.time_limit:
+            deadline = time.monotonic() + self.config.time_limit
+        archive_size = (
+            volume_set.total_size if volume_set else file.stat().st_size
+        )
+        passwords_list: Sequence[str] = self.password_order(file, known)
+        ordered_passwords = passwords_list
+        aes = False
+        # zipfile cannot read split zip archives
+        split_zip = volume_set is not None and volume_set.split
+        if volume_set is not None:
+            logger.info(
+                "%s, %d volumes, %d bytes",
+                file,
+                len(volume_set.members),
+                volume_set.total_size,
+            )
+        trace = self.traces.get(file)
+        # the central directory is parsed once for the screening and all the
+        # attempts
+        session = None
+        screen_start = time.perf_counter()
+        if archive_type == ArchiveType.ZIP and not split_zip:
+            session = self.open_zip_session(file)
+            if session is not None:
+                passwords_list, aes = self.screen_zip_passwords(
+                    session, passwords_list, deadline
+                )
+        elif archive_type != ArchiveType.TAR:
+            passwords_list = self.probe_7z_passwords(
+                file, passwords_list, deadline
+            )
+        if trace is not None:
+            trace.screen_seconds = time.perf_counter() - screen_start
+        resumed = None
+        if self.config.resume:
+            resumed = self.resume_staging(file, out_path, passwords_list)
+        if resumed is not None:
+            digest = resumed[1].header["password"]
+            # the password of the interrupted extraction goes first
+            passwords_list = sorted(
+                passwords_list, key=lambda pwd: password_digest(pwd) != digest
+            )
+            print(f"{indent} {_('resume the interrupted extraction')}")
         failed_msg = ""
+        seven_zip_missing = False
         status_code = ExtractStatusCode.FAIL
-        for pwd in passwords_list:
-            output_same_line(f"{indent} {_('try password')} {pwd}")
-            try:
-                match archive_type:
-                    case ArchiveType.ZIP:
-                        status_code = self.extract_zip(file, out_path, pwd)
-                    case ArchiveType.TAR:
-                        status_code = self.extract_tar(file, out_path)
-                    case ArchiveType.SEVENTH_ZIP:
-                        status_code = self.extract_7z(file, out_path, pwd)
-                    case ArchiveType.RAR:
-                        status_code = self.extract_rar(file, out_path, pwd)
-                    case _:
-                        raise AssertionError("Not going to happen")
-                match status_code:
-                    case ExtractStatusCode.WRONG_PASSWORD:
-                        continue
-                    case _:
-                        break
-
-            except SevenZipCmdNotFound:
-                failed_msg = _(
-                    "Din't find 7z command, please make sure 7z is"
-                    " installed and available in PATH"
+        try:
+            for pwd in passwords_list:
+                if deadline is not None and time.monotonic() > deadline:
+                    logger.error("%s, no password found in time", file)
+                    status_code = ExtractStatusCode.LIMIT_EXCEEDED
+                    break
+                output_same_line(f"{indent} {_('try password')} {pwd}")
+                attempt_start = time.perf_counter()
+                # every attempt starts from an empty staging directory
+                guard = ExtractionGuard(
+                    archive_size,
+                    max_ratio=self.config.max_ratio,
+                    max_bytes=self.config.max_bytes,
+                    max_entries=self.config.max_entries,
+                    deadline=deadline,
                 )
-                break
-        else:
-            failed_msg = _("None of the passwords can decrypt the archive")
-            logger.error("No passwords can decrypt %s", file)
+                try:
+                    status_code = self.extract_staged(
+                        file,
+                        archive_type,
+                        out_path,
+                        pwd,
+                        aes=aes,
+                        session=session,
+                        split_zip=split_zip,
+                        resumed=resumed,
+                        preferred_encoding=known.encoding if known else None,
+                        guard=guard,
+                    )
+                    resumed = None
+                    attempt_time = time.perf_counter() - attempt_start
+                    if trace is not None:
+                        trace.attempts += 1
+                        trace.attempt_seconds.append(attempt_time)
+                    match status_code:
+                        case ExtractStatusCode.WRONG_PASSWORD:
+                            continue
+                        case _:
+                            break
+
+                except SevenZipCmdNotFound:
+                    seven_zip_missing = True
+                    failed_msg = _(
+                        "Din't find 7z command, please make sure 7z is"
+                        " installed and available in PATH"
+                    )
+                    break
+            else:
+                status_code = ExtractStatusCode.WRONG_PASSWORD
+                failed_msg = _("None of the passwords can decrypt the archive")
+                logger.error("No passwords can decrypt %s", file)
+        finally:
+            if session is not None:
+                session.close()
         if status_code == ExtractStatusCode.SUCCESS:
             end = time.time()
             time_cost = round(end - start)
+            # archive bytes per second of the successful attempt, comparable
+            # between the zipfile and the 7z paths
+            speed = archive_size / 1e6 / max(attempt_time, 1e-6)
+            if trace is not None:
+                trace.mb_per_s = speed
             output_same_line(f"{indent} {_('password')} {pwd} {_('matches')}\n")
             print(
                 f"{indent} {done_color(_('Done'))}"
                 f" {filename_color(str(file))} {_('extracted to')}"
                 f" {filename_color(str(out_path))}"
                 f" , {_('time cost')}: {time_cost}s"
+                f" , {_('speed')}: {speed:.1f} MB/s"
             )
             logger.info("%s is extracted to %s", file, out_path)
-            return out_path
+            self.record_outcome(file, archive_type, status_code, pwd, out_path)
+            if pwd:
+                self.password_ranking.record_hit(file, pwd)
+                self.password_attempts.append(ordered_passwords.index(pwd) + 1)
+            return ExtractedArchive(
+                file, out_path, pwd, self.zip_encodings.get(file)
+            )
+        if not seven_zip_missing:
+            # a missing 7z command is not a property of the archive
+            self.record_outcome(file, archive_type, status_code)
         if status_code == ExtractStatusCode.WRONG_ENCODING:
             failed_msg = _("None of the encodings can decode the archive")
+        if status_code == ExtractStatusCode.LIMIT_EXCEEDED:
+            failed_msg = _("the extraction goes over the limits")
         if not failed_msg:
             failed_msg = _("Invalid archive")
         output_same_line(
@@ -286,49 +1298,243 @@ class PyExtractor:
         )
         return None
 
-    def extract_archives_recursively(
-        self, target_dir: str | Path, dir_level: int = 0
+    def detect_archive_type(
+        self, file: Path, size: int | None = None
+    ) -> ArchiveType | None:
+        start = time.perf_counter()
+        try:
+            return detect_archive_type(file, size)
+        except Exception:
+            logger.exception("%s", file)
+            return None
+        finally:
+            if self.trace_sink is not None:
+                self.detection_times[file] = time.perf_counter() - start
+
+    def classify_file(
+        self, file: Path, entry: os.DirEntry
+    ) -> ArchiveType | None:
+        """Return the archive type of a file, files which are not changed
+        since the previous run are answered by the manifest. Archives which
+        failed are not retried unless the password file or config changed."""
+        if self.manifest is None or self.dry_run:
+            return self.detect_archive_type(file)
+        stat_result = entry.stat(follow_symlinks=False)
+        record = self.manifest.lookup(file, stat_result)
+        if record is None:
+            archive_type = self.detect_archive_type(file, stat_result.st_size)
+            if archive_type is None:
+                self.manifest.record(file, None)
+            return archive_type
+        if record.archive_type is None:
+            return None
+        if (
+            record.status not in (None, ExtractStatusCode.SUCCESS.name)
+            and record.fingerprint == self.manifest.fingerprint
+        ):
+            logger.info("%s failed before: %s, skip", file, record.status)
+            return None
+        return ArchiveType(record.archive_type)
+
+    def record_outcome(
+        self,
+        file: Path,
+        archive_type: ArchiveType,
+        status_code: ExtractStatusCode,
+        pwd: str | None = None,
+        out_path: Path | None = None,
     ) -> None:
-        # don't match files in subdirs if in root directory
-        dirs_to_rename_files: set[Path] = set()
-        files = (
-            Path(target_dir).iterdir()
-            if dir_level == 0
-            else Path(target_dir).glob("**/*")
+        password_index = None
+        if status_code == ExtractStatusCode.SUCCESS and pwd is not None:
+            # index in the password store, the empty password is the first
+            password_index = self.config.passwords.index(pwd)
+        if (trace := self.traces.get(file)) is not None:
+            trace.status = status_code.name
+            trace.password_index = password_index
+            trace.encoding = self.zip_encodings.get(file)
+        if self.manifest is None:
+            return
+        self.manifest.record(
+            file,
+            archive_type.value,
+            status=status_code.name,
+            password_index=password_index,
+            encoding=self.zip_encodings.get(file),
+            out_path=out_path,
+        )
+
+    def report_missing_volumes(
+        self, volume_set: VolumeSet, dir_level: int
+    ) -> None:
+        self.incomplete_volume_sets.append(volume_set)
+        missing = ", ".join(str(number) for number in volume_set.missing)
+        print(
+            f"{'  ' * dir_level}▷ {_('Skipping')}"
+            f" {filename_color(volume_set.name)} ,"
+            f" {failed_color(_('missing volumes'))}: {missing}"
+        )
+        logger.error(
+            "%s, %s: missing volumes %s",
+            volume_set.name,
+            ExtractStatusCode.MISSING_VOLUMES.name,
+            missing,
         )
 
-        for file in files:
-            if (not file.is_file()) or self.is_excluded_file(file):
+    def find_archives(
+        self, target_dir: str | Path, dir_level: int
+    ) -> Iterator[tuple[Path, ArchiveType, VolumeSet | None]]:
+        # don't match files in subdirs if in root directory
+        staging_dirs: list[str] = []
+        entries = [
+            entry
+            for entry in scan_files(
+                target_dir, recursive=dir_level > 0, staging_dirs=staging_dirs
+            )
+            if not self.is_excluded_file(Path(entry.path))
+        ]
+        if not self.dry_run:
+            self.staging.sweep(staging_dirs)
+        volume_sets, standalone = group_volumes(entries)
+        entries_by_path = {Path(entry.path): entry for entry in entries}
+        # only the first volume of a set is extracted
+        for volume_set in volume_sets:
+            file = volume_set.first
+            if file in self.handled_archives:
+                continue
+            self.handled_archives.update(volume_set.members)
+            if not volume_set.complete:
+                self.report_missing_volumes(volume_set, dir_level)
+                continue
+            if volume_set.kind == SPLIT_ZIP:
+                yield file, ArchiveType.ZIP, volume_set
                 continue
+            archive_type = self.classify_file(file, entries_by_path[file])
+            if archive_type is not None:
+                yield file, archive_type, volume_set
+        for entry in standalone:
+            file = Path(entry.path)
             if file not in self.handled_archives:
                 self.handled_archives.add(file)
             else:
                 continue
-            try:
-                file_type = magic.from_buffer(
-                    open(file, "rb").read(2048), mime=True
+            archive_type = self.classify_file(file, entry)
+            if archive_type is not None:
+                yield file, archive_type, None
+
+    def register_extracted(
+        self, archives: list[tuple[Path, ArchiveType, VolumeSet | None]]
+    ) -> None:
+        """Add the archives whose output exists to the index before any of
+        the archives is extracted, so their copies are skipped or linked in
+        later runs too. The passwords of the previous runs are unknown."""
+        if self.archive_index is None:
+            return
+        for file, _archive_type, volume_set in archives:
+            out_path = Path(f"{file}_out")
+            if out_path.is_dir():
+                self.archive_index.register(
+                    volume_set.members if volume_set else [file],
+                    ExtractedArchive(file, out_path, None),
                 )
-            except Exception:
-                logger.exception("%s", file)
-                continue
-            try:
-                archive_type = ArchiveType(file_type)
-            except ValueError:
-                pass
-            else:
-                out_dir = self.extract_archive(file, archive_type, dir_level)
-                if out_dir:
-                    self.extract_archives_recursively(
-                        out_dir.as_posix(), dir_level=dir_level + 1
+
+    def extract_archive_grouped(
+        self,
+        output: GroupedOutput | None,
+        file: Path,
+        archive_type: ArchiveType,
+        dir_level: int,
+        volume_set: VolumeSet | None,
+    ) -> Path | None:
+        if output is None:
+            return self.extract_archive(
+                file, archive_type, dir_level, volume_set
+            )
+        with output.group():
+            return self.extract_archive(
+                file, archive_type, dir_level, volume_set
+            )
+
+    def plan_archives(
+        self, archives: list[tuple[Path, ArchiveType, VolumeSet | None]]
+    ) -> list[tuple[Path, ArchiveType, VolumeSet | None]]:
+        """Read the extracted sizes of the archives found in a directory from
+        their indexes and order them by the configured schedule, so that
+        the archives which fit in the free space are extracted first. In
+        scan order nothing is read, and no archive is deferred."""
+        if self.config.schedule not in SIZED_SCHEDULES:
+            return archives
+        sizes = []
+        for file, archive_type, volume_set in archives:
+            split_zip = volume_set is not None and volume_set.split
+            size = extracted_size(file, archive_type, split_zip)
+            logger.info("%s, %s bytes to extract", file, size)
+            self.planned_sizes[file] = size
+            sizes.append(size)
+        planned = sorted(
+            zip(archives, sizes), key=schedule_key(self.config.schedule)
+        )
+        return [archive for archive, _size in planned]
+
+    def extract_archives_in_dirs(
+        self, dirs: dict[Path, int]
+    ) -> dict[Path, int]:
+        """Extract archives with a pool of workers, the output directory of an
+        extracted archive is queued as new work and walked once. Only this
+        thread touches handled_archives, workers only run extract_archive.
+        Return the directories with files to rename and their levels."""
+        dirs_to_rename_files: dict[Path, int] = {}
+        walked_dirs: set[Path] = set()
+        workers = self.config.workers
+        output = GroupedOutput(sys.stdout) if workers > 1 else None
+        jobs: dict[Future, tuple[Path, int]] = {}
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+
+            def schedule(directory: Path, level: int) -> None:
+                planned = self.plan_archives(
+                    list(self.find_archives(directory, level))
+                )
+                self.register_extracted(planned)
+                for file, archive_type, volume_set in planned:
+                    future = pool.submit(
+                        self.extract_archive_grouped,
+                        output,
+                        file,
+                        archive_type,
+                        level,
+                        volume_set,
                     )
-                else:
-                    # TODO: figure out a way to only rename failed archives, otherwise extracted archives will be renamed too
-                    if self.file_rename.has_unwanted_substrings_in_filenames(
-                        file.parent
-                    ):
-                        dirs_to_rename_files.add(file.parent)
-        if dirs_to_rename_files:
-            self.file_rename.rename_files_in_dirs(dirs_to_rename_files)
+                    jobs[future] = (file, level)
+
+            with contextlib.redirect_stdout(output or sys.stdout):
+                for directory, level in dirs.items():
+                    schedule(directory, level)
+                while jobs:
+                    done, _pending = wait(jobs, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        file, level = jobs.pop(future)
+                        out_dir = future.result()
+                        if out_dir:
+                            if out_dir not in walked_dirs:
+                                walked_dirs.add(out_dir)
+                                schedule(out_dir, level + 1)
+                            continue
+                        # TODO: figure out a way to only rename failed archives, otherwise extracted archives will be renamed too
+                        if self.file_rename.has_unwanted_substrings_in_filenames(
+                            file.parent
+                        ):
+                            dirs_to_rename_files.setdefault(file.parent, level)
+        return dirs_to_rename_files
+
+    def extract_archives_recursively(
+        self, target_dir: str | Path, dir_level: int = 0
+    ) -> None:
+        dirs = {Path(target_dir): dir_level}
+        while dirs:
+            dirs_to_rename_files = self.extract_archives_in_dirs(dirs)
+            dirs = {}
+            if not dirs_to_rename_files:
+                break
+            self.file_rename.rename_files_in_dirs(set(dirs_to_rename_files))
             if self.file_rename.auto_rename:
                 choice = "y"
                 print(f"{_('retry extracting')}:")
@@ -338,8 +1544,7 @@ class PyExtractor:
                 )
                 choice = input().lower()
             if choice in ["y", "Y"]:
-                for d in dirs_to_rename_files:
-                    self.extract_archives_recursively(d, dir_level=dir_level)
+                dirs = dirs_to_rename_files
 
 
 if __name__ == "__main__":
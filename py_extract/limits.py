@@ -0,0 +1,124 @@
+import os
+import subprocess
+import threading
+import time
+from pathlib import Path
+
+from .exceptions import LimitExceeded
+
+# the compression ratio isn't checked until this many bytes are extracted,
+# small archives of text easily compress more than any sane limit
+RATIO_GRACE = 64 * 1024 * 1024
+# seconds between the checks of the output of 7z
+POLL_INTERVAL = 1.0
+
+
+def directory_usage(path: str | Path) -> tuple[int, int]:
+    """Return the bytes of the files under path and the number of entries"""
+    size, entries = 0, 0
+    stack = [os.fspath(path)]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    entries += 1
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    else:
+                        size += entry.stat(follow_symlinks=False).st_size
+        except FileNotFoundError:
+            # 7z hasn't created the output directory yet
+            continue
+    return size, entries
+
+
+class ExtractionGuard:
+    """Count what an extraction writes and raise LimitExceeded as soon as it
+    goes over one of the limits, 0 means no limit. The zip extraction counts
+    the members as they're streamed, the output of 7z is measured while it
+    runs. It's shared by the threads extracting one archive."""
+
+    def __init__(
+        self,
+        archive_size: int,
+        max_ratio: float = 0,
+        max_bytes: int = 0,
+        max_entries: int = 0,
+        deadline: float | None = None,
+    ) -> None:
+        self.archive_size = archive_size
+        self.max_ratio = max_ratio
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        # time.monotonic() the extraction of the archive has to end by
+        self.deadline = deadline
+        self.written = 0
+        self.entries = 0
+        self._lock = threading.Lock()
+
+    def check(self) -> None:
+        """Raise LimitExceeded if the output or the time is over a limit"""
+        written, entries = self.written, self.entries
+        if self.max_entries and entries > self.max_entries:
+            raise LimitExceeded(
+                f"more than {self.max_entries} entries are extracted"
+            )
+        if self.max_bytes and written > self.max_bytes:
+            raise LimitExceeded(
+                f"more than {self.max_bytes} bytes are extracted"
+            )
+        if (
+            self.max_ratio
+            and written > RATIO_GRACE
+            and written > self.max_ratio * max(self.archive_size, 1)
+        ):
+            raise LimitExceeded(
+                f"{written} bytes are extracted from {self.archive_size}"
+                f" bytes, the compression ratio is over {self.max_ratio:g}"
+            )
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise LimitExceeded("the extraction runs out of time")
+
+    def reset(self) -> None:
+        """Forget the output of a failed attempt, the deadline is kept"""
+        with self._lock:
+            self.written, self.entries = 0, 0
+
+    def add_entry(self) -> None:
+        with self._lock:
+            self.entries += 1
+        self.check()
+
+    def add_bytes(self, size: int) -> None:
+        with self._lock:
+            self.written += size
+        self.check()
+
+    def measure(self, path: str | Path) -> None:
+        """Take the output from the files under path, for the extractions
+        which aren't streamed through the guard"""
+        written, entries = directory_usage(path)
+        with self._lock:
+            self.written, self.entries = written, entries
+        self.check()
+
+
+def communicate_guarded(
+    proc: subprocess.Popen, out_path: str | Path, guard: ExtractionGuard | None
+) -> tuple[str, str]:
+    """Wait for a process extracting to out_path like Popen.communicate, it's
+    killed if the guard finds its output over the limits"""
+    if guard is None:
+        return proc.communicate()
+    while True:
+        try:
+            # no output is lost when the communication is retried
+            return proc.communicate(timeout=POLL_INTERVAL)
+        except subprocess.TimeoutExpired:
+            pass
+        try:
+            guard.measure(out_path)
+        except LimitExceeded:
+            proc.kill()
+            proc.communicate()
+            raise
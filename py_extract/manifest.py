@@ -0,0 +1,132 @@
+import dataclasses
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+SCHEMA = """\
+CREATE TABLE IF NOT EXISTS archives (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    archive_type TEXT,
+    status TEXT,
+    password_index INTEGER,
+    encoding TEXT,
+    out_path TEXT,
+    fingerprint TEXT NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+# rows of the files which are not archives are committed in batches, the
+# outcomes of the archives right away
+COMMIT_INTERVAL = 1000
+
+
+@dataclasses.dataclass
+class ManifestRecord:
+    """What is known about a file from a previous run. archive_type is None if
+    the file is not an archive, status is None if it's not extracted yet."""
+
+    archive_type: str | None
+    status: str | None
+    password_index: int | None
+    encoding: str | None
+    out_path: str | None
+    fingerprint: str
+
+
+def settings_fingerprint(*paths: str) -> str:
+    """Hash the content of the password file and the config file, failed
+    archives are retried when one of them changes"""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as fp:
+            digest.update(hashlib.sha256(fp.read()).digest())
+    return digest.hexdigest()
+
+
+class ExtractionManifest:
+    """SQLite manifest of the files seen by previous runs, keyed by path,
+    size, mtime and inode. It's shared by the worker threads.
+
+    The rows are written ahead to a WAL journal without a sync per commit.
+    A crash loses at most the last batch of files which are not archives,
+    they're detected again by the next run."""
+
+    def __init__(self, path: str | Path, fingerprint: str) -> None:
+        self.fingerprint = fingerprint
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._uncommitted = 0
+        with self._lock, self._conn:
+            self._conn.execute(SCHEMA)
+
+    def lookup(
+        self, file: Path, stat_result: os.stat_result
+    ) -> ManifestRecord | None:
+        """Return the record of the file, None if the file is new or changed"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, inode, archive_type, status,"
+                " password_index, encoding, out_path, fingerprint"
+                " FROM archives WHERE path = ?",
+                (str(file),),
+            ).fetchone()
+        if row is None or tuple(row[:3]) != (
+            stat_result.st_size,
+            stat_result.st_mtime_ns,
+            stat_result.st_ino,
+        ):
+            return None
+        return ManifestRecord(*row[3:])
+
+    def record(
+        self,
+        file: Path,
+        archive_type: str | None,
+        status: str | None = None,
+        password_index: int | None = None,
+        encoding: str | None = None,
+        out_path: Path | None = None,
+    ) -> None:
+        try:
+            stat_result = file.stat()
+        except OSError:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO archives VALUES"
+                " (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    str(file),
+                    stat_result.st_size,
+                    stat_result.st_mtime_ns,
+                    stat_result.st_ino,
+                    archive_type,
+                    status,
+                    password_index,
+                    encoding,
+                    str(out_path) if out_path else None,
+                    self.fingerprint,
+                    time.time(),
+                ),
+            )
+            self._uncommitted += 1
+            if status is not None or self._uncommitted >= COMMIT_INTERVAL:
+                self._commit()
+
+    def _commit(self) -> None:
+        self._conn.commit()
+        self._uncommitted = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._commit()
+            self._conn.close()
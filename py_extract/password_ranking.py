@@ -0,0 +1,123 @@
+import re
+import sqlite3
+import threading
+import time
+from collections.abc import Sequence
+from pathlib import Path
+
+from .checkpoint import password_digest
+
+SCHEMA = """\
+CREATE TABLE IF NOT EXISTS password_hits (
+    hint TEXT NOT NULL,
+    password TEXT NOT NULL,
+    score REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (hint, password)
+)
+"""
+# a hit counts half as much after 30 days
+HALF_LIFE = 30 * 24 * 3600
+# kinds of source hints an archive is ranked by, besides all archives
+HINT_KINDS = ("directory", "name")
+
+
+def name_pattern(name: str) -> str:
+    """Archives from one source often differ only by numbers, e.g. dates,
+    episodes or volume numbers"""
+    return re.sub(r"\d+", "#", name.lower())
+
+
+def source_hints(file: Path, hint_kinds: list[str]) -> list[str]:
+    """Return the keys which the hits of the archive are counted under, the
+    first one counts the hits of all archives"""
+    hints = [""]
+    if "directory" in hint_kinds:
+        hints.append(f"directory:{file.parent.name}")
+    if "name" in hint_kinds:
+        hints.append(f"name:{name_pattern(file.name)}")
+    return hints
+
+
+class PasswordRanking:
+    """Hits of the passwords, decayed by their age, so the passwords which
+    opened recent archives of the same source are tried first. Passwords
+    are stored as sha256 digests. It's shared by the worker threads."""
+
+    def __init__(
+        self,
+        path: str | Path,
+        passwords: Sequence[str],
+        hint_kinds: list[str],
+        half_life: float = HALF_LIFE,
+    ) -> None:
+        self.passwords = passwords
+        self.hint_kinds = hint_kinds
+        self.half_life = half_life
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(SCHEMA)
+            rows = self._conn.execute(
+                "SELECT hint, password, score, updated_at FROM password_hits"
+            ).fetchall()
+        self._hits: dict[tuple[str, str], tuple[float, float]] = {
+            (hint, digest): (score, updated_at)
+            for hint, digest, score, updated_at in rows
+        }
+        # indices of the passwords with hits, found on the first ranking
+        self._indices: dict[str, int] | None = None
+
+    def _score(self, hint: str, digest: str, now: float) -> float:
+        score, updated_at = self._hits.get((hint, digest), (0.0, now))
+        return score * 0.5 ** (max(now - updated_at, 0) / self.half_life)
+
+    def _password_indices(self) -> dict[str, int]:
+        """Map the digests with hits to the password indices, the passwords
+        are hashed once per run"""
+        if self._indices is None:
+            digests = {digest for _hint, digest in self._hits}
+            self._indices = {}
+            if digests:
+                for index, pwd in enumerate(self.passwords):
+                    digest = password_digest(pwd)
+                    if digest in digests:
+                        self._indices.setdefault(digest, index)
+        return self._indices
+
+    def rank(self, file: Path) -> list[int]:
+        """Return the indices of the passwords with hits, sorted by their hits
+        on archives with the same source hints, then by their hits on all
+        archives, then by the file order. The others are tried after them."""
+        hints = source_hints(file, self.hint_kinds)
+        now = time.time()
+        with self._lock:
+            keys = []
+            for digest, index in self._password_indices().items():
+                specific = sum(
+                    self._score(hint, digest, now) for hint in hints[1:]
+                )
+                keys.append((-specific, -self._score("", digest, now), index))
+        return [key[2] for key in sorted(keys)]
+
+    def record_hit(self, file: Path, pwd: str) -> None:
+        digest = password_digest(pwd)
+        now = time.time()
+        try:
+            index = self.passwords.index(pwd)
+        except ValueError:
+            index = None
+        with self._lock, self._conn:
+            if index is not None:
+                self._password_indices().setdefault(digest, index)
+            for hint in source_hints(file, self.hint_kinds):
+                score = self._score(hint, digest, now) + 1
+                self._hits[(hint, digest)] = (score, now)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO password_hits VALUES (?, ?, ?, ?)",
+                    (hint, digest, score, now),
+                )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,377 @@
+import contextlib
+import hashlib
+import json
+import mmap
+import os
+import sys
+import tempfile
+from array import array
+from bisect import bisect_right
+from collections.abc import Sequence
+from itertools import compress
+from logging import getLogger
+from operator import ne
+from pathlib import Path
+from typing import Iterator
+
+from .utils import load_passwords
+
+logger = getLogger(__name__)
+
+MAGIC = b"PYEXPWD1"
+CACHE_SUFFIX = ".py_extract_cache"
+# offset of a password which cannot be encoded
+NOT_ENCODED = 2**64 - 1
+CANONICAL_ENCODING = "utf-8"
+
+
+def cache_path(password_path: str | Path) -> Path:
+    """The compiled store is kept next to the password file"""
+    path = Path(password_path)
+    return path.with_name(f".{path.name}{CACHE_SUFFIX}")
+
+
+def _hash(pwd: bytes) -> int:
+    return int.from_bytes(
+        hashlib.blake2b(pwd, digest_size=8).digest(), "little"
+    )
+
+
+def _align(size: int) -> int:
+    return (size + 7) & ~7
+
+
+def compile_passwords(
+    passwords: list[str], encodings: list[str], source: os.stat_result
+) -> bytes:
+    """Compile the passwords into the store format:
+
+    - the magic and the length of a JSON header, then the header
+    - for every password and encoding the offset and the length of the
+      encoded password in the pool, identical bytes share one copy
+    - an open addressing table of the canonical encoding to the indices
+    - the pool of the encoded passwords
+    """
+    entries = array("Q")
+    pool = bytearray()
+    offsets: dict[bytes, int] = {}
+    for pwd in passwords:
+        for encoding in encodings:
+            try:
+                encoded = pwd.encode(encoding)
+            except UnicodeEncodeError:
+                entries.extend((NOT_ENCODED, 0))
+                continue
+            offset = offsets.get(encoded)
+            if offset is None:
+                offset = offsets[encoded] = len(pool)
+                pool += encoded
+            entries.extend((offset, len(encoded)))
+    table_size = 1 << max(len(passwords) * 2, 1).bit_length()
+    table = array("Q", bytes(8 * table_size))
+    for index, pwd in enumerate(passwords):
+        slot = _hash(pwd.encode(CANONICAL_ENCODING)) & (table_size - 1)
+        while table[slot]:
+            slot = (slot + 1) & (table_size - 1)
+        table[slot] = index + 1
+    header = json.dumps(
+        {
+            "source_size": source.st_size,
+            "source_mtime_ns": source.st_mtime_ns,
+            "byteorder": sys.byteorder,
+            "encodings": encodings,
+            "count": len(passwords),
+            "table_size": table_size,
+        }
+    ).encode()
+    header_size = _align(len(MAGIC) + 4 + len(header))
+    return b"".join(
+        [
+            MAGIC,
+            len(header).to_bytes(4, "little"),
+            header,
+            bytes(header_size - len(MAGIC) - 4 - len(header)),
+            entries.tobytes(),
+            table.tobytes(),
+            pool,
+        ]
+    )
+
+
+class PasswordStore(Sequence[str]):
+    """Passwords compiled from the password file and read from a memory map,
+    so that a large word list isn't held as str objects. Every password is
+    stored encoded in each of the encodings, the first one is utf-8. The
+    passwords are unique and the empty password is the first one."""
+
+    def __init__(self, buffer: mmap.mmap | bytes) -> None:
+        self._buffer = buffer
+        view = memoryview(buffer)
+        if view[: len(MAGIC)] != MAGIC:
+            raise ValueError("not a compiled password store")
+        header_length = int.from_bytes(
+            view[len(MAGIC) : len(MAGIC) + 4], "little"
+        )
+        start = len(MAGIC) + 4
+        self.header: dict = json.loads(
+            bytes(view[start : start + header_length])
+        )
+        if self.header["byteorder"] != sys.byteorder:
+            raise ValueError("password store of another byte order")
+        self.encodings: list[str] = self.header["encodings"]
+        self._count: int = self.header["count"]
+        table_size = self.header["table_size"]
+        entries_start = _align(start + header_length)
+        entries_end = entries_start + 16 * self._count * len(self.encodings)
+        table_end = entries_end + 8 * table_size
+        self._entries = view[entries_start:entries_end].cast("Q")
+        self._table = view[entries_end:table_end].cast("Q")
+        self._pool = view[table_end:]
+        self._pool_start = table_end
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _entry(self, index: int, encoding_index: int) -> bytes | None:
+        position = 2 * (index * len(self.encodings) + encoding_index)
+        offset = self._entries[position]
+        if offset == NOT_ENCODED:
+            return None
+        return bytes(self._pool[offset : offset + self._entries[position + 1]])
+
+    def __getitem__(self, index):  # type: ignore[override]
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("password index out of range")
+        return self._entry(index, 0).decode(CANONICAL_ENCODING)
+
+    def encoded(self, index: int, encoding: str) -> bytes | None:
+        """The password encoded in one of the encodings of the store, None if
+        it cannot be encoded"""
+        if encoding not in self.encodings:
+            try:
+                return self[index].encode(encoding)
+            except UnicodeEncodeError:
+                return None
+        return self._entry(index, self.encodings.index(encoding))
+
+    def _column(self, encoding: str) -> tuple[list[int], list[int]]:
+        """Offsets and lengths of the passwords in one of the encodings"""
+        step = 2 * len(self.encodings)
+        first = 2 * self.encodings.index(encoding)
+        return (
+            self._entries[first::step].tolist(),
+            self._entries[first + 1 :: step].tolist(),
+        )
+
+    def _read(self, offset: int, length: int) -> bytes:
+        # slices of the mmap are bytes
+        start = self._pool_start + offset
+        return self._buffer[start : start + length]
+
+    def encoded_all(self, encoding: str) -> list[bytes | None]:
+        """All the passwords encoded in one of the encodings, in the store
+        order"""
+        if encoding not in self.encodings:
+            return [self.encoded(i, encoding) for i in range(self._count)]
+        read = self._read
+        return [
+            None if offset == NOT_ENCODED else read(offset, length)
+            for offset, length in zip(*self._column(encoding))
+        ]
+
+    def index(self, value, start=0, stop=None) -> int:  # type: ignore[override]
+        """Look the password up in the hash table"""
+        pwd = value.encode(CANONICAL_ENCODING)
+        mask = len(self._table) - 1
+        slot = _hash(pwd) & mask
+        while found := self._table[slot]:
+            if self._entry(found - 1, 0) == pwd and (
+                start <= found - 1 < (self._count if stop is None else stop)
+            ):
+                return found - 1
+            slot = (slot + 1) & mask
+        raise ValueError(f"{value!r} is not in the password store")
+
+    def __contains__(self, value) -> bool:
+        try:
+            self.index(value)
+        except (ValueError, AttributeError):
+            return False
+        return True
+
+    def ordered(self, front: list[int]) -> "PasswordOrder":
+        return PasswordOrder(self, front)
+
+    def close(self) -> None:
+        self._entries.release()
+        self._table.release()
+        self._pool.release()
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+
+
+class PasswordOrder(Sequence[str]):
+    """The passwords of a store in the order they're tried on an archive, the
+    indices in front go first and the others follow in the store order"""
+
+    def __init__(self, store: PasswordStore, front: list[int]) -> None:
+        self.store = store
+        self.front = list(dict.fromkeys(front))
+        self._sorted_front = sorted(self.front)
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def store_index(self, position: int) -> int:
+        if position < len(self.front):
+            return self.front[position]
+        # the position-th index which is not in front
+        index = position - len(self.front)
+        for moved in self._sorted_front:
+            if moved > index:
+                break
+            index += 1
+        return index
+
+    def indices(self) -> Iterator[int]:
+        yield from self.front
+        moved = set(self.front)
+        yield from (i for i in range(len(self.store)) if i not in moved)
+
+    def __getitem__(self, position):  # type: ignore[override]
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError("password position out of range")
+        return self.store[self.store_index(position)]
+
+    def __iter__(self) -> Iterator[str]:
+        return (self.store[index] for index in self.indices())
+
+    def iter_encoded(self, encoding: str) -> Iterator[bytes | None]:
+        encoded = self.store.encoded_all(encoding)
+        return (encoded[index] for index in self.indices())
+
+    def _position(self, index: int) -> int:
+        if index in self.front:
+            return self.front.index(index)
+        return len(self.front) + index - bisect_right(self._sorted_front, index)
+
+    def unique_encoded(self, encodings: list[str]) -> dict[bytes, int]:
+        """Map the distinct encoded passwords to their positions. The
+        passwords are unique in the canonical encoding, identical bytes
+        share one copy in the store, so only the passwords stored at another
+        offset in the other encodings are added."""
+        store = self.store
+        if CANONICAL_ENCODING not in encodings or not set(encodings) <= set(
+            store.encodings
+        ):
+            candidates: dict[bytes, int] = {}
+            for encoding in encodings:
+                for position, pwd in enumerate(self.iter_encoded(encoding)):
+                    if pwd is not None:
+                        candidates.setdefault(pwd, position)
+            return candidates
+        buffer, start = store._buffer, store._pool_start
+        offsets, lengths = store._column(CANONICAL_ENCODING)
+        encoded = [
+            buffer[start + offsets[i] : start + offsets[i] + lengths[i]]
+            for i in self.indices()
+        ]
+        candidates = dict(zip(encoded, range(len(encoded))))
+        del encoded
+        for encoding in encodings:
+            if encoding == CANONICAL_ENCODING:
+                continue
+            # identical bytes have the same offset, only the empty password
+            # is empty in every encoding
+            other_offsets, other_lengths = store._column(encoding)
+            for index in compress(
+                range(len(offsets)), map(ne, other_offsets, offsets)
+            ):
+                offset = other_offsets[index]
+                if offset != NOT_ENCODED:
+                    candidates.setdefault(
+                        store._read(offset, other_lengths[index]),
+                        self._position(index),
+                    )
+        return candidates
+
+    def index(self, value, start=0, stop=None) -> int:  # type: ignore[override]
+        position = self._position(self.store.index(value))
+        if not start <= position < (len(self) if stop is None else stop):
+            raise ValueError(f"{value!r} is not in the range")
+        return position
+
+
+def _load_cache(path: Path, source: os.stat_result, encodings: list[str]):
+    try:
+        with open(path, "rb") as fp:
+            buffer = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        store = PasswordStore(buffer)
+    except (ValueError, KeyError):
+        buffer.close()
+        return None
+    header = store.header
+    if (
+        header["source_size"],
+        header["source_mtime_ns"],
+        header["encodings"],
+    ) != (source.st_size, source.st_mtime_ns, encodings):
+        store.close()
+        return None
+    return store
+
+
+def load_password_store(
+    password_path: str | Path, encodings: list[str]
+) -> PasswordStore:
+    """Load the compiled store of the password file, it's compiled again when
+    the file or the encodings change. If the store cannot be written next to
+    the password file, it's compiled to a temporary file."""
+    encodings = [
+        CANONICAL_ENCODING,
+        *dict.fromkeys(e for e in encodings if e != CANONICAL_ENCODING),
+    ]
+    source = os.stat(password_path)
+    path = cache_path(password_path)
+    store = _load_cache(path, source, encodings)
+    if store is not None:
+        return store
+    with open(password_path, "r", encoding="utf-8") as pwd_file:
+        passwords = list(dict.fromkeys(["", *load_passwords(pwd_file)]))
+    logger.info("compile %d passwords to %s", len(passwords), path)
+    compiled = compile_passwords(passwords, encodings, source)
+    del passwords
+    tmp_name = None
+    try:
+        with tempfile.NamedTemporaryFile(
+            dir=path.parent, prefix=path.name, delete=False
+        ) as fp:
+            tmp_name = fp.name
+            fp.write(compiled)
+        os.replace(tmp_name, path)
+    except OSError:
+        if tmp_name is not None:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp_name)
+        logger.warning("cannot write %s, compile to a temporary file", path)
+        with tempfile.TemporaryFile() as fp:
+            fp.write(compiled)
+            fp.flush()
+            return PasswordStore(
+                mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            )
+    store = _load_cache(path, source, encodings)
+    if store is None:
+        return PasswordStore(compiled)
+    return store
@@ -0,0 +1,133 @@
+import csv
+import dataclasses
+import json
+import os
+import shutil
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import TextIO
+
+from .planning import SIZED_SCHEDULES, schedule_key
+
+# archive MB extracted per second, to estimate the runtime
+DEFAULT_SPEED = 100.0
+
+# statuses of the archives in a plan
+READY = "READY"
+EXISTS = "EXISTS"
+DUPLICATE = "DUPLICATE"
+MISSING_VOLUMES = "MISSING_VOLUMES"
+WRONG_PASSWORD = "WRONG_PASSWORD"
+UNKNOWN_PASSWORD = "UNKNOWN_PASSWORD"
+DEFERRED = "DEFERRED"
+# to be extracted by a run
+PENDING_STATUSES = (READY, UNKNOWN_PASSWORD)
+
+
+@dataclasses.dataclass
+class PlannedArchive:
+    """What a run would do with an archive. password is the one which passes
+    the header or verifier checks, candidates is the number of passwords
+    left to try if there is no single one. encrypted and password are None
+    if they're not known, e.g. the archive was extracted before."""
+
+    path: str
+    type: str
+    volumes: int
+    archive_size: int
+    extracted_size: int | None
+    encrypted: bool | None
+    password: str | None
+    candidates: int
+    status: str
+    duplicate_of: str | None = None
+
+
+def defer_overflowing(archives: list[PlannedArchive], schedule: str) -> None:
+    """Mark the pending archives which wouldn't fit in the free space of
+    their file systems, in the order they're scheduled. A run in scan order
+    doesn't read the sizes, so it defers nothing."""
+    if schedule not in SIZED_SCHEDULES:
+        return
+    free: dict[int, int] = {}
+    pending = [
+        (archive, archive.extracted_size)
+        for archive in archives
+        if archive.status in PENDING_STATUSES
+        and archive.extracted_size is not None
+    ]
+    for archive, size in sorted(pending, key=schedule_key(schedule)):
+        directory = Path(archive.path).parent
+        device = os.stat(directory).st_dev
+        if device not in free:
+            free[device] = shutil.disk_usage(directory).free
+        if size > free[device]:
+            archive.status = DEFERRED
+        else:
+            free[device] -= size
+
+
+def summarize(archives: list[PlannedArchive], speed: float) -> dict:
+    pending = [a for a in archives if a.status in PENDING_STATUSES]
+    archive_size = sum(archive.archive_size for archive in pending)
+    return {
+        "archives": len(archives),
+        "types": dict(Counter(archive.type for archive in archives)),
+        "statuses": dict(Counter(archive.status for archive in archives)),
+        "archive_size": archive_size,
+        "extracted_size": sum(
+            archive.extracted_size or 0 for archive in pending
+        ),
+        "unknown_sizes": sum(
+            archive.extracted_size is None for archive in pending
+        ),
+        "estimated_seconds": round(archive_size / 1e6 / speed),
+    }
+
+
+def write_report(
+    archives: list[PlannedArchive],
+    summary: dict,
+    target_directory: str,
+    fp: TextIO,
+    report_format: str,
+) -> None:
+    if report_format == "csv":
+        fields = [field.name for field in dataclasses.fields(PlannedArchive)]
+        writer = csv.DictWriter(fp, fieldnames=fields)
+        writer.writeheader()
+        for archive in archives:
+            writer.writerow(dataclasses.asdict(archive))
+        return
+    json.dump(
+        {
+            "target_directory": target_directory,
+            "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "summary": summary,
+            "archives": [dataclasses.asdict(archive) for archive in archives],
+        },
+        fp,
+        ensure_ascii=False,
+        indent=2,
+    )
+    fp.write("\n")
+
+
+def save_report(
+    archives: list[PlannedArchive],
+    summary: dict,
+    target_directory: str,
+    report_path: str,
+) -> None:
+    """Write the report as CSV if report_path ends with .csv, else as JSON,
+    to stdout if report_path is -"""
+    report_format = "csv" if report_path.lower().endswith(".csv") else "json"
+    if report_path == "-":
+        write_report(
+            archives, summary, target_directory, sys.stdout, report_format
+        )
+        return
+    with open(report_path, "w", encoding="utf-8", newline="") as fp:
+        write_report(archives, summary, target_directory, fp, report_format)
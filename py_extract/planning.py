@@ -0,0 +1,99 @@
+import os
+import shutil
+import threading
+import zipfile
+from logging import getLogger
+from pathlib import Path
+from typing import Iterable
+
+from .detection import ArchiveType
+from .exceptions import SevenZipCmdNotFound
+from .seven_zip import list_archive
+
+logger = getLogger(__name__)
+
+# orders of the archives found in a directory, the extracted sizes are only
+# read for the orders by size
+SIZED_SCHEDULES = ("small_first", "large_first")
+SCHEDULES = (*SIZED_SCHEDULES, "scan_order")
+BLOCK_SIZE = 4096
+
+
+def disk_footprint(sizes: Iterable[int]) -> int:
+    """Bytes the files take on the disk, rounded up to whole blocks"""
+    return sum(-(-size // BLOCK_SIZE) * BLOCK_SIZE for size in sizes)
+
+
+def zip_footprint(infolist: Iterable[zipfile.ZipInfo]) -> int:
+    """Space the members take, from a parsed zip central directory"""
+    return disk_footprint(
+        info.file_size for info in infolist if not info.is_dir()
+    )
+
+
+def extracted_size(
+    file: Path, archive_type: ArchiveType, split_zip: bool = False
+) -> int | None:
+    """Return the space the extracted files take, from the zip central
+    directory or from the listing of 7z. None if it's not known, e.g. the
+    headers are encrypted."""
+    if archive_type == ArchiveType.ZIP and not split_zip:
+        try:
+            with zipfile.ZipFile(file) as zip_file:
+                return zip_footprint(zip_file.infolist())
+        except Exception:
+            logger.exception("cannot read the central directory of %s", file)
+            return None
+    try:
+        listing, _output = list_archive(file)
+    except SevenZipCmdNotFound:
+        return None
+    if listing is None:
+        return None
+    return disk_footprint(
+        entry.size for entry in listing.entries if not entry.is_dir
+    )
+
+
+def schedule_key(schedule: str):
+    """Sort key of (archive, size) pairs, archives of unknown size go last"""
+    match schedule:
+        case "small_first":
+            return lambda item: (item[1] is None, item[1] or 0)
+        case "large_first":
+            return lambda item: (item[1] is None, -(item[1] or 0))
+        case _:
+            return lambda item: 0
+
+
+class DiskBudget:
+    """Free space of the file systems of the output directories, minus the
+    space reserved by the extractions in progress. It's shared by the worker
+    threads."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._reserved: dict[int, int] = {}
+
+    def available(self, directory: Path) -> int:
+        device = os.stat(directory).st_dev
+        free = shutil.disk_usage(directory).free
+        with self._lock:
+            return free - self._reserved.get(device, 0)
+
+    def reserve(self, directory: Path, size: int) -> bool:
+        """Reserve the space for an extraction into directory, False if the
+        file system doesn't have it"""
+        device = os.stat(directory).st_dev
+        free = shutil.disk_usage(directory).free
+        with self._lock:
+            reserved = self._reserved.get(device, 0)
+            if size > free - reserved:
+                return False
+            self._reserved[device] = reserved + size
+        return True
+
+    def release(self, directory: Path, size: int) -> None:
+        device = os.stat(directory).st_dev
+        with self._lock:
+            self._reserved[device] -= size
@@ -0,0 +1,174 @@
+import dataclasses
+import shutil
+import subprocess
+import threading
+from pathlib import Path
+
+from .exceptions import SevenZipCmdNotFound
+
+# separator between the archive properties and the entries of `7z l -slt`
+SLT_ENTRIES_SEPARATOR = "----------"
+
+
+@dataclasses.dataclass
+class SevenZipEntry:
+    path: str
+    size: int
+    encrypted: bool
+    is_dir: bool
+    block: str | None = None
+    crc: int | None = None
+
+
+@dataclasses.dataclass
+class SevenZipListing:
+    properties: dict[str, str]
+    entries: list[SevenZipEntry]
+
+    @property
+    def solid(self) -> bool:
+        return self.properties.get("Solid") == "+"
+
+
+class ProcessGroup:
+    """Track the 7z processes running for one archive, so that all of them can
+    be terminated as soon as one of them succeeds"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._procs: set[subprocess.Popen] = set()
+        self.terminated = False
+
+    def run(self, args: list[str]) -> subprocess.CompletedProcess:
+        with self._lock:
+            if self.terminated:
+                return subprocess.CompletedProcess(args, -1, "", "")
+            proc = subprocess.Popen(
+                args,
+                shell=False,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                encoding="utf-8",
+                errors="replace",
+            )
+            self._procs.add(proc)
+        try:
+            stdout, stderr = proc.communicate()
+        finally:
+            with self._lock:
+                self._procs.discard(proc)
+        return subprocess.CompletedProcess(
+            args, proc.returncode, stdout, stderr
+        )
+
+    def terminate(self) -> None:
+        with self._lock:
+            self.terminated = True
+            for proc in self._procs:
+                proc.terminate()
+
+
+def run_7z(
+    args: list[str], group: ProcessGroup | None = None
+) -> subprocess.CompletedProcess:
+    """Run 7z without writing anything to the disk, capture its output"""
+    if not shutil.which("7z"):
+        raise SevenZipCmdNotFound
+    return (group or ProcessGroup()).run(["7z", *args])
+
+
+def _parse_slt_block(block: str) -> dict[str, str]:
+    fields = {}
+    for line in block.splitlines():
+        key, sep, value = line.partition(" = ")
+        if sep:
+            fields[key.strip()] = value
+    return fields
+
+
+def parse_slt(output: str) -> SevenZipListing | None:
+    """Parse the technical listing printed by `7z l -slt`"""
+    head, sep, body = output.partition(f"\n{SLT_ENTRIES_SEPARATOR}\n")
+    if not sep:
+        return None
+    properties = _parse_slt_block(head.rpartition("\n--\n")[2])
+    entries = []
+    for block in body.split("\n\n"):
+        fields = _parse_slt_block(block)
+        if "Path" not in fields:
+            continue
+        entries.append(
+            SevenZipEntry(
+                path=fields["Path"],
+                size=int(fields.get("Size") or 0),
+                encrypted=fields.get("Encrypted") == "+",
+                is_dir=fields.get("Folder") == "+"
+                or "D" in fields.get("Attributes", "").partition(" ")[0],
+                block=fields.get("Block"),
+                crc=int(fields["CRC"], 16) if fields.get("CRC") else None,
+            )
+        )
+    return SevenZipListing(properties=properties, entries=entries)
+
+
+def list_archive(
+    archive_name: Path,
+    pwd: str | None = None,
+    group: ProcessGroup | None = None,
+) -> tuple[SevenZipListing | None, str]:
+    """Return the listing of an archive, or None with the error output if
+    the archive cannot be opened"""
+    proc = run_7z(
+        ["l", "-slt", f"-p{pwd if pwd else ''}", str(archive_name)], group
+    )
+    output = proc.stdout + proc.stderr
+    if proc.returncode != 0:
+        return None, output
+    return parse_slt(proc.stdout), output
+
+
+def pick_probe_entry(listing: SevenZipListing) -> SevenZipEntry | None:
+    """Return the encrypted entry which is the cheapest to decode. In a solid
+    block every preceding entry has to be decoded too. Empty entries are
+    left out, testing them can pass with a wrong password."""
+    best, best_cost = None, 0
+    block_costs: dict[str | None, int] = {}
+    for entry in listing.entries:
+        if entry.is_dir:
+            continue
+        cost = entry.size
+        if listing.solid:
+            cost += block_costs.get(entry.block, 0)
+            block_costs[entry.block] = cost
+        if (
+            entry.encrypted
+            and entry.size > 0
+            and (best is None or cost < best_cost)
+        ):
+            best, best_cost = entry, cost
+    return best
+
+
+def probe_entry(
+    archive_name: Path,
+    entry: SevenZipEntry,
+    pwd: str | None,
+    group: ProcessGroup | None = None,
+) -> tuple[bool, str]:
+    """Decode a single entry in memory with `7z t`, return whether the test
+    passed and the output"""
+    proc = run_7z(
+        [
+            "t",
+            f"-p{pwd if pwd else ''}",
+            "-spd",
+            str(archive_name),
+            entry.path,
+        ],
+        group,
+    )
+    output = proc.stdout + proc.stderr
+    # a name which doesn't match any entry is not an error for 7z
+    passed = proc.returncode == 0 and "No files to process" not in output
+    return passed, output
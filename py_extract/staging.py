@@ -0,0 +1,167 @@
+import os
+import queue
+import shutil
+import stat
+import tempfile
+import threading
+import uuid
+from logging import getLogger
+from pathlib import Path
+from typing import Iterable
+
+from .checkpoint import CHECKPOINT_NAME
+
+logger = getLogger(__name__)
+
+# archives are extracted into hidden directories next to their output
+# directory, named .{output name}.{random}.py_extract_staging
+STAGING_SUFFIX = ".py_extract_staging"
+
+
+def is_staging_dir(name: str) -> bool:
+    return name.startswith(".") and name.endswith(STAGING_SUFFIX)
+
+
+def output_name(staging_name: str) -> str:
+    """Name of the output directory of a staging directory"""
+    return staging_name[1 : -len(STAGING_SUFFIX)].rsplit(".", 1)[0]
+
+
+def remove_readonly(func, path, exc_info) -> None:
+    if issubclass(exc_info[0], FileNotFoundError):
+        return
+    os.chmod(path, stat.S_IWRITE)
+    func(path)
+
+
+class StagingArea:
+    """Staging directories of the archives being extracted.
+
+    A staging directory is renamed to the output directory when the archive
+    is extracted, so an existing output directory is always complete. Failed
+    attempts and orphans of interrupted runs are removed by a background
+    thread, so that the password loop doesn't wait for large deletes.
+    """
+
+    def __init__(self, resume: bool = False) -> None:
+        self.resume = resume
+        self._lock = threading.Lock()
+        self._active: set[Path] = set()
+        # staging directories of interrupted runs, by their output directory
+        self._resumable: dict[Path, Path] = {}
+        self._trash: queue.Queue[Path | None] = queue.Queue()
+        self._thread: threading.Thread | None = None
+
+    def create(self, out_path: Path) -> Path:
+        """Create an empty staging directory on the file system of out_path"""
+        with self._lock:
+            staging = Path(
+                tempfile.mkdtemp(
+                    prefix=f".{out_path.name}.",
+                    suffix=STAGING_SUFFIX,
+                    dir=out_path.parent,
+                )
+            )
+            self._active.add(staging)
+        return staging
+
+    def commit(self, staging: Path, out_path: Path) -> bool:
+        """Rename the staging directory to out_path, discard it if it fails"""
+        try:
+            os.rename(staging, out_path)
+        except OSError:
+            logger.exception("cannot rename %s to %s", staging, out_path)
+            self.discard(staging)
+            return False
+        with self._lock:
+            self._active.discard(staging)
+        return True
+
+    def reset(self, staging: Path) -> None:
+        """Empty a staging directory for another attempt, the old content is
+        moved aside and removed in the background"""
+        trash = staging.with_name(
+            f"{staging.name}.{uuid.uuid4().hex[:8]}{STAGING_SUFFIX}"
+        )
+        os.rename(staging, trash)
+        os.mkdir(staging)
+        try:
+            # the checkpoint stays with the staging directory
+            os.rename(trash / CHECKPOINT_NAME, staging / CHECKPOINT_NAME)
+        except OSError:
+            pass
+        self._remove_later(trash)
+
+    def release(self, staging: Path) -> None:
+        """Leave the staging directory on the disk for a later run"""
+        with self._lock:
+            self._active.discard(staging)
+
+    def discard(self, staging: Path) -> None:
+        with self._lock:
+            self._active.discard(staging)
+        self._remove_later(staging)
+
+    def sweep(self, staging_dirs: Iterable[str | Path]) -> None:
+        """Remove staging directories which don't belong to an extraction of
+        this run, they are left by interrupted runs. If resume is enabled,
+        the ones with a checkpoint are kept for their archive."""
+        orphans = []
+        with self._lock:
+            for staging in map(Path, staging_dirs):
+                if staging in self._active:
+                    continue
+                out_path = staging.with_name(output_name(staging.name))
+                if (
+                    self.resume
+                    and (staging / CHECKPOINT_NAME).is_file()
+                    and self._resumable.setdefault(out_path, staging) == staging
+                ):
+                    continue
+                orphans.append(staging)
+        for orphan in orphans:
+            logger.info("remove orphaned staging directory %s", orphan)
+            self._remove_later(orphan)
+
+    def take_resumable(self, out_path: Path) -> Path | None:
+        """Return the staging directory an interrupted run left for out_path,
+        it belongs to the caller from now on"""
+        with self._lock:
+            staging = self._resumable.pop(out_path, None)
+            if staging is not None:
+                self._active.add(staging)
+        return staging
+
+    def discard_unclaimed(self) -> None:
+        """Remove the resumable staging directories no archive asked for"""
+        with self._lock:
+            unclaimed = list(self._resumable.values())
+            self._resumable.clear()
+        for staging in unclaimed:
+            self._remove_later(staging)
+
+    def _remove_later(self, path: Path) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._remove_trash,
+                    name="staging-cleaner",
+                    daemon=True,
+                )
+                self._thread.start()
+        self._trash.put(path)
+
+    def _remove_trash(self) -> None:
+        while (path := self._trash.get()) is not None:
+            try:
+                shutil.rmtree(path, onerror=remove_readonly)
+            except OSError:
+                logger.exception("cannot remove %s", path)
+
+    def close(self) -> None:
+        """Wait until the discarded directories are removed"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._trash.put(None)
+            thread.join()
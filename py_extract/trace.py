@@ -0,0 +1,75 @@
+import dataclasses
+import json
+import threading
+import time
+from pathlib import Path
+from typing import TextIO
+
+# bumped when a field changes its meaning or is removed, new fields may be
+# added without bumping it
+TRACE_VERSION = 1
+
+
+@dataclasses.dataclass
+class ArchiveTrace:
+    """Timings and sizes of the handling of one archive, written as one JSON
+    line. Times are in seconds, None means the stage didn't run.
+
+    status is the name of an ExtractStatusCode, or EXISTS, DUPLICATE or
+    NESTED_TOO_DEEP for the archives which are not extracted. A duplicate
+    which is linked or skipped is DUPLICATE, one which has to be extracted
+    again gets the status of its extraction. bytes_out is
+    what the successful attempt wrote, mb_per_s is the archive MB read per
+    second by it, like the speed printed after an extraction."""
+
+    path: str
+    type: str
+    volumes: int
+    bytes_in: int
+    version: int = TRACE_VERSION
+    started_at: float = dataclasses.field(default_factory=time.time)
+    status: str = ""
+    seconds: float = 0.0
+    detection_seconds: float | None = None
+    screen_seconds: float | None = None
+    attempts: int = 0
+    attempt_seconds: list[float] = dataclasses.field(default_factory=list)
+    password_index: int | None = None
+    encoding: str | None = None
+    bytes_out: int | None = None
+    mb_per_s: float | None = None
+    seven_zip_runs: int = 0
+    seven_zip_seconds: float = 0.0
+    seven_zip_exit_code: int | None = None
+
+    def seven_zip_finished(self, seconds: float, exit_code: int) -> None:
+        self.seven_zip_runs += 1
+        self.seven_zip_seconds += seconds
+        self.seven_zip_exit_code = exit_code
+
+
+class TraceSink:
+    """Append the traces of the archives to a JSON lines file, records of
+    several runs can be aggregated by reading all the lines. It's shared by
+    the worker threads."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        # opened by the first trace, a run which extracts nothing doesn't
+        # create the file
+        self._fp: TextIO | None = None
+
+    def write(self, trace: ArchiveTrace) -> None:
+        line = json.dumps(dataclasses.asdict(trace), ensure_ascii=False)
+        with self._lock:
+            if self._fp is None:
+                self._fp = open(self.path, "a", encoding="utf-8")
+            self._fp.write(line + "\n")
+            self._fp.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fp is not None:
+                self._fp.close()
+                self._fp = None
@@ -1,5 +1,8 @@
+import contextlib
+import io
 import itertools
-from typing import TextIO
+import threading
+from typing import Iterator, TextIO
 
 
 def output_same_line(text: str) -> None:
@@ -7,6 +10,41 @@ def output_same_line(text: str) -> None:
     print("\x1b[2K\r" + text, end="", flush=True)
 
 
+class GroupedOutput(io.TextIOBase):
+    """Replacement of sys.stdout for worker threads, the output of a thread
+    inside group() is held back and written at once when the group ends, so
+    that the output of concurrent archives is not interleaved"""
+
+    def __init__(self, stream: TextIO) -> None:
+        self.stream = stream
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def write(self, text: str) -> int:
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None:
+            with self._lock:
+                return self.stream.write(text)
+        buffer.append(text)
+        return len(text)
+
+    def flush(self) -> None:
+        if getattr(self._local, "buffer", None) is None:
+            self.stream.flush()
+
+    @contextlib.contextmanager
+    def group(self) -> Iterator[None]:
+        self._local.buffer = []
+        try:
+            yield
+        finally:
+            text = "".join(self._local.buffer)
+            self._local.buffer = None
+            with self._lock:
+                self.stream.write(text)
+                self.stream.flush()
+
+
 class BColors:
     OK_BLUE = "\033[94m"
     OK_GREEN = "\033[92m"
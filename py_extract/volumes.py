@@ -0,0 +1,119 @@
+import dataclasses
+import os
+import re
+from pathlib import Path
+
+# kinds of multi-volume archives
+RAR_PARTS = "rar_parts"
+RAR_OLD_STYLE = "rar_old_style"
+SPLIT_FILE = "split_file"
+SPLIT_ZIP = "split_zip"
+
+# name.part1.rar, name.part2.rar
+RAR_PART_PATTERN = re.compile(r"^(?P<base>.+)\.part(?P<number>\d+)\.rar$", re.I)
+# name.rar, name.r00, name.r01
+RAR_OLD_STYLE_PATTERN = re.compile(
+    r"^(?P<base>.+)\.r(?P<number>\d{2,3})$", re.I
+)
+# name.7z.001, name.zip.001
+SPLIT_FILE_PATTERN = re.compile(r"^(?P<base>.+\.[^.]+)\.(?P<number>\d{3})$")
+# name.z01, name.z02, name.zip
+SPLIT_ZIP_PATTERN = re.compile(r"^(?P<base>.+)\.z(?P<number>\d{2,3})$", re.I)
+
+
+@dataclasses.dataclass
+class VolumeSet:
+    """The volumes of one logical archive, ordered by volume number"""
+
+    name: str
+    kind: str
+    members: list[Path]
+    total_size: int
+    missing: list[int]
+
+    @property
+    def first(self) -> Path:
+        """The volume to extract the whole set from"""
+        if self.kind == SPLIT_ZIP:
+            # the central directory is in the .zip volume which comes last
+            return self.members[-1]
+        return self.members[0]
+
+    @property
+    def split(self) -> bool:
+        """The volumes are pieces of one archive file, zipfile only reads the
+        volume it's given"""
+        return self.kind in (SPLIT_ZIP, SPLIT_FILE)
+
+    @property
+    def complete(self) -> bool:
+        return not self.missing
+
+
+def _volume_key(name: str) -> tuple[str, str, int] | None:
+    """Return the kind, the base name and the volume number of a file name,
+    numbers start from 1"""
+    if match := RAR_PART_PATTERN.match(name):
+        return RAR_PARTS, match["base"], int(match["number"])
+    if match := SPLIT_FILE_PATTERN.match(name):
+        return SPLIT_FILE, match["base"], int(match["number"])
+    if match := RAR_OLD_STYLE_PATTERN.match(name):
+        # name.rar is the first volume, name.r00 the second
+        return RAR_OLD_STYLE, match["base"], int(match["number"]) + 2
+    if match := SPLIT_ZIP_PATTERN.match(name):
+        return SPLIT_ZIP, match["base"], int(match["number"])
+    return None
+
+
+def group_volumes(
+    entries: list[os.DirEntry],
+) -> tuple[list[VolumeSet], list[os.DirEntry]]:
+    """Group the files of one directory listing into volume sets, return the
+    sets and the files which are not a volume of a set"""
+    volumes: dict[tuple[str, str, str], dict[int, os.DirEntry]] = {}
+    by_path = {entry.path: entry for entry in entries}
+    grouped: set[str] = set()
+    for entry in entries:
+        key = _volume_key(entry.name)
+        if key is None:
+            continue
+        kind, base, number = key
+        directory = os.path.dirname(entry.path)
+        volumes.setdefault((directory, kind, base), {})[number] = entry
+    volume_sets = []
+    for (directory, kind, base), numbered in volumes.items():
+        last = max(numbered)
+        # the volume without a number which belongs to the set
+        head_name = {RAR_OLD_STYLE: ".rar", SPLIT_ZIP: ".zip"}.get(kind)
+        if head_name is not None:
+            head_path = os.path.join(directory, base)
+            head = by_path.get(head_path + head_name) or by_path.get(
+                head_path + head_name.upper()
+            )
+            if kind == RAR_OLD_STYLE:
+                if head is not None:
+                    numbered[1] = head
+            else:
+                last += 1
+                if head is not None:
+                    numbered[last] = head
+        members = [numbered[number] for number in sorted(numbered)]
+        volume_sets.append(
+            VolumeSet(
+                name=os.path.join(directory, base),
+                kind=kind,
+                members=[Path(member.path) for member in members],
+                total_size=sum(
+                    member.stat(follow_symlinks=False).st_size
+                    for member in members
+                ),
+                missing=[
+                    number
+                    for number in range(1, last + 1)
+                    if number not in numbered
+                ],
+            )
+        )
+        grouped.update(member.path for member in members)
+    standalone = [entry for entry in entries if entry.path not in grouped]
+    return volume_sets, standalone
@@ -0,0 +1,62 @@
+import os
+from logging import getLogger
+from pathlib import Path
+
+from .staging import is_staging_dir
+
+logger = getLogger(__name__)
+
+OUT_DIR_SUFFIX = "_out"
+
+
+def is_out_dir_of_sibling(entry: os.DirEntry, file_names: set[str]) -> bool:
+    """Output directories are walked when their archive is handled"""
+    return (
+        entry.name.endswith(OUT_DIR_SUFFIX)
+        and entry.name[: -len(OUT_DIR_SUFFIX)] in file_names
+    )
+
+
+def scan_files(
+    directory: str | Path,
+    recursive: bool,
+    staging_dirs: list[str] | None = None,
+) -> list[os.DirEntry]:
+    """Return a snapshot of the files in a directory, sorted by path.
+
+    Every directory is read once with os.scandir and the file type of the
+    DirEntry is reused, so no extra stat is needed. Subdirectories are walked
+    with an explicit stack instead of recursion, output directories of
+    archives found next to them are skipped. Staging directories are never
+    walked, their paths are appended to staging_dirs."""
+    files: list[os.DirEntry] = []
+    frontier = [os.fspath(directory)]
+    while frontier:
+        current = frontier.pop()
+        try:
+            with os.scandir(current) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError:
+            logger.exception("cannot scan %s", current)
+            continue
+        current_files = [
+            entry for entry in entries if entry.is_file(follow_symlinks=False)
+        ]
+        files.extend(current_files)
+        subdirs = [
+            entry for entry in entries if entry.is_dir(follow_symlinks=False)
+        ]
+        if staging_dirs is not None:
+            staging_dirs.extend(
+                entry.path for entry in subdirs if is_staging_dir(entry.name)
+            )
+        if not recursive:
+            continue
+        file_names = {entry.name for entry in current_files}
+        frontier.extend(
+            entry.path
+            for entry in reversed(subdirs)
+            if not is_staging_dir(entry.name)
+            and not is_out_dir_of_sibling(entry, file_names)
+        )
+    return files
@@ -0,0 +1,22 @@
+from collections.abc import Callable
+
+from typing_extensions import Buffer
+
+def screen_passwords(
+    header: bytes, check_byte: int, passwords: list[bytes]
+) -> list[int]: ...
+def find_password(
+    data: bytes,
+    check_byte: int,
+    crc: int,
+    stored: bool,
+    passwords: list[bytes],
+    verify: Callable[[int], bool],
+    num_threads: int,
+) -> int: ...
+
+class _ZipDecrypter:
+    def __init__(self, pwd: bytes) -> None: ...
+    def __call__(self, data: Buffer) -> bytes: ...
+    def decrypt_inplace(self, buf: Buffer) -> None: ...
+    def decrypt_into(self, src: Buffer, dst: Buffer) -> int: ...
@@ -12,6 +12,240 @@ cython implementation of zip decryption
 """
 
 cimport cpython
+from cython.parallel cimport prange
+from libc.stdlib cimport free, malloc
+
+# CRC-32 table built once when the module is imported, it's shared by the
+# password screening functions and _ZipDecrypter.
+cdef unsigned long CRCTABLE[256]
+
+
+cdef void _generate_crc_table(unsigned long *table) noexcept nogil:
+    cdef unsigned long poly = 0xedb88320
+    cdef unsigned long crc, i, j
+    for 0 <= i < 256:
+        crc = i
+        for 0 <= j < 8:
+            if crc & 1:
+                crc = ((crc >> 1) & 0x7FFFFFFF) ^ poly
+            else:
+                crc = ((crc >> 1) & 0x7FFFFFFF)
+        table[i] = crc
+
+
+_generate_crc_table(CRCTABLE)
+
+
+cdef inline unsigned long _crc32(unsigned char ch, unsigned long crc) noexcept nogil:
+    return ((crc >> 8) & 0xffffff) ^ CRCTABLE[(crc ^ ch) & 0xff]
+
+
+cdef struct _Keys:
+    unsigned long key0
+    unsigned long key1
+    unsigned long key2
+
+
+cdef inline void _update_keys(_Keys *keys, unsigned char c) noexcept nogil:
+    keys.key0 = _crc32(c, keys.key0)
+    keys.key1 = (keys.key1 + (keys.key0 & 255)) & 4294967295UL
+    keys.key1 = (keys.key1 * 134775813 + 1) & 4294967295UL
+    keys.key2 = _crc32((keys.key1 >> 24) & 255, keys.key2)
+
+
+cdef inline void _init_keys(
+    _Keys *keys, const unsigned char *pwd, Py_ssize_t pwdlen
+) noexcept nogil:
+    cdef Py_ssize_t i
+    keys.key0 = 305419896
+    keys.key1 = 591751049
+    keys.key2 = 878082192
+    for 0 <= i < pwdlen:
+        _update_keys(keys, pwd[i])
+
+
+cdef inline unsigned char _decrypt_byte(_Keys *keys, unsigned char c) noexcept nogil:
+    cdef unsigned long k = keys.key2 | 2
+    cdef unsigned char plain = c ^ (((k * (k ^ 1)) >> 8) & 255)
+    _update_keys(keys, plain)
+    return plain
+
+
+cdef inline bint _check_header(
+    _Keys *keys,
+    const unsigned char *pwd,
+    Py_ssize_t pwdlen,
+    const unsigned char *header,
+    unsigned char check_byte,
+) noexcept nogil:
+    """Run the key schedule for one password over the 12-byte encryption
+    header, the last decrypted byte must match the check byte."""
+    cdef Py_ssize_t i
+    cdef unsigned char plain = 0
+    _init_keys(keys, pwd, pwdlen)
+    for 0 <= i < 12:
+        plain = _decrypt_byte(keys, header[i])
+    return plain == check_byte
+
+
+def screen_passwords(bytes header, unsigned char check_byte, list passwords):
+    """Return the indices of the passwords which can decrypt the 12-byte
+    encryption header of a ZipCrypto member to the expected check byte.
+
+    Every password of the list must already be encoded to bytes. A wrong
+    password passes the check with a probability of 1/256, so the survivors
+    still have to be verified by a real extraction.
+    """
+    cdef Py_ssize_t count = len(passwords)
+    cdef Py_ssize_t i
+    cdef const unsigned char *header_s
+    cdef const unsigned char **pwd_s
+    cdef Py_ssize_t *pwd_len
+    cdef char *survived
+    cdef _Keys keys
+
+    if len(header) != 12:
+        raise ValueError("ZipCrypto encryption header must be 12 bytes")
+    header_s = <const unsigned char *>cpython.PyBytes_AsString(header)
+    pwd_s = <const unsigned char **>malloc(count * sizeof(char *) + 1)
+    pwd_len = <Py_ssize_t *>malloc(count * sizeof(Py_ssize_t) + 1)
+    survived = <char *>malloc(count + 1)
+    if pwd_s == NULL or pwd_len == NULL or survived == NULL:
+        free(pwd_s)
+        free(pwd_len)
+        free(survived)
+        raise MemoryError()
+    try:
+        # the list keeps the bytes objects alive while the GIL is released
+        for 0 <= i < count:
+            pwd = passwords[i]
+            if not isinstance(pwd, bytes):
+                raise TypeError("passwords must be a list of bytes")
+            pwd_s[i] = <const unsigned char *>cpython.PyBytes_AsString(pwd)
+            pwd_len[i] = cpython.PyBytes_Size(pwd)
+        with nogil:
+            for 0 <= i < count:
+                survived[i] = _check_header(
+                    &keys, pwd_s[i], pwd_len[i], header_s, check_byte
+                )
+        return [i for i in range(count) if survived[i]]
+    finally:
+        free(pwd_s)
+        free(pwd_len)
+        free(survived)
+
+# results of _trial_password
+cdef enum:
+    TRIAL_FAIL = 0
+    TRIAL_HEADER_OK = 1
+    TRIAL_CRC_OK = 2
+
+
+cdef int _trial_password(
+    const unsigned char *pwd,
+    Py_ssize_t pwdlen,
+    const unsigned char *data,
+    Py_ssize_t datalen,
+    unsigned char check_byte,
+    unsigned long crc,
+    bint stored,
+) noexcept nogil:
+    """Check one password against an encrypted member, data starts with the
+    12-byte encryption header. The plain text of a stored member is verified
+    with its CRC-32 here, other members need to be decompressed first."""
+    cdef _Keys keys
+    cdef Py_ssize_t i
+    cdef unsigned long plain_crc = 0xFFFFFFFFUL
+    cdef unsigned char plain
+    if not _check_header(&keys, pwd, pwdlen, data, check_byte):
+        return TRIAL_FAIL
+    if not stored:
+        return TRIAL_HEADER_OK
+    for 12 <= i < datalen:
+        plain = _decrypt_byte(&keys, data[i])
+        plain_crc = _crc32(plain, plain_crc)
+    if (plain_crc ^ 0xFFFFFFFFUL) == crc:
+        return TRIAL_CRC_OK
+    return TRIAL_FAIL
+
+
+def find_password(
+    bytes data,
+    unsigned char check_byte,
+    unsigned long crc,
+    bint stored,
+    list passwords,
+    verify,
+    int num_threads,
+):
+    """Test passwords in parallel with OpenMP and return the index of the
+    first one found which decrypts the member, or -1.
+
+    data is the encrypted member including its 12-byte encryption header,
+    passwords is a list of bytes. If stored is true and data holds the whole
+    member, the CRC-32 of the plain text is checked without the GIL,
+    otherwise verify(index) is called with the GIL held for every password
+    passing the header check. All threads stop as soon as a password is found.
+    """
+    cdef Py_ssize_t count = len(passwords)
+    cdef Py_ssize_t datalen = len(data)
+    cdef Py_ssize_t i
+    cdef const unsigned char *data_s
+    cdef const unsigned char **pwd_s
+    cdef Py_ssize_t *pwd_len
+    cdef volatile Py_ssize_t found = -1
+    cdef volatile Py_ssize_t *found_p = &found
+    cdef int result
+
+    if datalen < 12:
+        raise ValueError("encrypted member must start with a 12-byte header")
+    if num_threads < 1:
+        raise ValueError("num_threads must be positive")
+    data_s = <const unsigned char *>cpython.PyBytes_AsString(data)
+    pwd_s = <const unsigned char **>malloc(count * sizeof(char *) + 1)
+    pwd_len = <Py_ssize_t *>malloc(count * sizeof(Py_ssize_t) + 1)
+    if pwd_s == NULL or pwd_len == NULL:
+        free(pwd_s)
+        free(pwd_len)
+        raise MemoryError()
+    try:
+        for 0 <= i < count:
+            pwd = passwords[i]
+            if not isinstance(pwd, bytes):
+                raise TypeError("passwords must be a list of bytes")
+            pwd_s[i] = <const unsigned char *>cpython.PyBytes_AsString(pwd)
+            pwd_len[i] = cpython.PyBytes_Size(pwd)
+        for i in prange(
+            count,
+            nogil=True,
+            schedule="dynamic",
+            chunksize=64,
+            num_threads=num_threads,
+        ):
+            if found_p[0] >= 0:
+                continue
+            result = _trial_password(
+                pwd_s[i], pwd_len[i], data_s, datalen, check_byte, crc, stored
+            )
+            if result == TRIAL_HEADER_OK:
+                with gil:
+                    result = TRIAL_CRC_OK if verify(i) else TRIAL_FAIL
+            if result == TRIAL_CRC_OK:
+                found_p[0] = i
+        return found
+    finally:
+        free(pwd_s)
+        free(pwd_len)
+
+
+cdef inline void _decrypt_buffer(
+    _Keys *keys, const unsigned char *src, unsigned char *dst, Py_ssize_t n
+) noexcept nogil:
+    """Decrypt n bytes from src to dst, which may be the same buffer."""
+    cdef Py_ssize_t i
+    for 0 <= i < n:
+        dst[i] = _decrypt_byte(keys, src[i])
+
 
 cdef class _ZipDecrypter:
     """Class to handle decryption of files stored within a ZIP archive.
@@ -21,76 +255,53 @@ cdef class _ZipDecrypter:
     Usage:
         zd = _ZipDecrypter(mypwd)
         plain_text = zd(cypher_text)
-    The original usage of:
-        plain_text = map(zd, cypher_text)
-    is still supported, but will be slower (by a factor of 10 or so, by
-    my measurements) than simply calling it with the full cypher_text.
+    Writable buffers can be decrypted without allocating:
+        zd.decrypt_inplace(buf)
+        zd.decrypt_into(cypher_text, out)
+    All of them release the GIL while decrypting, so that threads can decrypt
+    several members at the same time. An instance holds the key state of one
+    member and must not be shared between threads.
     """
 
-    # I guess to make these C vars, we must declare them out here?
-    cdef unsigned long crctable[256]
-    cdef unsigned long key0
-    cdef unsigned long key1
-    cdef unsigned long key2
-
-    cdef void _GenerateCRCTable(self):
-        """Generate a CRC-32 table.
-        ZIP encryption uses the CRC32 one-byte primitive for scrambling some
-        internal keys. We noticed that a direct implementation is faster than
-        relying on binascii.crc32().
-        """
-        cdef unsigned long poly = 0xedb88320
-        cdef unsigned long crc, i, j
-        for 0 <= i < 256:
-            crc = i
-            for 0 <= j < 8:
-                if crc & 1:
-                    crc = ((crc >> 1) & 0x7FFFFFFF) ^ poly
-                else:
-                    crc = ((crc >> 1) & 0x7FFFFFFF)
-            self.crctable[i] = crc
-
-    cdef unsigned long _crc32(self, unsigned char ch, unsigned long crc):
-        """Compute the CRC32 primitive on one byte."""
-        return ((crc >> 8) & 0xffffff) ^ self.crctable[(crc ^ ch) & 0xff]
+    cdef _Keys keys
 
     def __init__(self, pwd):
-        self.key0 = 305419896
-        self.key1 = 591751049
-        self.key2 = 878082192
-
-        # Generate the CRC table; previously done outside of any method
-        self._GenerateCRCTable()
-
-        # Update our keys, given the password
-        for p in pwd:
-            self._UpdateKeys(p)
-
-    cdef void _UpdateKeys(self, unsigned char c):
-        self.key0 = self._crc32(c, self.key0)
-        self.key1 = (self.key1 + (self.key0 & 255)) & 4294967295UL
-        self.key1 = (self.key1 * 134775813 + 1) & 4294967295UL
-        self.key2 = self._crc32((self.key1 >> 24) & 255, self.key2)
+        cdef const unsigned char[::1] pwd_view = pwd
+        _init_keys(&self.keys, &pwd_view[0] if len(pwd) else NULL, len(pwd))
 
     def __call__(self, data):
-        cdef unsigned long k
-        cdef Py_ssize_t i, datalen
-        cdef char *data_s
-        cdef char *ret_s
+        """Decrypt a bytes-like object and return the plain text as bytes."""
+        cdef const unsigned char[::1] src = data
+        cdef Py_ssize_t datalen = src.shape[0]
+        cdef _Keys *keys = &self.keys
+        cdef unsigned char *ret_s
 
-        cpython.PyBytes_AsStringAndSize(data, &data_s, &datalen)
         ret = cpython.PyBytes_FromStringAndSize(NULL, datalen)
-        ret_s = cpython.PyBytes_AsString(ret)
-        for 0 <= i < datalen:
-            k = self.key2 | 2
-            ret_s[i] = data_s[i] ^ (((k * (k^1)) >> 8) & 255);
-            # The proper way to do this is to call _UpdateKeys here, like so:
-            #self._UpdateKeys(ret_s[i])
-            # ... but we can cut runtime by about a third if we unroll the
-            # function.  So, we're doing so.  Yes, it's duplication.  Ah well...
-            self.key0 = ((self.key0 >> 8) & 0xFFFFFF) ^ self.crctable[(self.key0 ^ ret_s[i]) & 0xFF]
-            self.key1 = (self.key1 + (self.key0 & 255)) & 4294967295UL
-            self.key1 = (self.key1 * 134775813 + 1) & 4294967295UL
-            self.key2 = ((self.key2 >> 8) & 0xFFFFFF) ^ self.crctable[(self.key2 ^ ((self.key1 >> 24) & 255)) & 0xFF]
-
+        if datalen == 0:
+            return ret
+        ret_s = <unsigned char *>cpython.PyBytes_AsString(ret)
+        with nogil:
+            _decrypt_buffer(keys, &src[0], ret_s, datalen)
         return ret
+
+    def decrypt_inplace(self, unsigned char[::1] buf):
+        """Decrypt a writable buffer, such as a bytearray, in place."""
+        cdef Py_ssize_t datalen = buf.shape[0]
+        cdef _Keys *keys = &self.keys
+        if datalen == 0:
+            return
+        with nogil:
+            _decrypt_buffer(keys, &buf[0], &buf[0], datalen)
+
+    def decrypt_into(self, const unsigned char[::1] src, unsigned char[::1] dst):
+        """Decrypt src into the caller-provided buffer dst, which must be at
+        least as long as src. Return the number of bytes written."""
+        cdef Py_ssize_t datalen = src.shape[0]
+        cdef _Keys *keys = &self.keys
+        if dst.shape[0] < datalen:
+            raise ValueError("output buffer is smaller than the input")
+        if datalen == 0:
+            return 0
+        with nogil:
+            _decrypt_buffer(keys, &src[0], &dst[0], datalen)
+        return datalen
@@ -0,0 +1,81 @@
+import unicodedata
+import zipfile
+
+# general purpose flag bit 11, the file name is encoded with utf-8
+UTF8_FLAG = 0x800
+
+# blocks which are plausible in file names but rare, a wrong code page often
+# decodes to them
+RARE_RANGES = [
+    (0x3400, 0x4DBF),  # CJK unified ideographs extension A
+    (0xF900, 0xFAFF),  # CJK compatibility ideographs
+    (0xFF61, 0xFF9F),  # halfwidth katakana
+    (0x2500, 0x259F),  # box drawing and block elements
+]
+
+
+def raw_filenames(zip_file: zipfile.ZipFile) -> list[bytes]:
+    """Return the raw bytes of the file names without the utf-8 flag, the
+    archive must be opened without metadata_encoding"""
+    # zipfile decodes these names with cp437, which maps every byte
+    return [
+        info.orig_filename.encode("cp437")
+        for info in zip_file.infolist()
+        if not info.flag_bits & UTF8_FLAG
+    ]
+
+
+def char_score(char: str) -> float:
+    code_point = ord(char)
+    if code_point < 0x80:
+        return 1.0 if char.isprintable() else -5.0
+    category = unicodedata.category(char)
+    if category[0] in "CM" or category == "So":
+        # control, private use, unassigned, lone marks and symbols
+        return -5.0
+    if any(start <= code_point <= end for start, end in RARE_RANGES):
+        return -1.0
+    return 1.0
+
+
+def plausibility(names: list[str]) -> float:
+    """Average score of the non-ASCII characters of the decoded names"""
+    scores = [
+        char_score(char) for name in names for char in name if ord(char) >= 0x80
+    ]
+    return sum(scores) / len(scores) if scores else 0.0
+
+
+def score_encodings(
+    names: list[bytes], encodings: list[str]
+) -> dict[str, float]:
+    """Score the encodings which can decode every name"""
+    scores = {}
+    for encoding in encodings:
+        try:
+            decoded = [name.decode(encoding) for name in names]
+        except (UnicodeDecodeError, LookupError):
+            continue
+        scores[encoding] = plausibility(decoded)
+    return scores
+
+
+def detect_metadata_encoding(
+    raw_names: list[bytes], encodings: list[str]
+) -> str | None:
+    """Pick the encoding of the raw file names from the central directory.
+
+    Return None if the names don't tell the encodings apart, that is when
+    they are all ASCII or flagged as utf-8. utf-8 is preferred if it can
+    decode the names, as other encodings rarely produce valid utf-8, then the
+    most plausible encoding wins, ties are broken by the order of encodings.
+    """
+    names = [name for name in raw_names if not name.isascii()]
+    if not names:
+        return None
+    scores = score_encodings(names, encodings)
+    if not scores:
+        return None
+    if "utf-8" in scores and scores["utf-8"] > 0:
+        return "utf-8"
+    return max(scores, key=lambda encoding: scores[encoding])
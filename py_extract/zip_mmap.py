@@ -0,0 +1,225 @@
+import io
+import mmap
+import struct
+import zipfile
+import zlib
+from logging import getLogger
+
+from .zip_decrypter import _ZipDecrypter  # pylint: disable=E0611
+from .zip_encoding import UTF8_FLAG
+from .zip_probe import (
+    ENCRYPTED_FLAG,
+    LOCAL_HEADER_EXTRA_LENGTH,
+    LOCAL_HEADER_NAME_LENGTH,
+    LOCAL_HEADER_SIGNATURE,
+    LOCAL_HEADER_SIZE,
+    LOCAL_HEADER_STRUCT,
+    ZIPCRYPTO_HEADER_SIZE,
+    zipcrypto_check_byte,
+)
+
+logger = getLogger(__name__)
+
+# compressed patched data and strong encryption are left to zipfile
+UNSUPPORTED_FLAGS = 0x20 | 0x40
+SUPPORTED_COMPRESS_TYPES = (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED)
+# bytes decrypted or copied at a time
+CHUNK_SIZE = 1024 * 1024
+# compressed bytes fed to zlib at a time, zlib copies the input it cannot
+# consume within the output limit, so this is kept small
+INFLATE_INPUT_SIZE = 64 * 1024
+# smaller members are read ahead at once, larger ones sequentially
+WILLNEED_MAX_SIZE = 64 * 1024 * 1024
+
+
+def _advise(mm: mmap.mmap, advice_name: str, offset: int, length: int) -> None:
+    advice = getattr(mmap, advice_name, None)
+    if advice is None or length <= 0 or not hasattr(mm, "madvise"):
+        # madvise is not available on Windows
+        return
+    start = offset - offset % mmap.PAGESIZE
+    try:
+        mm.madvise(advice, start, min(offset + length, len(mm)) - start)
+    except OSError:
+        logger.debug("madvise %s fails", advice_name)
+
+
+class MmapMemberReader(io.BufferedIOBase):
+    """Read the plain text of a stored or deflated member from a memory map.
+
+    The compressed data is sliced as memoryviews which zlib reads without
+    copying, encrypted data is decrypted into a reused buffer. The CRC-32 is
+    checked at the end like zipfile.ZipExtFile.
+    """
+
+    def __init__(
+        self,
+        mm: mmap.mmap,
+        info: zipfile.ZipInfo,
+        data_offset: int,
+        data_size: int,
+        decrypter: _ZipDecrypter | None = None,
+    ) -> None:
+        super().__init__()
+        self._mm = mm
+        self._info = info
+        self._data_offset = data_offset
+        self._view = memoryview(mm)[data_offset : data_offset + data_size]
+        self._pos = 0
+        self._decrypter = decrypter
+        self._buffer = bytearray(CHUNK_SIZE) if decrypter else None
+        self._decompressor = (
+            zlib.decompressobj(-15)
+            if info.compress_type == zipfile.ZIP_DEFLATED
+            else None
+        )
+        self._crc = 0
+        self._eof = False
+        if data_size > WILLNEED_MAX_SIZE:
+            _advise(mm, "MADV_SEQUENTIAL", data_offset, data_size)
+        else:
+            _advise(mm, "MADV_WILLNEED", data_offset, data_size)
+
+    def readable(self) -> bool:
+        return True
+
+    def _next_input(self, size: int) -> memoryview:
+        """Return the next compressed bytes, decrypted"""
+        chunk = self._view[self._pos : self._pos + min(size, CHUNK_SIZE)]
+        self._pos += len(chunk)
+        if self._decrypter is None or self._buffer is None:
+            return chunk
+        written = self._decrypter.decrypt_into(chunk, self._buffer)
+        return memoryview(self._buffer)[:written]
+
+    def _read_chunk(self, size: int) -> bytes:
+        if self._decompressor is None:
+            data = bytes(self._next_input(size))
+            self._eof = self._pos >= len(self._view)
+        else:
+            compressed = self._decompressor.unconsumed_tail or (
+                self._next_input(INFLATE_INPUT_SIZE)
+            )
+            data = self._decompressor.decompress(compressed, size)
+            self._eof = self._decompressor.eof or (
+                self._pos >= len(self._view)
+                and not self._decompressor.unconsumed_tail
+            )
+            if self._eof:
+                data += self._decompressor.flush()
+        self._crc = zlib.crc32(data, self._crc)
+        if self._eof and self._crc != self._info.CRC:
+            raise zipfile.BadZipFile(
+                f"Bad CRC-32 for file {self._info.filename!r}"
+            )
+        return data
+
+    def read(self, size: int | None = -1) -> bytes:
+        if self.closed:
+            raise ValueError("read from closed file.")
+        if size is None or size < 0:
+            chunks = []
+            while not self._eof:
+                chunks.append(self._read_chunk(CHUNK_SIZE))
+            return b"".join(chunks)
+        data = b""
+        while not data and size and not self._eof:
+            # a deflate block may decompress to nothing
+            data = self._read_chunk(size)
+        return data
+
+    def read1(self, size: int = -1) -> bytes:
+        return self.read(size)
+
+    def close(self) -> None:
+        if not self.closed:
+            data_size = len(self._view)
+            self._view.release()
+            if data_size > WILLNEED_MAX_SIZE:
+                # the pages stay in the page cache, only the mapping is freed
+                _advise(self._mm, "MADV_DONTNEED", self._data_offset, data_size)
+        super().close()
+
+
+class MmapZipFile(zipfile.ZipFile):
+    """ZipFile which reads stored and deflated members from a memory map of
+    the archive, other members are read by zipfile. Readers of different
+    members don't share a file position, so threads read without a lock."""
+
+    # set by zipfile.ZipFile, it's not in its type stubs
+    metadata_encoding: str | None
+
+    def __init__(self, file, use_mmap: bool = True) -> None:
+        # close() may be called by __del__ if zipfile fails to open the file
+        self._mmap: mmap.mmap | None = None
+        super().__init__(file, "r")
+        if use_mmap and self.fp is not None:
+            try:
+                self._mmap = mmap.mmap(
+                    self.fp.fileno(), 0, access=mmap.ACCESS_READ
+                )
+            except (OSError, ValueError):
+                logger.info("cannot map %s, read it buffered", self.filename)
+
+    def _data_offset(self, mm: mmap.mmap, info: zipfile.ZipInfo) -> int:
+        # same checks as zipfile.ZipFile.open
+        fields = struct.unpack_from(LOCAL_HEADER_STRUCT, mm, info.header_offset)
+        if fields[0] != LOCAL_HEADER_SIGNATURE:
+            raise zipfile.BadZipFile("Bad magic number for file header")
+        name_start = info.header_offset + LOCAL_HEADER_SIZE
+        name_length = fields[LOCAL_HEADER_NAME_LENGTH]
+        extra_length = fields[LOCAL_HEADER_EXTRA_LENGTH]
+        raw_name = mm[name_start : name_start + name_length]
+        if info.flag_bits & UTF8_FLAG:
+            name = raw_name.decode("utf-8")
+        else:
+            name = raw_name.decode(self.metadata_encoding or "cp437")
+        if name != info.orig_filename:
+            raise zipfile.BadZipFile(
+                f"File name in directory {info.orig_filename!r} and header"
+                f" {name!r} differ."
+            )
+        return name_start + name_length + extra_length
+
+    def open(self, name, mode="r", pwd=None, *, force_zip64=False):
+        if mode != "r" or self._mmap is None:
+            return super().open(name, mode, pwd, force_zip64=force_zip64)
+        info = name if isinstance(name, zipfile.ZipInfo) else self.getinfo(name)
+        if (
+            info.compress_type not in SUPPORTED_COMPRESS_TYPES
+            or info.flag_bits & UNSUPPORTED_FLAGS
+        ):
+            return super().open(info, mode, pwd)
+        if pwd and not isinstance(pwd, bytes):
+            raise TypeError(f"pwd: expected bytes, got {type(pwd).__name__}")
+        data_offset = self._data_offset(self._mmap, info)
+        data_size = info.compress_size
+        decrypter = None
+        if info.flag_bits & ENCRYPTED_FLAG:
+            pwd = pwd or self.pwd
+            if not pwd:
+                raise RuntimeError(
+                    f"File {info.filename!r} is encrypted, password required"
+                    " for extraction"
+                )
+            decrypter = _ZipDecrypter(pwd)
+            header = decrypter(
+                self._mmap[data_offset : data_offset + ZIPCRYPTO_HEADER_SIZE]
+            )
+            if header[-1] != zipcrypto_check_byte(info):
+                raise RuntimeError(f"Bad password for file {info.filename!r}")
+            data_offset += ZIPCRYPTO_HEADER_SIZE
+            data_size -= ZIPCRYPTO_HEADER_SIZE
+        return MmapMemberReader(
+            self._mmap, info, data_offset, data_size, decrypter
+        )
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # a reader is still open, the map is freed with it
+                logger.warning("%s is closed with open readers", self.filename)
+            self._mmap = None
+        super().close()
@@ -0,0 +1,331 @@
+import dataclasses
+import functools
+import hashlib
+import os
+import struct
+import time
+import zipfile
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from logging import getLogger
+
+from .exceptions import LimitExceeded
+from .password_store import PasswordOrder
+from .zip_decrypter import (  # pylint: disable=E0611
+    find_password,
+    screen_passwords,
+)
+
+logger = getLogger(__name__)
+
+# general purpose flag bits and compression method of encrypted members
+ENCRYPTED_FLAG = 0x1
+DATA_DESCRIPTOR_FLAG = 0x8
+AES_COMPRESS_TYPE = 99
+
+# WinZip AES extra field and salt size of each key strength
+AES_EXTRA_ID = 0x9901
+AES_SALT_SIZES = {1: 8, 2: 12, 3: 16}
+AES_KEY_SIZES = {1: 16, 2: 24, 3: 32}
+AES_PBKDF2_ITERATIONS = 1000
+AES_VERIFIER_SIZE = 2
+
+# local file header, the layout of the private constants of zipfile, the
+# lengths are indices of the unpacked fields
+LOCAL_HEADER_STRUCT = "<4s2B4HL2L2H"
+LOCAL_HEADER_SIGNATURE = b"PK\003\004"
+LOCAL_HEADER_SIZE = struct.calcsize(LOCAL_HEADER_STRUCT)
+LOCAL_HEADER_NAME_LENGTH = 10
+LOCAL_HEADER_EXTRA_LENGTH = 11
+
+ZIPCRYPTO_HEADER_SIZE = 12
+# larger members are verified by zipfile instead of being read into memory
+MAX_TRIAL_MEMBER_SIZE = 16 * 1024 * 1024
+# passwords tested between the checks of the deadline, the AES chunks are
+# per thread
+ZIPCRYPTO_CHUNK_SIZE = 64 * 1024
+AES_CHUNK_SIZE = 32
+
+
+@dataclasses.dataclass
+class ZipCryptoHeader:
+    """Encryption header of the smallest non-empty ZipCrypto member of an
+    archive"""
+
+    member: zipfile.ZipInfo
+    header: bytes
+    check_byte: int
+
+
+@dataclasses.dataclass
+class AesVerifier:
+    """Salt and password verification value of the smallest WinZip AES
+    member of an archive"""
+
+    member: zipfile.ZipInfo
+    salt: bytes
+    verifier: bytes
+    key_size: int
+
+
+def archive_path(zip_file: zipfile.ZipFile) -> str:
+    """The helpers take an opened archive, so that its central directory is
+    parsed once, and read the raw headers from its file"""
+    if zip_file.filename is None:
+        raise ValueError("the zip archive is not opened from a path")
+    return zip_file.filename
+
+
+def read_local_data_offset(fp, info: zipfile.ZipInfo) -> int:
+    """Return the offset where the (encrypted) data of a member starts"""
+    fp.seek(info.header_offset)
+    local_header = fp.read(LOCAL_HEADER_SIZE)
+    if len(local_header) != LOCAL_HEADER_SIZE:
+        raise zipfile.BadZipFile(f"Truncated file header of {info.filename}")
+    fields = struct.unpack(LOCAL_HEADER_STRUCT, local_header)
+    if fields[0] != LOCAL_HEADER_SIGNATURE:
+        raise zipfile.BadZipFile(f"Bad magic number of {info.filename}")
+    return (
+        info.header_offset
+        + LOCAL_HEADER_SIZE
+        + fields[LOCAL_HEADER_NAME_LENGTH]
+        + fields[LOCAL_HEADER_EXTRA_LENGTH]
+    )
+
+
+def check_deadline(deadline: float | None) -> None:
+    if deadline is not None and time.monotonic() > deadline:
+        raise LimitExceeded("the screening runs out of time")
+
+
+def zipcrypto_check_byte(info: zipfile.ZipInfo) -> int:
+    # same rule as zipfile.ZipFile.open, the high byte of the DOS time which
+    # zipfile keeps as ZipInfo._raw_time
+    if info.flag_bits & DATA_DESCRIPTOR_FLAG:
+        hour, minute, second = info.date_time[3:]
+        return ((hour << 11 | minute << 5 | second // 2) >> 8) & 0xFF
+    return (info.CRC >> 24) & 0xFF
+
+
+def read_zipcrypto_header(zip_file: zipfile.ZipFile) -> ZipCryptoHeader | None:
+    """Return the encryption header of the smallest non-empty ZipCrypto
+    member, or of an empty one if no other member is encrypted. None if the
+    archive has no ZipCrypto member."""
+    members = [
+        info
+        for info in zip_file.infolist()
+        if info.flag_bits & ENCRYPTED_FLAG
+        and info.compress_type != AES_COMPRESS_TYPE
+    ]
+    if not members:
+        return None
+    # Info-ZIP encrypts empty files as well, the CRC-32 of no data is passed
+    # by every password, so they cannot be used to find the password
+    member = min(
+        members, key=lambda info: (info.file_size == 0, info.compress_size)
+    )
+    with open(archive_path(zip_file), "rb") as fp:
+        fp.seek(read_local_data_offset(fp, member))
+        header = fp.read(ZIPCRYPTO_HEADER_SIZE)
+    if len(header) != ZIPCRYPTO_HEADER_SIZE:
+        raise zipfile.BadZipFile(f"Truncated encryption header of {member}")
+    return ZipCryptoHeader(
+        member=member, header=header, check_byte=zipcrypto_check_byte(member)
+    )
+
+
+def encode_passwords(
+    passwords: Sequence[str], encoding: str
+) -> tuple[list[int], list[bytes]]:
+    """Encode passwords, skip the ones which cannot be encoded. The passwords
+    of a store are read already encoded."""
+    indices: list[int] = []
+    encoded: list[bytes] = []
+    if isinstance(passwords, PasswordOrder):
+        for index, raw in enumerate(passwords.iter_encoded(encoding)):
+            if raw is not None:
+                indices.append(index)
+                encoded.append(raw)
+        return indices, encoded
+    for index, pwd in enumerate(passwords):
+        try:
+            encoded.append(pwd.encode(encoding))
+        except UnicodeEncodeError:
+            continue
+        indices.append(index)
+    return indices, encoded
+
+
+def unique_encoded_passwords(
+    passwords: Sequence[str], encodings: list[str]
+) -> dict[bytes, int]:
+    """Map the encoded passwords to their indices, identical bytes in
+    different encodings only need to be tested once"""
+    if isinstance(passwords, PasswordOrder):
+        return passwords.unique_encoded(encodings)
+    candidates: dict[bytes, int] = {}
+    for encoding in encodings:
+        indices, encoded = encode_passwords(passwords, encoding)
+        for index, pwd in zip(indices, encoded):
+            candidates.setdefault(pwd, index)
+    return candidates
+
+
+def screen_zipcrypto_passwords(
+    header: ZipCryptoHeader, passwords: Sequence[str], encodings: list[str]
+) -> list[str]:
+    """Drop passwords which cannot decrypt the encryption header in any of the
+    encodings, the order of the remaining passwords is kept"""
+    survivors: set[int] = set()
+    for encoding in encodings:
+        indices, encoded = encode_passwords(passwords, encoding)
+        survivors.update(
+            indices[i]
+            for i in screen_passwords(header.header, header.check_byte, encoded)
+        )
+    return [passwords[index] for index in sorted(survivors)]
+
+
+def read_encrypted_member(
+    zip_file: zipfile.ZipFile, member: zipfile.ZipInfo
+) -> bytes:
+    """Read the encryption header and the encrypted data of a member, the data
+    is left out if the member is too large"""
+    size = member.compress_size
+    if size > MAX_TRIAL_MEMBER_SIZE:
+        size = ZIPCRYPTO_HEADER_SIZE
+    with open(archive_path(zip_file), "rb") as fp:
+        fp.seek(read_local_data_offset(fp, member))
+        return fp.read(size)
+
+
+def find_zipcrypto_password(
+    zip_file: zipfile.ZipFile,
+    header: ZipCryptoHeader,
+    passwords: Sequence[str],
+    encodings: list[str],
+    threads: int,
+    deadline: float | None = None,
+) -> str | None:
+    """Test all passwords on the smallest ZipCrypto member with OpenMP threads
+    and return the password whose plain text passes the CRC-32 check. The
+    member must not be empty. The passwords are tested in chunks, and
+    LimitExceeded is raised once the deadline passes."""
+    member = header.member
+    if member.file_size == 0:
+        raise ValueError(f"the empty member {member} cannot verify passwords")
+    data = read_encrypted_member(zip_file, member)
+    whole_member = len(data) == member.compress_size
+    stored = whole_member and member.compress_type == zipfile.ZIP_STORED
+    candidates = unique_encoded_passwords(passwords, encodings)
+    encoded_passwords = list(candidates)
+
+    def verify(chunk: list[bytes], index: int) -> bool:
+        # zipfile raises BadZipFile if the CRC-32 doesn't match
+        try:
+            with zip_file.open(member, pwd=chunk[index]) as member_file:
+                while member_file.read(1024 * 1024):
+                    pass
+        except Exception:
+            return False
+        return True
+
+    for start in range(0, len(encoded_passwords), ZIPCRYPTO_CHUNK_SIZE):
+        check_deadline(deadline)
+        chunk = encoded_passwords[start : start + ZIPCRYPTO_CHUNK_SIZE]
+        found = find_password(
+            data,
+            header.check_byte,
+            member.CRC,
+            stored,
+            chunk,
+            functools.partial(verify, chunk),
+            threads or os.cpu_count() or 1,
+        )
+        if found >= 0:
+            return passwords[candidates[chunk[found]]]
+    return None
+
+
+def read_aes_strength(info: zipfile.ZipInfo) -> int | None:
+    extra = info.extra
+    while len(extra) >= 4:
+        header_id, data_size = struct.unpack("<HH", extra[:4])
+        if header_id == AES_EXTRA_ID and data_size >= 7:
+            return extra[8]
+        extra = extra[4 + data_size :]
+    return None
+
+
+def is_aes_member(info: zipfile.ZipInfo) -> bool:
+    return bool(info.flag_bits & ENCRYPTED_FLAG) and (
+        info.compress_type == AES_COMPRESS_TYPE
+    )
+
+
+def read_aes_verifier(zip_file: zipfile.ZipFile) -> AesVerifier | None:
+    """Return the salt and password verifier of the smallest WinZip AES
+    member, or None if the archive has no AES member"""
+    members = [info for info in zip_file.infolist() if is_aes_member(info)]
+    if not members:
+        return None
+    member = min(members, key=lambda info: info.compress_size)
+    strength = read_aes_strength(member)
+    if strength not in AES_SALT_SIZES:
+        raise zipfile.BadZipFile(f"Unknown AES strength of {member}")
+    salt_size = AES_SALT_SIZES[strength]
+    with open(archive_path(zip_file), "rb") as fp:
+        fp.seek(read_local_data_offset(fp, member))
+        data = fp.read(salt_size + AES_VERIFIER_SIZE)
+    if len(data) != salt_size + AES_VERIFIER_SIZE:
+        raise zipfile.BadZipFile(f"Truncated AES header of {member}")
+    return AesVerifier(
+        member=member,
+        salt=data[:salt_size],
+        verifier=data[salt_size:],
+        key_size=AES_KEY_SIZES[strength],
+    )
+
+
+def aes_verifier_matches(pwd: bytes, verifier: AesVerifier) -> bool:
+    # the derived key is the encryption key, the authentication key and the
+    # password verification value
+    derived_key = hashlib.pbkdf2_hmac(
+        "sha1",
+        pwd,
+        verifier.salt,
+        AES_PBKDF2_ITERATIONS,
+        2 * verifier.key_size + AES_VERIFIER_SIZE,
+    )
+    return derived_key[-AES_VERIFIER_SIZE:] == verifier.verifier
+
+
+def screen_aes_passwords(
+    verifier: AesVerifier,
+    passwords: Sequence[str],
+    encodings: list[str],
+    threads: int,
+    deadline: float | None = None,
+) -> list[str]:
+    """Drop passwords whose derived key doesn't match the password verifier,
+    the order of the remaining passwords is kept. pbkdf2_hmac releases the GIL,
+    so the keys are derived by a thread pool, a chunk of passwords at a time.
+    LimitExceeded is raised once the deadline passes."""
+    candidates = list(unique_encoded_passwords(passwords, encodings).items())
+    survivors: set[int] = set()
+    workers = threads or os.cpu_count() or 1
+    chunk_size = AES_CHUNK_SIZE * workers
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for start in range(0, len(candidates), chunk_size):
+            check_deadline(deadline)
+            chunk = candidates[start : start + chunk_size]
+            matches = pool.map(
+                lambda pwd: aes_verifier_matches(pwd, verifier),
+                [pwd for pwd, _index in chunk],
+            )
+            survivors.update(
+                index
+                for (_pwd, index), matched in zip(chunk, matches)
+                if matched
+            )
+    return [passwords[index] for index in sorted(survivors)]
@@ -0,0 +1,193 @@
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from .checkpoint import Checkpoint, is_member_complete
+from .limits import ExtractionGuard
+from .zip_encoding import UTF8_FLAG, detect_metadata_encoding, raw_filenames
+from .zip_mmap import CHUNK_SIZE, MmapZipFile
+
+
+def member_target_path(
+    info: zipfile.ZipInfo, path: str | os.PathLike[str]
+) -> str:
+    """The path zipfile extracts a member to, see ZipFile._extract_member"""
+    arcname = info.filename.replace("/", os.path.sep)
+    if os.path.altsep:
+        arcname = arcname.replace(os.path.altsep, os.path.sep)
+    arcname = os.path.splitdrive(arcname)[1]
+    invalid_path_parts = ("", os.path.curdir, os.path.pardir)
+    arcname = os.path.sep.join(
+        part
+        for part in arcname.split(os.path.sep)
+        if part not in invalid_path_parts
+    )
+    if os.path.sep == "\\":
+        # private to zipfile and not in its type stubs
+        sanitize = getattr(zipfile.ZipFile, "_sanitize_windows_name")
+        arcname = sanitize(arcname, os.path.sep)
+    return os.path.normpath(os.path.join(path, arcname))
+
+
+def extract_member(
+    zip_file: zipfile.ZipFile,
+    info: zipfile.ZipInfo,
+    path: str | os.PathLike[str],
+    pwd: bytes | None = None,
+    guard: ExtractionGuard | None = None,
+) -> str:
+    """Extract a member like ZipFile._extract_member, the plain text is
+    counted by the guard as it's written, so that a member which inflates
+    beyond the limits is stopped early. Return the path of the member."""
+    if guard is not None:
+        guard.add_entry()
+    target = member_target_path(info, path)
+    # other threads may create the same parent directories
+    upperdirs = os.path.dirname(target)
+    if upperdirs:
+        os.makedirs(upperdirs, exist_ok=True)
+    if info.is_dir():
+        os.makedirs(target, exist_ok=True)
+        return target
+    with zip_file.open(info, pwd=pwd) as source, open(target, "wb") as fp:
+        while chunk := source.read(CHUNK_SIZE):
+            if guard is not None:
+                guard.add_bytes(len(chunk))
+            fp.write(chunk)
+    return target
+
+
+class ZipSession:
+    """A zip archive opened once for all the password and encoding attempts.
+
+    The central directory is parsed once. When the metadata encoding changes
+    the file names are decoded again from their raw bytes, so that a password
+    attempt only decrypts the members again.
+    """
+
+    def __init__(self, archive_name: Path, use_mmap: bool = True) -> None:
+        self.archive_name = archive_name
+        # without metadata_encoding zipfile decodes the names with cp437
+        self.zip_file = MmapZipFile(archive_name, use_mmap)
+        self._unflagged = [
+            info
+            for info in self.zip_file.infolist()
+            if not info.flag_bits & UTF8_FLAG
+        ]
+        self._raw_names = raw_filenames(self.zip_file)
+        self.encoding: str | None = None
+        self._detected: dict[tuple[str, ...], str | None] = {}
+
+    def detect_encoding(self, encodings: list[str]) -> str | None:
+        """Detect the metadata encoding among encodings, see
+        detect_metadata_encoding, the result is cached"""
+        key = tuple(encodings)
+        if key not in self._detected:
+            self._detected[key] = detect_metadata_encoding(
+                self._raw_names, encodings
+            )
+        return self._detected[key]
+
+    def set_encoding(self, encoding: str) -> None:
+        """Decode the file names with encoding, raise UnicodeDecodeError like
+        zipfile.ZipFile if a name cannot be decoded"""
+        if encoding == self.encoding:
+            return
+        names = [raw.decode(encoding) for raw in self._raw_names]
+        for info, name in zip(self._unflagged, names):
+            info.orig_filename = name
+            # ZipInfo strips null bytes and converts os.sep
+            info.filename = zipfile.ZipInfo(name).filename
+        self.zip_file.metadata_encoding = encoding
+        self.zip_file.NameToInfo = {
+            info.filename: info for info in self.zip_file.filelist
+        }
+        self.encoding = encoding
+
+    def extractall(
+        self,
+        path: str | os.PathLike[str],
+        pwd: bytes | None = None,
+        threads: int = 1,
+        checkpoint: Checkpoint | None = None,
+        guard: ExtractionGuard | None = None,
+    ) -> int:
+        """Extract all members like ZipFile.extractall, with multiple threads
+        if threads > 1. Return the number of bytes extracted.
+
+        zlib, bz2, lzma and the decrypter release the GIL, so members are
+        inflated in parallel. Stored and deflated members are read from the
+        memory map without a lock, the others share the file handle of
+        zipfile. Members are extracted largest first, so that a large member
+        doesn't start last. Every thread streams one member at a time through
+        a fixed size buffer, which bounds the memory per thread.
+
+        With a checkpoint, members which are already written completely are
+        skipped and every extracted member is recorded. With a guard, the
+        extraction stops with LimitExceeded once it's over the limits.
+        """
+        out_dir = os.fspath(path)
+        # members with the same name resolve to the last one, like extractall
+        members = list(self.zip_file.NameToInfo.values())
+        if checkpoint is not None:
+            members = [
+                info
+                for info in members
+                if not self.is_extracted(info, out_dir, checkpoint)
+            ]
+        if threads <= 1 or len(members) < 2:
+            for info in members:
+                self._extract_member(info, out_dir, pwd, checkpoint, guard)
+            return sum(info.file_size for info in members)
+        members.sort(key=lambda info: info.file_size, reverse=True)
+        pool = ThreadPoolExecutor(max_workers=threads)
+        try:
+            futures = [
+                pool.submit(
+                    self._extract_member, info, out_dir, pwd, checkpoint, guard
+                )
+                for info in members
+            ]
+            for future in as_completed(futures):
+                # raise the first error, the pending members are cancelled
+                future.result()
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+        return sum(info.file_size for info in members)
+
+    def is_extracted(
+        self, info: zipfile.ZipInfo, path: str, checkpoint: Checkpoint
+    ) -> bool:
+        """Compare the file written by an interrupted extraction with the
+        index, the CRC-32 is only computed for files the checkpoint misses"""
+        target = member_target_path(info, path)
+        if info.is_dir():
+            return os.path.isdir(target)
+        return is_member_complete(
+            target, info.file_size, info.CRC, checkpoint.done.get(info.filename)
+        )
+
+    def _extract_member(
+        self,
+        info: zipfile.ZipInfo,
+        path: str,
+        pwd: bytes | None,
+        checkpoint: Checkpoint | None = None,
+        guard: ExtractionGuard | None = None,
+    ) -> None:
+        extract_member(self.zip_file, info, path, pwd, guard)
+        if checkpoint is not None and not info.is_dir():
+            # the CRC-32 is checked by the reader at the end of the member
+            checkpoint.member_done(info.filename, info.CRC)
+
+    def close(self) -> None:
+        self.zip_file.close()
+        self._unflagged.clear()
+        self._raw_names.clear()
+
+    def __enter__(self) -> "ZipSession":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
@@ -0,0 +1,69 @@
+import os
+import zipfile
+from pathlib import Path
+
+from py_extract.checkpoint import Checkpoint, password_digest
+from py_extract.zip_session import ZipSession
+
+MEMBERS = {f"dir/file{i}.bin": os.urandom(1000 + i) for i in range(5)}
+
+
+def make_archive(path: Path) -> None:
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        for name, data in MEMBERS.items():
+            zip_file.writestr(name, data)
+
+
+def test_load_checkpoint(tmp_path: Path):
+    archive = tmp_path / "archive.zip"
+    make_archive(archive)
+    staging = tmp_path / "staging"
+    staging.mkdir()
+    checkpoint = Checkpoint(staging)
+    checkpoint.start(archive, "secret")
+    checkpoint.set_encoding("cp936")
+    checkpoint.member_done("dir/file0.bin", 123)
+    checkpoint.close()
+    with open(checkpoint.path, "a", encoding="utf-8") as fp:
+        # cut by an interruption
+        fp.write('{"name": "dir/fi')
+
+    loaded = Checkpoint.load(staging)
+    assert loaded is not None
+    assert loaded.matches(archive)
+    assert loaded.header["password"] == password_digest("secret")
+    assert loaded.header["encoding"] == "cp936"
+    assert loaded.done == {"dir/file0.bin": 123}
+    loaded.member_done("dir/file1.bin", 456)
+    loaded.close()
+    reloaded = Checkpoint.load(staging)
+    assert reloaded is not None
+    assert reloaded.done == {
+        "dir/file0.bin": 123,
+        "dir/file1.bin": 456,
+    }
+    archive.write_bytes(b"changed")
+    assert not loaded.matches(archive)
+
+
+def test_resume_extraction(tmp_path: Path):
+    archive = tmp_path / "archive.zip"
+    make_archive(archive)
+    staging = tmp_path / "staging"
+    with ZipSession(archive) as session:
+        session.extractall(staging)
+    names = list(MEMBERS)
+    # interrupted while writing file1, file2 and later are not written
+    (staging / names[1]).write_bytes(MEMBERS[names[1]][:10])
+    for name in names[2:]:
+        (staging / name).unlink()
+    # the checkpoint misses file0, its CRC-32 is computed
+    checkpoint = Checkpoint(staging)
+    checkpoint.start(archive, "")
+    with ZipSession(archive) as session:
+        extracted = session.extractall(staging, checkpoint=checkpoint)
+    assert extracted == sum(len(MEMBERS[name]) for name in names[1:])
+    assert sorted(checkpoint.done) == names[1:]
+    for name, data in MEMBERS.items():
+        assert (staging / name).read_bytes() == data
+    checkpoint.remove()
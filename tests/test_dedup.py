@@ -0,0 +1,82 @@
+import os
+import threading
+from pathlib import Path
+
+from py_extract.dedup import (
+    SAMPLE_SIZE,
+    ArchiveIndex,
+    ExtractedArchive,
+    link_tree,
+    quick_fingerprint,
+)
+
+
+def test_fingerprint_collision(tmp_path: Path):
+    data = os.urandom(SAMPLE_SIZE * 8)
+    first = tmp_path / "first.zip"
+    copy = tmp_path / "copy.zip"
+    # differs outside of the sampled blocks
+    other = tmp_path / "other.zip"
+    first.write_bytes(data)
+    copy.write_bytes(data)
+    middle = bytearray(data)
+    middle[SAMPLE_SIZE + 1] ^= 0xFF
+    other.write_bytes(middle)
+    assert quick_fingerprint([first]) == quick_fingerprint([other])
+
+    index = ArchiveIndex()
+    assert index.acquire([first]) is None
+    extracted = ExtractedArchive(first, tmp_path / "first.zip_out", "pwd")
+    index.release([first], extracted)
+    assert index.acquire([copy]) == extracted
+    assert index.acquire([other]) is None
+    index.release([other], None)
+
+
+def test_wait_for_the_first_copy(tmp_path: Path):
+    first = tmp_path / "first.zip"
+    copy = tmp_path / "copy.zip"
+    first.write_bytes(b"archive")
+    copy.write_bytes(b"archive")
+    index = ArchiveIndex()
+    assert index.acquire([first]) is None
+    results = []
+    waiter = threading.Thread(
+        target=lambda: results.append(index.acquire([copy]))
+    )
+    waiter.start()
+    # the first copy failed, the waiter extracts the content itself
+    index.release([first], None)
+    waiter.join()
+    assert results == [None]
+    index.release([copy], None)
+
+
+def test_register_previous_output(tmp_path: Path):
+    first = tmp_path / "first.zip"
+    copy = tmp_path / "copy.zip"
+    first.write_bytes(b"archive")
+    copy.write_bytes(b"archive")
+    index = ArchiveIndex()
+    extracted = ExtractedArchive(first, tmp_path / "first.zip_out", None)
+    index.register([first], extracted)
+    assert index.acquire([copy]) == extracted
+    # a known content is not replaced
+    index.register([copy], ExtractedArchive(copy, tmp_path / "copy", None))
+    assert index.acquire([first]) == extracted
+
+
+def test_link_tree(tmp_path: Path):
+    src = tmp_path / "src"
+    (src / "dir").mkdir(parents=True)
+    (src / "dir" / "file.txt").write_text("content")
+    (src / ".inner.zip_out.abc.py_extract_staging").mkdir()
+    for mode in ("hardlink", "reflink"):
+        dst = tmp_path / mode
+        dst.mkdir()
+        link_tree(src, dst, mode)
+        assert (dst / "dir" / "file.txt").read_text() == "content"
+        assert [path.name for path in dst.iterdir()] == ["dir"]
+    assert (tmp_path / "hardlink" / "dir" / "file.txt").samefile(
+        src / "dir" / "file.txt"
+    )
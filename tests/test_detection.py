@@ -0,0 +1,37 @@
+import tarfile
+import zipfile
+from pathlib import Path
+
+from py_extract.detection import ArchiveType, detect_archive_type
+
+
+def test_detect_archive_type(tmp_path: Path):
+    zip_path = tmp_path / "archive.zip"
+    with zipfile.ZipFile(zip_path, "w") as zip_file:
+        zip_file.writestr("file.txt", "content")
+    tar_path = tmp_path / "archive.tar"
+    with tarfile.open(tar_path, "w") as tar_file:
+        tar_file.add(zip_path, arcname="archive.zip")
+    seven_zip_path = tmp_path / "archive.7z.001"
+    seven_zip_path.write_bytes(b"7z\xbc\xaf\x27\x1c\x00\x04" + bytes(100))
+    rar_path = tmp_path / "archive.part1.rar"
+    rar_path.write_bytes(b"Rar!\x1a\x07\x01\x00" + bytes(100))
+    text_path = tmp_path / "file.txt"
+    text_path.write_text("not an archive")
+    empty_path = tmp_path / "empty"
+    empty_path.write_bytes(b"")
+
+    assert detect_archive_type(zip_path) == ArchiveType.ZIP
+    assert detect_archive_type(tar_path) == ArchiveType.TAR
+    assert detect_archive_type(seven_zip_path) == ArchiveType.SEVENTH_ZIP
+    assert detect_archive_type(rar_path) == ArchiveType.RAR
+    assert detect_archive_type(text_path) is None
+    assert detect_archive_type(empty_path) is None
+
+
+def test_detect_zip_based_document(tmp_path: Path):
+    document_path = tmp_path / "book.epub"
+    with zipfile.ZipFile(document_path, "w") as zip_file:
+        zip_file.writestr("mimetype", "application/epub+zip")
+        zip_file.writestr("OEBPS/chapter.xhtml", "<html/>")
+    assert detect_archive_type(document_path) is None
@@ -39,6 +39,10 @@ def test_py_extract(tmp_path: Path):
         test_config = toml.load(example_config_file)
         test_config["path"]["target_directory"] = str(tmp_dir)
         test_config["path"]["password_path"] = str(passwords_path)
+        test_config["path"]["manifest_path"] = str(tmp_path / "manifest.db")
+        test_config["path"]["password_stats_path"] = str(
+            tmp_path / "password_stats.db"
+        )
         test_config["rename"]["substrings"] = ["删除", "删", "删我"]
         test_config["auto_rename"] = True
 
@@ -0,0 +1,35 @@
+import threading
+from io import StringIO
+
+from py_extract.utils import GroupedOutput
+
+
+def test_grouped_output():
+    stream = StringIO()
+    output = GroupedOutput(stream)
+    first_started = threading.Event()
+    second_done = threading.Event()
+
+    def first():
+        with output.group():
+            output.write("first 1\n")
+            first_started.set()
+            second_done.wait()
+            output.write("first 2\n")
+
+    def second():
+        first_started.wait()
+        with output.group():
+            output.write("second 1\n")
+            output.write("second 2\n")
+        second_done.set()
+
+    threads = [threading.Thread(target=first), threading.Thread(target=second)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    output.write("ungrouped\n")
+    assert stream.getvalue() == (
+        "second 1\nsecond 2\nfirst 1\nfirst 2\nungrouped\n"
+    )
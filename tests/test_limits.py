@@ -0,0 +1,69 @@
+import subprocess
+import sys
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from py_extract import limits
+from py_extract.exceptions import LimitExceeded
+from py_extract.limits import ExtractionGuard, communicate_guarded
+from py_extract.zip_session import ZipSession
+
+
+def test_guard_limits(monkeypatch):
+    monkeypatch.setattr(limits, "RATIO_GRACE", 100)
+    guard = ExtractionGuard(archive_size=10, max_ratio=20, max_entries=2)
+    guard.add_entry()
+    guard.add_entry()
+    # small outputs aren't checked for the ratio
+    guard.add_bytes(100)
+    with pytest.raises(LimitExceeded, match="ratio"):
+        guard.add_bytes(101)
+    with pytest.raises(LimitExceeded, match="entries"):
+        guard.add_entry()
+    # a retry starts from nothing written
+    guard.reset()
+    guard.add_entry()
+    guard.add_bytes(200)
+    expired = ExtractionGuard(archive_size=10, deadline=0)
+    with pytest.raises(LimitExceeded, match="time"):
+        expired.add_entry()
+
+
+def test_zip_bomb_stops_early(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(limits, "RATIO_GRACE", 1024 * 1024)
+    archive = tmp_path / "bomb.zip"
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        for i in range(4):
+            zip_file.writestr(f"zeros{i}.bin", bytes(16 * 1024 * 1024))
+    guard = ExtractionGuard(archive.stat().st_size, max_ratio=100)
+    with ZipSession(archive) as session:
+        with pytest.raises(LimitExceeded):
+            session.extractall(tmp_path / "out", threads=2, guard=guard)
+    written = sum(path.stat().st_size for path in (tmp_path / "out").rglob("*"))
+    assert written < 16 * 1024 * 1024 * 4
+
+
+def test_process_killed(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(limits, "POLL_INTERVAL", 0.05)
+    out_path = tmp_path / "out"
+    script = (
+        "import pathlib, sys, time\n"
+        "out = pathlib.Path(sys.argv[1])\n"
+        "out.mkdir()\n"
+        "for i in range(1000):\n"
+        "    (out / str(i)).write_bytes(b'x')\n"
+        "    time.sleep(0.01)\n"
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-c", script, str(out_path)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    guard = ExtractionGuard(archive_size=1, max_entries=10)
+    with pytest.raises(LimitExceeded, match="entries"):
+        communicate_guarded(proc, out_path, guard)
+    assert proc.returncode is not None
+    assert len(list(out_path.iterdir())) < 1000
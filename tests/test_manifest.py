@@ -0,0 +1,65 @@
+import os
+from pathlib import Path
+
+from py_extract.manifest import ExtractionManifest, settings_fingerprint
+
+
+def test_manifest(tmp_path: Path):
+    archive = tmp_path / "archive.zip"
+    archive.write_bytes(b"archive")
+    manifest = ExtractionManifest(tmp_path / "manifest.db", "fingerprint")
+    assert manifest.lookup(archive, archive.stat()) is None
+    manifest.record(
+        archive,
+        "application/zip",
+        status="SUCCESS",
+        password_index=3,
+        encoding="cp936",
+        out_path=tmp_path / "archive.zip_out",
+    )
+    manifest.close()
+
+    manifest = ExtractionManifest(tmp_path / "manifest.db", "fingerprint")
+    record = manifest.lookup(archive, archive.stat())
+    assert record is not None
+    assert record.archive_type == "application/zip"
+    assert record.status == "SUCCESS"
+    assert record.password_index == 3
+    assert record.encoding == "cp936"
+    assert record.out_path == str(tmp_path / "archive.zip_out")
+
+    # a modified file is a new file
+    stat_result = archive.stat()
+    os.utime(archive, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns + 1))
+    assert manifest.lookup(archive, archive.stat()) is None
+    manifest.close()
+
+
+def test_settings_fingerprint(tmp_path: Path):
+    passwords = tmp_path / "passwords.txt"
+    config = tmp_path / "config.toml"
+    passwords.write_text("password")
+    config.write_text("config")
+    fingerprint = settings_fingerprint(str(passwords), str(config))
+    assert fingerprint == settings_fingerprint(str(passwords), str(config))
+    passwords.write_text("new password")
+    assert fingerprint != settings_fingerprint(str(passwords), str(config))
+
+
+def test_manifest_batches_files(tmp_path: Path):
+    files = [tmp_path / f"file{i}.txt" for i in range(3)]
+    for file in files:
+        file.write_bytes(b"file")
+    manifest = ExtractionManifest(tmp_path / "manifest.db", "fingerprint")
+    for file in files:
+        manifest.record(file, None)
+    # the rows of the files which are not archives are committed on close
+    assert all(manifest.lookup(file, file.stat()) for file in files)
+    manifest.close()
+
+    manifest = ExtractionManifest(tmp_path / "manifest.db", "fingerprint")
+    for file in files:
+        record = manifest.lookup(file, file.stat())
+        assert record is not None
+        assert record.archive_type is None
+    manifest.close()
@@ -0,0 +1,48 @@
+from pathlib import Path
+from types import SimpleNamespace
+
+from py_extract import password_ranking
+from py_extract.password_ranking import PasswordRanking, source_hints
+
+PASSWORDS = ["first", "second", "third", "fourth"]
+
+
+def test_order_by_hits(tmp_path: Path):
+    stats = tmp_path / "stats.db"
+    ranking = PasswordRanking(stats, PASSWORDS, ["directory"])
+    archive = tmp_path / "source_a" / "archive.zip"
+    other_source = tmp_path / "source_b" / "archive.zip"
+    assert ranking.rank(archive) == []
+    ranking.record_hit(archive, "third")
+    ranking.record_hit(other_source, "fourth")
+    ranking.record_hit(other_source, "fourth")
+    ranking.close()
+
+    ranking = PasswordRanking(stats, PASSWORDS, ["directory"])
+    # hits on the same source go before the hits on all archives
+    assert ranking.rank(archive) == [2, 3]
+    assert ranking.rank(other_source) == [3, 2]
+    ranking.close()
+
+
+def test_decay(tmp_path: Path, monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(
+        password_ranking, "time", SimpleNamespace(time=lambda: now[0])
+    )
+    ranking = PasswordRanking(":memory:", PASSWORDS, [], half_life=10)
+    archive = tmp_path / "archive.zip"
+    for _ in range(3):
+        ranking.record_hit(archive, "second")
+    now[0] = 30
+    ranking.record_hit(archive, "third")
+    # three hits three half-lives ago count less than a recent hit
+    assert ranking.rank(archive) == [2, 1]
+    ranking.close()
+
+
+def test_source_hints():
+    hints = source_hints(
+        Path("dir/Show 2023-01 ep12.zip"), ["directory", "name"]
+    )
+    assert hints == ["", "directory:dir", "name:show #-# ep#.zip"]
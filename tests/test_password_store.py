@@ -0,0 +1,64 @@
+import os
+from pathlib import Path
+
+from py_extract.password_store import cache_path, load_password_store
+from py_extract.zip_probe import encode_passwords, unique_encoded_passwords
+
+PASSWORDS_TEXT = """\
+second
+密码
+first
+
+first
+ascii
+"""
+
+
+def test_password_store(tmp_path: Path):
+    password_path = tmp_path / "passwords.txt"
+    password_path.write_text(PASSWORDS_TEXT, encoding="utf-8")
+    store = load_password_store(password_path, ["cp936", "utf-8", "latin-1"])
+    assert cache_path(password_path).is_file()
+    # the groups are reversed, duplicates are dropped
+    assert list(store) == ["", "first", "ascii", "second", "密码"]
+    assert store.encodings == ["utf-8", "cp936", "latin-1"]
+    assert store.index("密码") == 4 and "missing" not in store
+    assert store.encoded(4, "cp936") == "密码".encode("cp936")
+    assert store.encoded(4, "latin-1") is None
+
+    order = store.ordered([0, 4, 2])
+    assert list(order) == ["", "密码", "ascii", "first", "second"]
+    assert [order[i] for i in range(len(order))] == list(order)
+    assert order.index("first") == 3
+    indices, encoded = encode_passwords(order, "latin-1")
+    assert indices == [0, 2, 3, 4]
+    assert encoded == [b"", b"ascii", b"first", b"second"]
+    # ASCII passwords are tested once for all the encodings
+    assert unique_encoded_passwords(order, store.encodings) == {
+        b"": 0,
+        "密码".encode("utf-8"): 1,
+        "密码".encode("cp936"): 1,
+        b"ascii": 2,
+        b"first": 3,
+        b"second": 4,
+    }
+    store.close()
+
+
+def test_rebuild_when_modified(tmp_path: Path):
+    password_path = tmp_path / "passwords.txt"
+    password_path.write_text("first\n", encoding="utf-8")
+    store = load_password_store(password_path, ["utf-8"])
+    assert list(store) == ["", "first"]
+    store.close()
+    cached = cache_path(password_path).stat().st_mtime_ns
+    store = load_password_store(password_path, ["utf-8"])
+    assert cache_path(password_path).stat().st_mtime_ns == cached
+    store.close()
+
+    password_path.write_text("first\nsecond\n", encoding="utf-8")
+    stat_result = password_path.stat()
+    os.utime(password_path, ns=(stat_result.st_atime_ns, cached + 1))
+    store = load_password_store(password_path, ["utf-8"])
+    assert list(store) == ["", "first", "second"]
+    store.close()
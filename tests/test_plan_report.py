@@ -0,0 +1,131 @@
+import csv
+import json
+import shutil
+import sys
+import zipfile
+from pathlib import Path
+
+import toml
+
+from py_extract import create_py_extractor
+from py_extract.plan_report import (
+    DEFERRED,
+    EXISTS,
+    READY,
+    WRONG_PASSWORD,
+    PlannedArchive,
+    defer_overflowing,
+    save_report,
+    summarize,
+)
+
+from .zipcrypto import write_zipcrypto
+
+
+def planned(path: Path, extracted_size: int | None, status=READY):
+    return PlannedArchive(
+        path=str(path),
+        type="zip",
+        volumes=1,
+        archive_size=1_000_000,
+        extracted_size=extracted_size,
+        encrypted=False,
+        password="",
+        candidates=1,
+        status=status,
+    )
+
+
+def test_defer_overflowing(tmp_path: Path):
+    free = shutil.disk_usage(tmp_path).free
+    archives = [
+        planned(tmp_path / "large.zip", free // 2 + 1),
+        planned(tmp_path / "small.zip", free // 2),
+        planned(tmp_path / "unknown.zip", None),
+        planned(tmp_path / "wrong.zip", free, WRONG_PASSWORD),
+    ]
+    defer_overflowing(archives, "small_first")
+    assert [archive.status for archive in archives] == [
+        DEFERRED,
+        READY,
+        READY,
+        WRONG_PASSWORD,
+    ]
+    summary = summarize(archives, speed=1.0)
+    assert summary["statuses"] == {DEFERRED: 1, READY: 2, WRONG_PASSWORD: 1}
+    # a run in scan order doesn't read the sizes
+    scanned = [planned(tmp_path / "large.zip", free + 1)]
+    defer_overflowing(scanned, "scan_order")
+    assert scanned[0].status == READY
+    assert summary["extracted_size"] == free // 2
+    assert summary["unknown_sizes"] == 1
+    assert summary["estimated_seconds"] == 2
+
+
+def test_save_report(tmp_path: Path):
+    archives = [planned(tmp_path / "archive.zip", 4096)]
+    summary = summarize(archives, speed=1.0)
+    save_report(archives, summary, str(tmp_path), str(tmp_path / "plan.csv"))
+    with open(tmp_path / "plan.csv", encoding="utf-8") as fp:
+        rows = list(csv.DictReader(fp))
+    assert rows[0]["path"] == str(tmp_path / "archive.zip")
+    assert rows[0]["extracted_size"] == "4096"
+    save_report(archives, summary, str(tmp_path), str(tmp_path / "plan.json"))
+    with open(tmp_path / "plan.json", encoding="utf-8") as fp:
+        report = json.load(fp)
+    assert report["summary"] == summary
+    assert report["archives"][0]["status"] == READY
+
+
+def test_plan_writes_nothing(tmp_path: Path):
+    tmp_dir = tmp_path / "dir"
+    tmp_dir.mkdir()
+    with zipfile.ZipFile(tmp_dir / "plain.zip", "w") as zip_file:
+        zip_file.writestr("file.txt", b"content")
+    write_zipcrypto(tmp_dir / "encrypted.zip", {"file.txt": b"x" * 100}, b"pw2")
+    write_zipcrypto(tmp_dir / "unknown.zip", {"file.txt": b"x" * 100}, b"pw3")
+    write_zipcrypto(tmp_dir / "extracted.zip", {"file.txt": b"x" * 100}, b"pw1")
+    (tmp_dir / "extracted.zip_out").mkdir()
+    passwords_path = tmp_path / "passwords.txt"
+    # some of the wrong passwords pass the encryption header check
+    wrong = "".join(f"wrong{i}\n" for i in range(2000))
+    passwords_path.write_text(f"pw1\npw2\n{wrong}", encoding="utf-8")
+    with open(
+        "./config/example_config.toml", "r", encoding="utf-8"
+    ) as example_config_file:
+        test_config = toml.load(example_config_file)
+    test_config["path"]["target_directory"] = str(tmp_dir)
+    test_config["path"]["password_path"] = str(passwords_path)
+    test_config["path"]["manifest_path"] = str(tmp_path / "manifest.db")
+    test_config["path"]["password_stats_path"] = ""
+    test_config_path = tmp_path / "test_config.toml"
+    with open(test_config_path, "w", encoding="utf-8") as test_config_file:
+        toml.dump(test_config, test_config_file)
+    files = sorted(tmp_dir.iterdir())
+
+    report_path = tmp_path / "plan.json"
+    sys.argv[1:] = [
+        "--config",
+        str(test_config_path),
+        "--plan",
+        str(report_path),
+    ]
+    create_py_extractor().run()
+
+    assert sorted(tmp_dir.iterdir()) == files
+    with open(report_path, encoding="utf-8") as fp:
+        report = json.load(fp)
+    statuses = {
+        Path(archive["path"]).name: (
+            archive["status"],
+            archive["encrypted"],
+            archive["password"],
+        )
+        for archive in report["archives"]
+    }
+    assert statuses == {
+        "plain.zip": (READY, False, ""),
+        "encrypted.zip": (READY, True, "pw2"),
+        "unknown.zip": (WRONG_PASSWORD, True, None),
+        "extracted.zip": (EXISTS, None, None),
+    }
@@ -0,0 +1,46 @@
+import shutil
+import zipfile
+from pathlib import Path
+
+from py_extract.detection import ArchiveType
+from py_extract.planning import (
+    BLOCK_SIZE,
+    DiskBudget,
+    extracted_size,
+    schedule_key,
+)
+
+
+def test_extracted_size(tmp_path: Path):
+    archive = tmp_path / "archive.zip"
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        zip_file.writestr("dir/", b"")
+        zip_file.writestr("dir/small.txt", b"x")
+        zip_file.writestr("large.bin", bytes(BLOCK_SIZE * 3 + 1))
+    assert extracted_size(archive, ArchiveType.ZIP) == BLOCK_SIZE * 5
+
+
+def test_schedule_key():
+    archives = [("a", 30), ("b", None), ("c", 10), ("d", 20)]
+    assert sorted(archives, key=schedule_key("small_first")) == [
+        ("c", 10),
+        ("d", 20),
+        ("a", 30),
+        ("b", None),
+    ]
+    assert [
+        name
+        for name, _size in sorted(archives, key=schedule_key("large_first"))
+    ] == ["a", "d", "c", "b"]
+    assert sorted(archives, key=schedule_key("scan_order")) == archives
+
+
+def test_disk_budget(tmp_path: Path):
+    budget = DiskBudget()
+    free = shutil.disk_usage(tmp_path).free
+    assert not budget.reserve(tmp_path, free * 2)
+    assert budget.reserve(tmp_path, free // 2)
+    # the space reserved by another extraction isn't available
+    assert not budget.reserve(tmp_path, free // 2 + BLOCK_SIZE * 1024)
+    budget.release(tmp_path, free // 2)
+    assert budget.reserve(tmp_path, free // 2 + BLOCK_SIZE * 1024)
@@ -0,0 +1,126 @@
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from py_extract.seven_zip import (
+    ProcessGroup,
+    SevenZipEntry,
+    parse_slt,
+    pick_probe_entry,
+)
+
+SLT_OUTPUT = """\
+
+7-Zip [64] 16.02 : Copyright (c) 1999-2016 Igor Pavlov : 2016-05-21
+
+Scanning the drive for archives:
+1 file, 9562 bytes (10 KiB)
+
+Listing archive: archive.7z
+
+--
+Path = archive.7z
+Type = 7z
+Physical Size = 9562
+Headers Size = 266
+Method = LZMA2:24 7zAES
+Solid = +
+Blocks = 2
+
+----------
+Path = dir
+Size = 0
+Packed Size = 0
+Attributes = D
+Encrypted = -
+Method =
+Block =
+
+Path = dir/big.txt
+Size = 4096
+Packed Size = 9000
+Attributes = A
+CRC = 0A1B2C3D
+Encrypted = +
+Method = LZMA2:24 7zAES:19
+Block = 0
+
+Path = dir/after_big.txt
+Size = 10
+Packed Size =
+Attributes = A
+CRC = 0A1B2C3D
+Encrypted = +
+Method = LZMA2:24 7zAES:19
+Block = 0
+
+Path = dir/medium.txt
+Size = 100
+Packed Size = 296
+Attributes = A
+CRC = 0A1B2C3D
+Encrypted = +
+Method = LZMA2:24 7zAES:19
+Block = 1
+
+"""
+
+
+def test_parse_slt():
+    listing = parse_slt(SLT_OUTPUT)
+    assert listing is not None
+    assert listing.properties["Type"] == "7z"
+    assert listing.solid
+    assert [entry.path for entry in listing.entries] == [
+        "dir",
+        "dir/big.txt",
+        "dir/after_big.txt",
+        "dir/medium.txt",
+    ]
+    assert listing.entries[0].is_dir
+    assert listing.entries[1].encrypted
+
+
+def test_pick_probe_entry():
+    listing = parse_slt(SLT_OUTPUT)
+    assert listing is not None
+    # the small entry is behind a big one in the same solid block
+    entry = pick_probe_entry(listing)
+    assert entry is not None
+    assert entry.path == "dir/medium.txt"
+    listing.properties["Solid"] = "-"
+    entry = pick_probe_entry(listing)
+    assert entry is not None
+    assert entry.path == "dir/after_big.txt"
+
+
+def test_pick_probe_entry_skips_empty():
+    listing = parse_slt(SLT_OUTPUT)
+    assert listing is not None
+    listing.properties["Solid"] = "-"
+    # an empty encrypted entry can be tested with a wrong password
+    listing.entries.insert(
+        1, SevenZipEntry("dir/empty.txt", 0, encrypted=True, is_dir=False)
+    )
+    entry = pick_probe_entry(listing)
+    assert entry is not None
+    assert entry.path == "dir/after_big.txt"
+    listing.entries = [listing.entries[1]]
+    assert pick_probe_entry(listing) is None
+
+
+def test_parse_slt_without_entries():
+    assert parse_slt("Can not open encrypted archive. Wrong password?") is None
+
+
+def test_process_group_terminate():
+    group = ProcessGroup()
+    sleep_cmd = [sys.executable, "-c", "import time; time.sleep(30)"]
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = [pool.submit(group.run, sleep_cmd) for _ in range(2)]
+        while len(group._procs) < 2:
+            time.sleep(0.01)
+        group.terminate()
+        assert all(future.result().returncode != 0 for future in futures)
+    # nothing is started after termination
+    assert group.run(sleep_cmd).returncode == -1
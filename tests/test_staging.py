@@ -0,0 +1,48 @@
+from pathlib import Path
+
+from py_extract.staging import StagingArea, is_staging_dir
+from py_extract.walker import scan_files
+
+
+def test_commit_and_discard(tmp_path: Path):
+    area = StagingArea()
+    out_path = tmp_path / "archive.zip_out"
+    staging = area.create(out_path)
+    assert is_staging_dir(staging.name) and staging.parent == tmp_path
+    (staging / "file.txt").write_text("content")
+    assert area.commit(staging, out_path)
+    assert (out_path / "file.txt").read_text() == "content"
+
+    failed = area.create(tmp_path / "other.zip_out")
+    (failed / "partial.txt").write_text("partial")
+    area.discard(failed)
+    area.close()
+    assert sorted(path.name for path in tmp_path.iterdir()) == [out_path.name]
+
+
+def test_reset(tmp_path: Path):
+    area = StagingArea()
+    staging = area.create(tmp_path / "archive.zip_out")
+    (staging / "partial.txt").write_text("partial")
+    area.reset(staging)
+    assert staging.is_dir() and not any(staging.iterdir())
+    area.discard(staging)
+    area.close()
+    assert not any(tmp_path.iterdir())
+
+
+def test_sweep_orphans(tmp_path: Path):
+    (tmp_path / "archive.zip").write_bytes(b"")
+    orphan = tmp_path / ".archive.zip_out.abc.py_extract_staging"
+    orphan.mkdir()
+    (orphan / "archive.zip").write_bytes(b"")
+    area = StagingArea()
+    active = area.create(tmp_path / "other.zip_out")
+    staging_dirs: list[str] = []
+    files = scan_files(tmp_path, recursive=True, staging_dirs=staging_dirs)
+    # staging directories are never walked
+    assert [entry.name for entry in files] == ["archive.zip"]
+    assert sorted(staging_dirs) == sorted([str(orphan), str(active)])
+    area.sweep(staging_dirs)
+    area.close()
+    assert not orphan.exists() and active.exists()
@@ -0,0 +1,140 @@
+import io
+import json
+import sys
+import time
+import zipfile
+from pathlib import Path
+
+import pyzipper
+import toml
+
+from py_extract import create_py_extractor
+from py_extract.trace import TRACE_VERSION
+
+from .zipcrypto import write_zipcrypto
+
+
+def run_traced(tmp_path: Path, tmp_dir: Path, passwords: str, **options):
+    """Run the extractor on tmp_dir and return the traces by file name"""
+    passwords_path = tmp_path / "passwords.txt"
+    passwords_path.write_text(passwords, encoding="utf-8")
+    trace_path = tmp_path / "trace.jsonl"
+    with open(
+        "./config/example_config.toml", "r", encoding="utf-8"
+    ) as example_config_file:
+        test_config = toml.load(example_config_file)
+    test_config["path"]["target_directory"] = str(tmp_dir)
+    test_config["path"]["password_path"] = str(passwords_path)
+    test_config["path"]["manifest_path"] = ""
+    test_config["path"]["password_stats_path"] = ""
+    test_config["path"]["trace_path"] = str(trace_path)
+    for table, values in options.items():
+        test_config[table].update(values)
+    test_config_path = tmp_path / "test_config.toml"
+    with open(test_config_path, "w", encoding="utf-8") as test_config_file:
+        toml.dump(test_config, test_config_file)
+
+    sys.argv[1:] = ["--config", str(test_config_path)]
+    create_py_extractor().run()
+
+    with open(trace_path, encoding="utf-8") as fp:
+        return {
+            Path(trace["path"]).name: trace for trace in map(json.loads, fp)
+        }
+
+
+def test_trace_per_archive(tmp_path: Path):
+    tmp_dir = tmp_path / "dir"
+    tmp_dir.mkdir()
+    with zipfile.ZipFile(tmp_dir / "plain.zip", "w") as zip_file:
+        zip_file.writestr("file.txt", b"content")
+    write_zipcrypto(tmp_dir / "encrypted.zip", {"file.txt": b"x" * 100}, b"pw2")
+    write_zipcrypto(tmp_dir / "unknown.zip", {"file.txt": b"x" * 100}, b"pw3")
+    # Info-ZIP encrypts empty files too, every password passes their CRC-32
+    write_zipcrypto(
+        tmp_dir / "empty.zip",
+        {"empty.txt": b"", "file.txt": b"x" * 100},
+        b"pw4",
+    )
+    # about 1/256 of the wrong passwords pass the encryption header check
+    wrong = "".join(f"wrong{i}\n" for i in range(2000))
+    traces = run_traced(tmp_path, tmp_dir, f"pw1\npw2\n{wrong}pw4\n")
+
+    assert set(traces) == {
+        "plain.zip",
+        "encrypted.zip",
+        "unknown.zip",
+        "empty.zip",
+    }
+    encrypted = traces["encrypted.zip"]
+    assert encrypted["version"] == TRACE_VERSION
+    assert encrypted["status"] == "SUCCESS"
+    assert encrypted["type"] == "zip"
+    assert encrypted["bytes_in"] == (tmp_dir / "encrypted.zip").stat().st_size
+    assert encrypted["bytes_out"] == 100
+    # the empty password is the first one of the store
+    assert encrypted["password_index"] == 2
+    assert encrypted["attempts"] == len(encrypted["attempt_seconds"]) == 1
+    assert encrypted["detection_seconds"] is not None
+    assert traces["plain.zip"]["password_index"] == 0
+    # every password is verified on the smallest member, none is extracted
+    assert traces["unknown.zip"]["status"] == "WRONG_PASSWORD"
+    assert traces["unknown.zip"]["attempts"] == 0
+    assert traces["empty.zip"]["status"] == "SUCCESS"
+    assert traces["empty.zip"]["attempts"] == 1
+
+
+def zip_bytes(name: str, data: bytes) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zip_file:
+        zip_file.writestr(name, data)
+    return buffer.getvalue()
+
+
+def test_trace_statuses_of_skipped_archives(tmp_path: Path):
+    tmp_dir = tmp_path / "dir"
+    tmp_dir.mkdir()
+    copy = zip_bytes("file.txt", b"content")
+    (tmp_dir / "copy1.zip").write_bytes(copy)
+    (tmp_dir / "copy2.zip").write_bytes(copy)
+    inner = zip_bytes("file.txt", b"inner")
+    middle = zip_bytes("inner.zip", inner)
+    (tmp_dir / "outer.zip").write_bytes(zip_bytes("middle.zip", middle))
+    traces = run_traced(
+        tmp_path,
+        tmp_dir,
+        "",
+        performance={"dedup": "skip"},
+        limits={"max_depth": 1},
+    )
+
+    assert sorted(
+        [traces["copy1.zip"]["status"], traces["copy2.zip"]["status"]]
+    ) == ["DUPLICATE", "SUCCESS"]
+    assert traces["middle.zip"]["status"] == "SUCCESS"
+    assert traces["inner.zip"]["status"] == "NESTED_TOO_DEEP"
+
+    # the output of the first run is known, the copy is skipped again
+    traces = run_traced(tmp_path, tmp_dir, "", performance={"dedup": "skip"})
+    assert sorted(
+        [traces["copy1.zip"]["status"], traces["copy2.zip"]["status"]]
+    ) == ["DUPLICATE", "EXISTS"]
+    assert len(list(tmp_dir.glob("copy*.zip_out"))) == 1
+
+
+def test_trace_screening_out_of_time(tmp_path: Path):
+    tmp_dir = tmp_path / "dir"
+    tmp_dir.mkdir()
+    with pyzipper.AESZipFile(
+        tmp_dir / "aes.zip", "w", encryption=pyzipper.WZ_AES
+    ) as zip_file:
+        zip_file.setpassword(b"secret")
+        zip_file.writestr("file.txt", b"content")
+    # deriving the AES keys of all passwords takes far longer than the limit
+    wrong = "".join(f"wrong{i}\n" for i in range(20000))
+    start = time.monotonic()
+    traces = run_traced(tmp_path, tmp_dir, wrong, limits={"time_limit": 0.5})
+
+    assert time.monotonic() - start < 10
+    assert traces["aes.zip"]["status"] == "LIMIT_EXCEEDED"
+    assert traces["aes.zip"]["attempts"] == 0
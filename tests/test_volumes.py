@@ -0,0 +1,74 @@
+import os
+from pathlib import Path
+
+from py_extract.volumes import (
+    RAR_OLD_STYLE,
+    RAR_PARTS,
+    SPLIT_FILE,
+    SPLIT_ZIP,
+    group_volumes,
+)
+
+
+def make_files(directory: Path, names: list[str]) -> list[os.DirEntry]:
+    for name in names:
+        (directory / name).write_bytes(b"volume")
+    return sorted(os.scandir(directory), key=lambda entry: entry.name)
+
+
+def test_group_volumes(tmp_path: Path):
+    entries = make_files(
+        tmp_path,
+        [
+            "movie.part1.rar",
+            "movie.part2.rar",
+            "movie.part3.rar",
+            "old.rar",
+            "old.r00",
+            "old.r01",
+            "backup.7z.001",
+            "backup.7z.002",
+            "docs.z01",
+            "docs.z02",
+            "docs.zip",
+            "single.zip",
+            "notes.txt",
+        ],
+    )
+    volume_sets, standalone = group_volumes(entries)
+    sets = {volume_set.kind: volume_set for volume_set in volume_sets}
+    assert len(volume_sets) == 4
+    assert sets[RAR_PARTS].first == tmp_path / "movie.part1.rar"
+    assert len(sets[RAR_PARTS].members) == 3
+    assert sets[RAR_PARTS].total_size == 3 * len(b"volume")
+    assert sets[RAR_OLD_STYLE].members == [
+        tmp_path / "old.rar",
+        tmp_path / "old.r00",
+        tmp_path / "old.r01",
+    ]
+    assert sets[SPLIT_FILE].first == tmp_path / "backup.7z.001"
+    # split zip archives are opened from the .zip volume
+    assert sets[SPLIT_ZIP].first == tmp_path / "docs.zip"
+    # zipfile cannot read the pieces of a split archive, 7z extracts them
+    assert [kind for kind, volume_set in sets.items() if volume_set.split] == [
+        SPLIT_FILE,
+        SPLIT_ZIP,
+    ]
+    assert all(volume_set.complete for volume_set in volume_sets)
+    assert sorted(entry.name for entry in standalone) == [
+        "notes.txt",
+        "single.zip",
+    ]
+
+
+def test_missing_volumes(tmp_path: Path):
+    entries = make_files(
+        tmp_path,
+        ["movie.part1.rar", "movie.part3.rar", "backup.7z.002", "docs.z01"],
+    )
+    volume_sets, standalone = group_volumes(entries)
+    missing = {
+        volume_set.kind: volume_set.missing for volume_set in volume_sets
+    }
+    assert missing == {RAR_PARTS: [2], SPLIT_FILE: [1], SPLIT_ZIP: [2]}
+    assert not standalone
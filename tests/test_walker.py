@@ -0,0 +1,41 @@
+import sys
+from pathlib import Path
+
+from py_extract.walker import scan_files
+
+
+def test_scan_files(tmp_path: Path):
+    (tmp_path / "b.txt").write_text("b")
+    (tmp_path / "a.zip").write_text("a")
+    (tmp_path / "a.zip_out").mkdir()
+    (tmp_path / "a.zip_out" / "inside.txt").write_text("inside")
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "c.txt").write_text("c")
+    (tmp_path / "orphan_out").mkdir()
+    (tmp_path / "orphan_out" / "d.txt").write_text("d")
+
+    assert [entry.name for entry in scan_files(tmp_path, False)] == [
+        "a.zip",
+        "b.txt",
+    ]
+    # output directories are walked when their archive is handled
+    assert [
+        Path(entry.path).relative_to(tmp_path).as_posix()
+        for entry in scan_files(tmp_path, True)
+    ] == ["a.zip", "b.txt", "orphan_out/d.txt", "sub/c.txt"]
+
+
+def test_scan_deep_tree(tmp_path: Path):
+    depth = 300
+    directory = tmp_path
+    for _ in range(depth):
+        directory = directory / "d"
+    directory.mkdir(parents=True)
+    (directory / "deep.txt").write_text("deep")
+    recursion_limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(depth // 2)
+    try:
+        files = scan_files(tmp_path, True)
+    finally:
+        sys.setrecursionlimit(recursion_limit)
+    assert [entry.name for entry in files] == ["deep.txt"]
@@ -0,0 +1,36 @@
+import importlib.util
+import os
+
+from py_extract.zip_decrypter import _ZipDecrypter  # pylint: disable=E0611
+
+DATA = os.urandom(10000)
+
+
+def reference(pwd: bytes) -> bytes:
+    # the pure python decrypter of a fresh zipfile module, py_extract patches
+    # the imported one with _ZipDecrypter
+    spec = importlib.util.find_spec("zipfile")
+    assert spec is not None and spec.loader is not None
+    zipfile = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(zipfile)
+    return getattr(zipfile, "_ZipDecrypter")(pwd)(DATA)
+
+
+def test_call_matches_zipfile():
+    for pwd in (b"", b"secret"):
+        decrypter = _ZipDecrypter(pwd)
+        # the key state carries over between chunks
+        assert decrypter(DATA[:100]) + decrypter(DATA[100:]) == reference(pwd)
+        assert _ZipDecrypter(pwd)(memoryview(DATA)) == reference(pwd)
+
+
+def test_decrypt_inplace():
+    buf = bytearray(DATA)
+    _ZipDecrypter(b"secret").decrypt_inplace(buf)
+    assert buf == reference(b"secret")
+
+
+def test_decrypt_into():
+    out = bytearray(len(DATA) + 10)
+    assert _ZipDecrypter(b"secret").decrypt_into(DATA, out) == len(DATA)
+    assert out[: len(DATA)] == reference(b"secret")
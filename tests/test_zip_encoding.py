@@ -0,0 +1,66 @@
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from py_extract.zip_encoding import detect_metadata_encoding, raw_filenames
+from py_extract.zip_session import ZipSession
+
+
+def write_raw_names(path: Path, names: list[bytes]) -> None:
+    """Write an archive whose file names are raw bytes without the utf-8 flag,
+    ASCII placeholders of the same length are replaced after writing"""
+    placeholders = [
+        f"{i:0{len(name)}d}".encode() for i, name in enumerate(names)
+    ]
+    with zipfile.ZipFile(path, "w") as zip_file:
+        for placeholder in placeholders:
+            zip_file.writestr(placeholder.decode(), b"content")
+    data = path.read_bytes()
+    for placeholder, name in zip(placeholders, names):
+        data = data.replace(placeholder, name)
+    path.write_bytes(data)
+
+
+def detect(archive: Path, encodings: list[str]) -> str | None:
+    with zipfile.ZipFile(archive) as zip_file:
+        return detect_metadata_encoding(raw_filenames(zip_file), encodings)
+
+
+def test_detect_gbk_names(tmp_path: Path):
+    archive = tmp_path / "archive.zip"
+    write_raw_names(
+        archive, ["中文文件名.txt".encode("cp936"), "测试.txt".encode("cp936")]
+    )
+    encodings = ["shift_jis", "cp936", "utf-8"]
+    assert detect(archive, encodings) == "cp936"
+    with zipfile.ZipFile(archive, metadata_encoding="cp936") as zip_file:
+        assert "中文文件名.txt" in zip_file.namelist()
+
+
+def test_detect_unflagged_utf8_names(tmp_path: Path):
+    archive = tmp_path / "archive.zip"
+    write_raw_names(archive, ["中文文件名.txt".encode("utf-8")])
+    assert detect(archive, ["cp936", "utf-8"]) == "utf-8"
+
+
+def test_detect_nothing_to_tell(tmp_path: Path):
+    archive = tmp_path / "archive.zip"
+    with zipfile.ZipFile(archive, "w") as zip_file:
+        zip_file.writestr("ascii.txt", b"content")
+        # stored with the utf-8 flag
+        zip_file.writestr("中文.txt", b"content")
+    assert detect(archive, ["cp936", "utf-8"]) is None
+
+
+def test_session_switches_encoding(tmp_path: Path):
+    archive = tmp_path / "archive.zip"
+    write_raw_names(archive, ["中文文件名.txt".encode("cp936")])
+    with ZipSession(archive) as session:
+        with pytest.raises(UnicodeDecodeError):
+            session.set_encoding("utf-8")
+        session.set_encoding("latin-1")
+        session.set_encoding("cp936")
+        assert session.zip_file.namelist() == ["中文文件名.txt"]
+        session.extractall(tmp_path / "out")
+    assert (tmp_path / "out" / "中文文件名.txt").read_bytes() == b"content"
@@ -0,0 +1,69 @@
+import os
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from py_extract.zip_mmap import MmapMemberReader, MmapZipFile
+
+from .zipcrypto import write_zipcrypto
+
+MEMBERS = {
+    "empty.txt": b"",
+    "small.txt": b"small",
+    "random.bin": os.urandom(300_000),
+    "text.txt": b"compressible text\n" * 200_000,
+}
+
+
+@pytest.mark.parametrize(
+    "compress_type",
+    [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED, zipfile.ZIP_BZIP2],
+)
+def test_read_members(tmp_path: Path, compress_type: int):
+    archive = tmp_path / "archive.zip"
+    with zipfile.ZipFile(archive, "w", compress_type) as zip_file:
+        for name, data in MEMBERS.items():
+            zip_file.writestr(name, data)
+    with MmapZipFile(archive) as zip_file:
+        for name, data in MEMBERS.items():
+            with zip_file.open(name) as reader:
+                # bzip2 is left to zipfile
+                assert isinstance(reader, MmapMemberReader) == (
+                    compress_type != zipfile.ZIP_BZIP2
+                )
+                assert reader.read(7) == data[:7]
+                assert reader.read() == data[7:]
+
+
+def test_read_encrypted_members(tmp_path: Path):
+    archive = tmp_path / "archive.zip"
+    write_zipcrypto(archive, MEMBERS, b"secret", zipfile.ZIP_DEFLATED)
+    with MmapZipFile(archive) as zip_file:
+        with pytest.raises(RuntimeError, match="password required"):
+            zip_file.open("small.txt")
+        with pytest.raises(RuntimeError, match="Bad password"):
+            zip_file.open("small.txt", pwd=b"wrong")
+        for name, data in MEMBERS.items():
+            assert zip_file.read(name, pwd=b"secret") == data
+
+
+def test_bad_crc(tmp_path: Path):
+    archive = tmp_path / "archive.zip"
+    with zipfile.ZipFile(archive, "w") as zip_file:
+        zip_file.writestr("file.txt", b"content")
+    data = archive.read_bytes()
+    archive.write_bytes(data.replace(b"content", b"CONTENT", 1))
+    with MmapZipFile(archive) as zip_file:
+        with pytest.raises(zipfile.BadZipFile, match="Bad CRC-32"):
+            zip_file.read("file.txt")
+
+
+def test_buffered_fallback(tmp_path: Path):
+    archive = tmp_path / "archive.zip"
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        zip_file.writestr("file.txt", b"content")
+    with MmapZipFile(archive, use_mmap=False) as zip_file:
+        with zip_file.open("file.txt") as reader:
+            assert not isinstance(reader, MmapMemberReader)
+            assert reader.read() == b"content"
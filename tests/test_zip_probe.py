@@ -0,0 +1,135 @@
+import zipfile
+from pathlib import Path
+
+import pytest
+import pyzipper
+
+from py_extract.exceptions import LimitExceeded
+from py_extract.zip_probe import (
+    find_zipcrypto_password,
+    read_aes_verifier,
+    read_zipcrypto_header,
+    screen_aes_passwords,
+    screen_zipcrypto_passwords,
+)
+
+from .zipcrypto import write_zipcrypto
+
+PASSWORD = "secret"
+
+
+def test_read_zipcrypto_header(tmp_path: Path):
+    archive = tmp_path / "archive.zip"
+    write_zipcrypto(
+        archive,
+        {"big.txt": b"big" * 1000, "small.txt": b"small"},
+        PASSWORD.encode(),
+        compress_type=zipfile.ZIP_DEFLATED,
+    )
+    with zipfile.ZipFile(archive) as zip_file:
+        header = read_zipcrypto_header(zip_file)
+    assert header is not None
+    assert header.member.filename == "small.txt"
+    assert len(header.header) == 12
+
+
+def test_read_zipcrypto_header_unencrypted(tmp_path: Path):
+    archive = tmp_path / "archive.zip"
+    with zipfile.ZipFile(archive, "w") as zip_file:
+        zip_file.writestr("file.txt", b"content")
+    with zipfile.ZipFile(archive) as zip_file:
+        assert read_zipcrypto_header(zip_file) is None
+
+
+def test_screen_zipcrypto_passwords(tmp_path: Path):
+    archive = tmp_path / "archive.zip"
+    write_zipcrypto(archive, {"file.txt": b"content"}, PASSWORD.encode())
+    with zipfile.ZipFile(archive) as zip_file:
+        header = read_zipcrypto_header(zip_file)
+    assert header is not None
+    passwords = [f"wrong{i}" for i in range(2000)] + [PASSWORD, "密码"]
+    survivors = screen_zipcrypto_passwords(header, passwords, ["utf-8"])
+    assert PASSWORD in survivors
+    # about 1/256 of the wrong passwords pass the check byte by chance
+    assert len(survivors) < 100
+    assert survivors == [pwd for pwd in passwords if pwd in survivors]
+
+
+@pytest.mark.parametrize(
+    "compress_type", [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED]
+)
+def test_find_zipcrypto_password(tmp_path: Path, compress_type: int):
+    archive = tmp_path / "archive.zip"
+    write_zipcrypto(
+        archive,
+        {"file.txt": b"content" * 100},
+        PASSWORD.encode(),
+        compress_type=compress_type,
+    )
+    zip_file = zipfile.ZipFile(archive)
+    header = read_zipcrypto_header(zip_file)
+    assert header is not None
+    passwords = [f"wrong{i}" for i in range(5000)]
+    assert (
+        find_zipcrypto_password(zip_file, header, passwords, ["utf-8"], 4)
+        is None
+    )
+    passwords.insert(3000, PASSWORD)
+    found = find_zipcrypto_password(
+        zip_file, header, passwords, ["cp936", "utf-8"], 4
+    )
+    with pytest.raises(LimitExceeded):
+        find_zipcrypto_password(
+            zip_file, header, passwords, ["utf-8"], 4, deadline=0
+        )
+    zip_file.close()
+    assert found == PASSWORD
+
+
+def test_find_zipcrypto_password_skips_empty_member(tmp_path: Path):
+    archive = tmp_path / "archive.zip"
+    write_zipcrypto(
+        archive,
+        {"empty.txt": b"", "data.bin": b"data" * 100},
+        PASSWORD.encode(),
+    )
+    passwords = [f"wrong{i}" for i in range(5000)] + [PASSWORD]
+    with zipfile.ZipFile(archive) as zip_file:
+        header = read_zipcrypto_header(zip_file)
+        assert header is not None
+        assert header.member.filename == "data.bin"
+        found = find_zipcrypto_password(
+            zip_file, header, passwords, ["utf-8"], 4
+        )
+    assert found == PASSWORD
+
+    # every password passes the CRC-32 check of an empty member
+    write_zipcrypto(archive, {"empty.txt": b""}, PASSWORD.encode())
+    with zipfile.ZipFile(archive) as zip_file:
+        header = read_zipcrypto_header(zip_file)
+        assert header is not None
+        with pytest.raises(ValueError):
+            find_zipcrypto_password(zip_file, header, passwords, ["utf-8"], 4)
+
+
+def test_screen_aes_passwords(tmp_path: Path):
+    archive = tmp_path / "archive.zip"
+    with pyzipper.AESZipFile(
+        archive,
+        "w",
+        compression=pyzipper.ZIP_DEFLATED,
+        encryption=pyzipper.WZ_AES,
+    ) as zip_file:
+        zip_file.setpassword(PASSWORD.encode())
+        zip_file.writestr("big.txt", b"big" * 1000)
+        zip_file.writestr("small.txt", b"small")
+    with zipfile.ZipFile(archive) as zip_file:
+        assert read_zipcrypto_header(zip_file) is None
+        verifier = read_aes_verifier(zip_file)
+    assert verifier is not None
+    assert verifier.member.filename == "small.txt"
+    passwords = [f"wrong{i}" for i in range(100)] + [PASSWORD]
+    survivors = screen_aes_passwords(verifier, passwords, ["utf-8"], 2)
+    assert survivors[-1] == PASSWORD
+    with pytest.raises(LimitExceeded):
+        screen_aes_passwords(verifier, passwords, ["utf-8"], 2, deadline=0)
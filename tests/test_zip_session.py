@@ -0,0 +1,49 @@
+import os
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from py_extract.zip_session import ZipSession
+
+from .zipcrypto import write_zipcrypto
+
+
+def listing(directory: Path) -> dict[str, bytes | None]:
+    return {
+        str(path.relative_to(directory)): (
+            path.read_bytes() if path.is_file() else None
+        )
+        for path in directory.rglob("*")
+    }
+
+
+def test_parallel_extract_matches_extractall(tmp_path: Path):
+    archive = tmp_path / "archive.zip"
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        for i in range(20):
+            zip_file.writestr(
+                f"dir{i % 3}/sub/file{i}.txt", os.urandom(i * 1000)
+            )
+        zip_file.writestr("empty/", b"")
+        # sanitized to a path inside the output directory
+        zip_file.writestr("../escape.txt", b"escape")
+    with zipfile.ZipFile(archive) as zip_file:
+        zip_file.extractall(tmp_path / "expected")
+    with ZipSession(archive) as session:
+        extracted = session.extractall(tmp_path / "out", threads=4)
+    assert listing(tmp_path / "out") == listing(tmp_path / "expected")
+    assert extracted == sum(i * 1000 for i in range(20)) + len(b"escape")
+    assert not (tmp_path / "escape.txt").exists()
+
+
+def test_parallel_extract_encrypted(tmp_path: Path):
+    archive = tmp_path / "archive.zip"
+    members = {f"file{i}.txt": os.urandom(5000) for i in range(8)}
+    write_zipcrypto(archive, members, b"secret", zipfile.ZIP_DEFLATED)
+    with ZipSession(archive) as session:
+        with pytest.raises(RuntimeError, match="Bad password"):
+            session.extractall(tmp_path / "wrong", pwd=b"wrong", threads=4)
+        session.extractall(tmp_path / "out", pwd=b"secret", threads=4)
+    for name, data in members.items():
+        assert (tmp_path / "out" / name).read_bytes() == data
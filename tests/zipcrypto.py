@@ -0,0 +1,86 @@
+"""Minimal writer of ZipCrypto encrypted archives, zipfile can only read them"""
+import os
+import struct
+import zipfile
+import zlib
+
+
+def _crc32_byte(ch: int, crc: int) -> int:
+    return zlib.crc32(bytes([ch]), crc ^ 0xFFFFFFFF) ^ 0xFFFFFFFF
+
+
+class _Encrypter:
+    def __init__(self, pwd: bytes) -> None:
+        self.key0, self.key1, self.key2 = 305419896, 591751049, 878082192
+        for ch in pwd:
+            self._update_keys(ch)
+
+    def _update_keys(self, ch: int) -> None:
+        self.key0 = _crc32_byte(ch, self.key0)
+        self.key1 = (self.key1 + (self.key0 & 255)) & 0xFFFFFFFF
+        self.key1 = (self.key1 * 134775813 + 1) & 0xFFFFFFFF
+        self.key2 = _crc32_byte((self.key1 >> 24) & 255, self.key2)
+
+    def __call__(self, data: bytes) -> bytes:
+        out = bytearray()
+        for ch in data:
+            k = self.key2 | 2
+            out.append(ch ^ (((k * (k ^ 1)) >> 8) & 255))
+            self._update_keys(ch)
+        return bytes(out)
+
+
+def write_zipcrypto(
+    path,
+    members: dict[str, bytes],
+    pwd: bytes,
+    compress_type: int = zipfile.ZIP_STORED,
+) -> None:
+    local_parts, central_parts = [], []
+    offset = 0
+    for name, data in members.items():
+        crc = zlib.crc32(data)
+        if compress_type == zipfile.ZIP_DEFLATED:
+            compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+            payload = compressor.compress(data) + compressor.flush()
+        else:
+            payload = data
+        header = os.urandom(11) + bytes([crc >> 24])
+        payload = _Encrypter(pwd)(header + payload)
+        filename = name.encode("utf-8")
+        # flags, method, time, date, crc, compressed and uncompressed size
+        fields = (1, compress_type, 0, 0x21, crc, len(payload), len(data))
+        local = struct.pack(
+            "<4s5H3L2H", b"PK\x03\x04", 20, *fields, len(filename), 0
+        )
+        local_parts.append(local + filename + payload)
+        central = struct.pack(
+            "<4s6H3L5H2L",
+            b"PK\x01\x02",
+            20,
+            20,
+            *fields,
+            len(filename),
+            0,
+            0,
+            0,
+            0,
+            0,
+            offset,
+        )
+        central_parts.append(central + filename)
+        offset += len(local) + len(filename) + len(payload)
+    central_dir = b"".join(central_parts)
+    end = struct.pack(
+        "<4s4H2LH",
+        b"PK\x05\x06",
+        0,
+        0,
+        len(members),
+        len(members),
+        len(central_dir),
+        offset,
+        0,
+    )
+    with open(path, "wb") as fp:
+        fp.write(b"".join(local_parts) + central_dir + end)